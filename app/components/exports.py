@@ -0,0 +1,357 @@
+import csv
+import functools
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+
+import pandas as pd
+
+from services.metricas import marcar_cache, medir, registrar_gauges
+from services.reports import CONSULTAS, stream_report
+
+# Presupuesto de memoria para los archivos generados (compartido entre sesiones)
+EXPORT_CACHE_MAX_BYTES = int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+# Igual que la cache de reportes: un export no sobrevive a los datos que lo generaron
+EXPORT_CACHE_TTL = float(os.getenv("EXPORT_CACHE_TTL", "300"))
+# Por encima de este tamaño el archivo en construcción pasa a disco
+EXPORT_SPOOL_BYTES = int(os.getenv("EXPORT_SPOOL_BYTES", str(8 * 1024 * 1024)))
+PDF_ROWS_PER_PAGE = 30
+# reportlab guarda todas las páginas hasta save(): el PDF se corta aquí
+PDF_MAX_ROWS = int(os.getenv("EXPORT_PDF_MAX_ROWS", "50000"))
+EXCEL_MAX_ROWS = 1048576
+
+
+# xlsxwriter y reportlab (sobre todo reportlab.platypus) se importan recién en
+# el primer export de su formato: así no pesan en el arranque de cada proceso.
+
+@functools.cache
+def _pdf_table_style():
+    from reportlab.lib import colors
+    from reportlab.platypus import TableStyle
+
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.black),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')
+    ])
+
+
+# Los writers consumen lotes (columnas, filas) como los que produce
+# db.connection.stream_query y escriben a un archivo binario sin
+# acumular el resultado completo en memoria.
+
+def df_batches(df: pd.DataFrame, batch_size: int = 5000):
+    """Adapta un DataFrame al formato de lotes de los writers."""
+    columns = df.columns.tolist()
+    if df.empty:
+        yield columns, []
+    for start in range(0, len(df), batch_size):
+        chunk = df.iloc[start:start + batch_size]
+        yield columns, list(chunk.itertuples(index=False, name=None))
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _text_writer(out):
+    return io.TextIOWrapper(out, encoding="utf-8", newline="")
+
+
+def write_csv(batches, out):
+    text = _text_writer(out)
+    writer = csv.writer(text)
+    header = False
+    for columns, rows in batches:
+        if not header:
+            writer.writerow(columns)
+            header = True
+        writer.writerows(rows)
+    text.flush()
+    text.detach()
+
+
+def write_ndjson(batches, out):
+    text = _text_writer(out)
+    for columns, rows in batches:
+        for row in rows:
+            text.write(json.dumps(dict(zip(columns, row)), default=_json_default))
+            text.write("\n")
+    text.flush()
+    text.detach()
+
+
+def write_json(batches, out):
+    """Arreglo JSON de registros, escrito fila por fila."""
+    text = _text_writer(out)
+    text.write("[")
+    first = True
+    for columns, rows in batches:
+        for row in rows:
+            text.write("\n  " if first else ",\n  ")
+            text.write(json.dumps(dict(zip(columns, row)), default=_json_default))
+            first = False
+    text.write("\n]" if not first else "]")
+    text.flush()
+    text.detach()
+
+
+def _excel_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.replace(tzinfo=None)
+    return value
+
+
+def write_xlsx(batches, out):
+    import xlsxwriter
+
+    # constant_memory: xlsxwriter escribe cada fila a disco y la descarta
+    workbook = xlsxwriter.Workbook(out, {"constant_memory": True, "default_date_format": "yyyy-mm-dd"})
+    worksheet = None
+    sheet_number = 0
+    row_index = 0
+    for columns, rows in batches:
+        for row in rows:
+            if worksheet is None or row_index == EXCEL_MAX_ROWS:
+                sheet_number += 1
+                worksheet = workbook.add_worksheet("Datos" if sheet_number == 1 else f"Datos {sheet_number}")
+                worksheet.write_row(0, 0, columns)
+                row_index = 1
+            worksheet.write_row(row_index, 0, [_excel_value(v) for v in row])
+            row_index += 1
+        if worksheet is None:
+            worksheet = workbook.add_worksheet("Datos")
+            worksheet.write_row(0, 0, columns)
+    workbook.close()
+
+
+def _pdf_cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
+
+
+def _pdf_col_widths(columns, rows, available: float) -> list[float]:
+    """Anchos fijos para todas las páginas, medidos sobre la primera."""
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    widths = [stringWidth(str(c), "Helvetica-Bold", 8) + 12 for c in columns]
+    for row in rows:
+        for i, value in enumerate(row):
+            widths[i] = max(widths[i], stringWidth(value, "Helvetica", 8) + 12)
+    total = sum(widths)
+    if total > available:
+        widths = [w * available / total for w in widths]
+    return widths
+
+
+def write_pdf(batches, out, rows_per_page: int = PDF_ROWS_PER_PAGE, max_rows: int = PDF_MAX_ROWS):
+    """PDF paginado: una tabla pequeña por página en lugar de una gigante.
+
+    Pasadas `max_rows` filas se deja de leer y se agrega una nota al final.
+    """
+    from reportlab.lib.pagesizes import landscape, letter
+    from reportlab.pdfgen import canvas
+    from reportlab.platypus import Table
+
+    pagesize = landscape(letter)
+    width, height = pagesize
+    margin = 36
+    pdf = canvas.Canvas(out, pagesize=pagesize)
+    page = []
+    col_widths = None
+    columns = []
+    pages = 0
+    written = 0
+    truncated = False
+
+    def flush():
+        nonlocal col_widths, pages
+        if col_widths is None:
+            col_widths = _pdf_col_widths(columns, page, width - 2 * margin)
+        table = Table([columns] + page, colWidths=col_widths)
+        table.setStyle(_pdf_table_style())
+        _, table_height = table.wrapOn(pdf, width - 2 * margin, height - 2 * margin)
+        table.drawOn(pdf, margin, height - margin - table_height)
+        pdf.showPage()
+        pages += 1
+
+    for columns, rows in batches:
+        for row in rows:
+            if written == max_rows:
+                truncated = True
+                break
+            page.append([_pdf_cell(v) for v in row])
+            written += 1
+            if len(page) == rows_per_page:
+                flush()
+                page = []
+        if truncated:
+            break
+    if page or pages == 0:
+        flush()
+    if truncated:
+        pdf.setFont("Helvetica", 10)
+        pdf.drawString(margin, height - margin, f"Resultado truncado a {max_rows} filas; use CSV o Excel para el detalle completo.")
+        pdf.showPage()
+    pdf.save()
+
+
+# formato -> (writer, extensión, mime)
+FORMATOS = {
+    "csv": (write_csv, "csv", "text/csv"),
+    "excel": (write_xlsx, "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "json": (write_json, "json", "application/json"),
+    "ndjson": (write_ndjson, "ndjson", "application/x-ndjson"),
+    "pdf": (write_pdf, "pdf", "application/pdf"),
+}
+
+
+def export_batches(batches, fmt: str, out):
+    FORMATOS[fmt][0](batches, out)
+
+
+def export_report(report: str, fmt: str, out, batch_size: int | None = None, **filters):
+    """Exporta un reporte directo desde la base, con memoria acotada."""
+    export_batches(stream_report(report, batch_size=batch_size, **filters), fmt, out)
+
+
+def _to_bytes(batches, fmt: str) -> bytes:
+    with tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES) as tmp:
+        export_batches(batches, fmt, tmp)
+        tmp.seek(0)
+        return tmp.read()
+
+
+def df_to_pdf(df: pd.DataFrame):
+    return _to_bytes(df_batches(df), "pdf")
+
+# Descargar Excel
+def to_excel(df):
+    return _to_bytes(df_batches(df), "excel")
+
+def to_csv(df):
+    return _to_bytes(df_batches(df), "csv")
+
+def to_json(df):
+    return _to_bytes(df_batches(df), "json")
+
+
+def filters_hash(filters: dict) -> str:
+    """Hash estable de los filtros de un reporte (fechas y decimales como texto)."""
+    payload = json.dumps(filters, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def data_hash(df: pd.DataFrame) -> str:
+    """Hash del contenido, para tablas que no traen filtros asociados."""
+    hashes = pd.util.hash_pandas_object(df.astype(str), index=False).values
+    return hashlib.sha1(hashes.tobytes() + ",".join(map(str, df.columns)).encode("utf-8")).hexdigest()
+
+
+class ArtifactCache:
+    """Archivos de exportación ya generados, con LRU por presupuesto de bytes y TTL."""
+
+    def __init__(self, max_bytes: int = EXPORT_CACHE_MAX_BYTES, ttl: float = EXPORT_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (artefacto, expira_en)
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get_or_create(self, key, build):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                marcar_cache(True)
+                return entry[0]
+            if entry is not None:
+                self._remove(key)
+            self._stats["misses"] += 1
+        marcar_cache(False)
+
+        # Se genera fuera del lock para no bloquear otras descargas
+        artifact = build()
+        size = len(artifact)
+        if size > self.max_bytes:
+            return artifact
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (artifact, time.monotonic() + self.ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+        return artifact
+
+    def _remove(self, key):
+        artifact, _ = self._entries.pop(key)
+        self._bytes -= len(artifact)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(entries=len(self._entries), bytes=self._bytes)
+        return stats
+
+
+_artifacts = ArtifactCache()
+registrar_gauges("cache_exports", _artifacts.stats)
+
+
+def get_artifact_cache() -> ArtifactCache:
+    return _artifacts
+
+
+def lazy_export(report: str, df: pd.DataFrame, fmt: str, filters: dict | None = None):
+    """Callable para st.download_button: el archivo se genera recién al hacer clic.
+
+    Si el reporte está registrado en services.reports y trae sus filtros,
+    el archivo se arma leyendo la base por lotes; si no, desde el DataFrame.
+    """
+    def source(medicion):
+        if filters is not None and report in CONSULTAS:
+            batches = stream_report(report, **filters)
+        else:
+            batches = df_batches(df)
+        medicion["filas"] = 0
+        for columns, rows in batches:
+            medicion["filas"] += len(rows)
+            yield columns, rows
+
+    def build():
+        with medir("export", report, formato=fmt) as medicion:
+            clave = filters_hash(filters) if filters is not None else data_hash(df)
+            artifact = _artifacts.get_or_create((report, clave, fmt), lambda: _to_bytes(source(medicion), fmt))
+            medicion["bytes"] = len(artifact)
+        return artifact
+
+    return build
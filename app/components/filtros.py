@@ -0,0 +1,147 @@
+"""Filtros del panel: valores iniciales de cada widget y filtros de cada reporte.
+
+No depende de Streamlit: main.py lee los valores de st.session_state y el
+calentamiento (services/arranque.py) usa los valores por defecto para dejar en
+cache lo mismo que pedirá la primera carga de la página.
+"""
+from datetime import datetime, timedelta
+from typing import Callable
+
+from services.reports import (
+    frame_donaciones_por_campana,
+    frame_voluntarios_por_actividad,
+    get_ranking_donantes,
+    frame_distribucion_voluntarios_por_edad,
+    frame_efectividad_campanas,
+    frame_recurso_utilizado_por_campana,
+)
+from services.asignacion import NIVELES, get_candidatos_actividad
+
+Valor = Callable[[str], object]
+
+
+def valores_por_defecto() -> dict:
+    """Valor inicial de cada widget de filtro (key -> valor); las fechas dependen del día."""
+    default_start = (datetime.now() - timedelta(days=365)).date()
+    default_end = (datetime.now() + timedelta(days=365)).date()
+    return {
+        "fecha_inicio_don": default_start,
+        "fecha_fin_don": default_end,
+        "monto_min": 0.0,
+        "monto_max": 0.0,  # 0 = sin límite: sin filtros de monto responden los buckets
+        "fecha_inicio_vol": default_start,
+        "fecha_fin_vol": default_end,
+        "edad_min": 18,
+        "edad_max": 65,
+        "fecha_inicio_donante": default_start,
+        "fecha_fin_donante": default_end,
+        "tipo_donante": "Todos",
+        "monto_min_donante": 100.0,
+        "fecha_inicio_edad": default_start,
+        "fecha_fin_edad": default_end,
+        "genero": "Todos",
+        "actividad_id": None,
+        "fecha_inicio_efectividad": default_start,
+        "fecha_fin_efectividad": default_end,
+        "monto_min_efectividad": 0.0,
+        "monto_max_efectividad": 100000.0,
+        "estado_campana": "Todos",
+        "fecha_inicio_recurso": default_start,
+        "fecha_fin_recurso": default_end,
+        "tipo_recurso": "",
+        "porcentaje_min_recurso": 0.0,
+        "actividad_asignacion": None,
+        "habilidades_asignacion": [],
+        "nivel_asignacion": NIVELES[0],
+        "excluir_inscritos_asignacion": True,
+    }
+
+
+# Cada función arma los filtros de su reporte a partir de `valor(key)`
+
+# Reporte 1: Donaciones por Campaña
+def filtros_donaciones_por_campana(valor: Valor) -> dict:
+    return dict(
+        fecha_inicio=valor("fecha_inicio_don"),
+        fecha_fin=valor("fecha_fin_don"),
+        monto_minimo=valor("monto_min"),
+        monto_maximo=valor("monto_max")
+    )
+
+
+# Reporte 2: Voluntarios por Actividad
+def filtros_voluntarios_por_actividad(valor: Valor) -> dict:
+    return dict(
+        fecha_inicio=valor("fecha_inicio_vol"),
+        fecha_fin=valor("fecha_fin_vol"),
+        edad_minima=valor("edad_min"),
+        edad_maxima=valor("edad_max")
+    )
+
+
+# Reporte 3: Donaciones por Donante
+def filtros_donaciones_por_donante(valor: Valor) -> dict:
+    tipo_donante = valor("tipo_donante")
+    return dict(
+        fecha_inicio=valor("fecha_inicio_donante"),
+        fecha_fin=valor("fecha_fin_donante"),
+        tipo_donante=tipo_donante if tipo_donante != "Todos" else None,
+        monto_minimo=valor("monto_min_donante")
+    )
+
+
+# Reporte 4: Distribución de Voluntarios por Edad
+def filtros_distribucion_voluntarios_por_edad(valor: Valor) -> dict:
+    genero = valor("genero")
+    actividad_id = valor("actividad_id")
+    return dict(
+        fecha_inicio=valor("fecha_inicio_edad"),
+        fecha_fin=valor("fecha_fin_edad"),
+        genero=genero if genero != "Todos" else None,
+        actividad_id=actividad_id if actividad_id else None
+    )
+
+
+# Reporte 5: Efectividad de Campañas
+def filtros_efectividad_campanas(valor: Valor) -> dict:
+    estado_campana = valor("estado_campana")
+    return dict(
+        fecha_inicio=valor("fecha_inicio_efectividad"),
+        fecha_fin=valor("fecha_fin_efectividad"),
+        monto_objetivo_min=valor("monto_min_efectividad"),
+        monto_objetivo_max=valor("monto_max_efectividad"),
+        estado=estado_campana if estado_campana != "Todos" else None
+    )
+
+
+# Reporte 6: Recursos por Campaña
+def filtros_recurso_utilizado_por_campana(valor: Valor) -> dict:
+    tipo_recurso = valor("tipo_recurso").strip()
+    return dict(
+        fecha_inicio=valor("fecha_inicio_recurso"),
+        fecha_fin=valor("fecha_fin_recurso"),
+        tipo_recurso=tipo_recurso or None,
+        porcentaje_minimo=valor("porcentaje_min_recurso")
+    )
+
+
+# Reporte 7: Asignación de Voluntarios
+def filtros_asignacion_voluntarios(valor: Valor) -> dict:
+    return dict(
+        actividad_id=valor("actividad_asignacion"),
+        habilidades=tuple(sorted(valor("habilidades_asignacion"))),
+        nivel_minimo=valor("nivel_asignacion"),
+        excluir_inscritos=valor("excluir_inscritos_asignacion")
+    )
+
+
+# reporte -> (función que usa el panel, filtros); en el orden de las secciones
+REPORTES_PANEL = {
+    "donaciones_por_campana": (frame_donaciones_por_campana, filtros_donaciones_por_campana),
+    "voluntarios_por_actividad": (frame_voluntarios_por_actividad, filtros_voluntarios_por_actividad),
+    "donaciones_por_donante": (get_ranking_donantes, filtros_donaciones_por_donante),
+    "distribucion_voluntarios_por_edad": (frame_distribucion_voluntarios_por_edad, filtros_distribucion_voluntarios_por_edad),
+    "efectividad_campanas": (frame_efectividad_campanas, filtros_efectividad_campanas),
+    "recurso_utilizado_por_campana": (frame_recurso_utilizado_por_campana, filtros_recurso_utilizado_por_campana),
+    "asignacion_voluntarios": (get_candidatos_actividad, filtros_asignacion_voluntarios),
+}
@@ -1,70 +1,36 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import io
-from reportlab.lib.pagesizes import letter, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
-from reportlab.lib import colors
-from io import BytesIO
-
-
-def df_to_pdf(df: pd.DataFrame):
-    # Crear un buffer en memoria
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(letter))
-
-    # Convertir el DataFrame a una lista de listas
-    data = [df.columns.tolist()] + df.values.tolist()
-
-    # Crear la tabla
-    table = Table(data)
-
-    # Estilo de la tabla
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('GRID', (0, 0), (-1, -1), 0.25, colors.black),
-        ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')
-    ]))
-
-    # Construir el documento
-    doc.build([table])
-
-    # Regresar el buffer con el PDF
-    buffer.seek(0)
-    return buffer.read()
-
-# Descargar Excel
-def to_excel(df):
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False, sheet_name='Datos')
-    return output.getvalue()
-
-def render_table(title: str, data: list[dict]):
+from pandas.api.types import is_numeric_dtype
+from components.exports import lazy_export
+
+
+def render_table(title: str, data: list[dict] | pd.DataFrame, report: str | None = None, filters: dict | None = None):
+    """Muestra la tabla; los exports se generan solo cuando se pide la descarga.
+
+    `data` puede ser una lista de filas o un DataFrame ya tipado (services.reports.frame_*).
+
+    `report` y `filters` identifican el archivo generado para reutilizarlo
+    entre reruns y sesiones; sin filtros se usa un hash del contenido.
+    """
     st.subheader(title)
-    if not data:
+    if data is None or len(data) == 0:
         st.info("No hay datos disponibles.")
         return
 
-    df = pd.DataFrame(data)
-
-    csv = df.to_csv(index=False).encode('utf-8')
-    excel = to_excel(df)
-    json = df.to_json(orient="records", indent=2)
-    pdf_data = df_to_pdf(df)
+    export_df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+    df = export_df.copy(deep=False)
+    nombre = report or title
 
     # Asegurar que columnas monetarias y porcentajes sean numéricas
+    # (los DataFrames tipados ya traen float64)
     for col in ['monto_total', 'monto_recaudado', 'meta_monetaria']:
-        if col in df.columns:
+        if col in df.columns and not is_numeric_dtype(df[col]):
             df[col] = pd.to_numeric(df[col], errors='coerce')
 
     for col in ['porcentaje_cumplimiento', 'porcentaje_completado']:
         if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce') / 100  # si vienen como 75 → 0.75
+            porcentaje = df[col] if is_numeric_dtype(df[col]) else pd.to_numeric(df[col], errors='coerce')
+            df[col] = porcentaje / 100  # si vienen como 75 → 0.75
 
     # Formatos
     format_dict = {
@@ -90,7 +56,7 @@ def render_table(title: str, data: list[dict]):
     with col1:
         st.download_button(
             label="📄 Descargar CSV",
-            data=csv,
+            data=lazy_export(nombre, export_df, "csv", filters),
             file_name=f"{title.lower().replace(' ', '_')}.csv",
             mime="text/csv"
         )
@@ -98,7 +64,7 @@ def render_table(title: str, data: list[dict]):
     with col2:
         st.download_button(
             label="📊 Descargar Excel",
-            data=excel,
+            data=lazy_export(nombre, export_df, "excel", filters),
             file_name=f"{title.lower().replace(' ', '_')}.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         )
@@ -106,7 +72,7 @@ def render_table(title: str, data: list[dict]):
     with col3:
         st.download_button(
             label="🗂 Descargar JSON",
-            data=json,
+            data=lazy_export(nombre, export_df, "json", filters),
             file_name=f"{title.lower().replace(' ', '_')}.json",
             mime="application/json"
         )
@@ -114,7 +80,7 @@ def render_table(title: str, data: list[dict]):
     with col4:
         st.download_button(
             label="📄 Descargar PDF",
-            data=pdf_data,
+            data=lazy_export(nombre, export_df, "pdf", filters),
             file_name=f"{title.lower().replace(' ', '_')}.pdf",
             mime="application/pdf"
         )
@@ -148,4 +114,46 @@ def render_filters(filters: dict):
                     label=config["label"],
                     options=config["options"],
                     key=key
-                )
\ No newline at end of file
+                )
+
+def render_diagnostico(resumen: list[dict], lentas: list[dict], pool: dict, cache: dict, sentencias: dict | None = None,
+                       ejecucion: dict | None = None):
+    """Panel con las métricas de services/metricas.py, el pool, la cache, las sentencias preparadas y la admisión."""
+    st.markdown("---")
+    st.header("Diagnóstico")
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Conexiones en uso", f"{pool['in_use']} / {pool['max_size']}")
+    col2.metric("Espera máxima por conexión", f"{pool['wait_time_max'] * 1000:.1f} ms")
+    consultas_cache = cache["hits"] + cache["misses"]
+    col3.metric("Aciertos de cache", f"{cache['hits'] / consultas_cache:.0%}" if consultas_cache else "-")
+    col4.metric("Cache de reportes", f"{cache['entries']} entradas, {cache['bytes'] / 1024:.0f} KiB")
+    if sentencias:
+        st.caption(f"Sentencias preparadas: {sentencias['sentencias']} en {sentencias['conexiones']} conexiones, "
+                   f"{sentencias['prepares']} PREPARE y {sentencias['reutilizadas']} EXECUTE reutilizados "
+                   f"({sentencias['reutilizacion']:.0%})")
+    if ejecucion:
+        st.caption(f"Consultas de reportes: {ejecucion['en_curso']} / {ejecucion['limite']} en curso, "
+                   f"{ejecucion['en_cola']} en cola · {ejecucion['encoladas']} encoladas, "
+                   f"{ejecucion['canceladas']} canceladas, {ejecucion['vencidas'] + ejecucion['vencidas_en_cola']} vencidas, "
+                   f"{ejecucion['rechazadas']} rechazadas")
+
+    if resumen:
+        df = pd.DataFrame(resumen)
+        df["promedio_ms"] = df["promedio_segundos"] * 1000
+        df["max_ms"] = df["max_segundos"] * 1000
+        df["espera_ms"] = df["espera_segundos"] * 1000
+        st.dataframe(
+            df[["operacion", "reporte", "llamadas", "tasa_hits", "promedio_ms", "max_ms", "filas", "bytes", "espera_ms", "errores"]]
+            .style.format({"tasa_hits": "{:.0%}", "promedio_ms": "{:.1f}", "max_ms": "{:.1f}", "espera_ms": "{:.1f}"}),
+            use_container_width=True
+        )
+
+    st.subheader("Consultas lentas")
+    if not lentas:
+        st.info("No hay consultas lentas registradas.")
+    for lenta in lentas:
+        st.caption(f"{lenta['fecha']} · {lenta['operacion']} {lenta['reporte']} · {lenta['segundos']:.3f}s "
+                   f"(espera {lenta['espera_conexion']:.3f}s, cache {lenta['cache']}, filas {lenta['filas']})")
+        if lenta["sql"]:
+            st.code(lenta["sql"], language="sql")
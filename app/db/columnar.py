@@ -0,0 +1,74 @@
+"""Lectura de resultados por columnas, con tipos de NumPy o de Arrow.
+
+Los DECIMAL de PostgreSQL llegan a Python como Decimal y dejan columnas de
+tipo object en pandas; aquí se leen directamente como float64/int64/
+datetime64, o como Arrow con su tipo decimal y timestamp.
+"""
+import numpy as np
+import pandas as pd
+from psycopg2.extensions import (
+    BOOLEAN, DECIMAL, FLOAT, INTEGER, LONGINTEGER, PYDATE, PYDATETIME, new_type, register_type,
+    cursor as TupleCursor,
+)
+
+from db.connection import execute_query, get_connection
+
+# NUMERIC leído como float: se evita construir un Decimal por valor
+NUMERIC_FLOAT = new_type(DECIMAL.values, "NUMERIC_FLOAT", lambda value, cur: None if value is None else float(value))
+
+_DTYPES = {}
+for _oid in DECIMAL.values + FLOAT.values:
+    _DTYPES[_oid] = "float64"
+for _oid in INTEGER.values + LONGINTEGER.values:
+    _DTYPES[_oid] = "int64"
+for _oid in PYDATETIME.values:
+    _DTYPES[_oid] = "datetime64[us]"
+for _oid in PYDATE.values:
+    _DTYPES[_oid] = "datetime64[D]"
+for _oid in BOOLEAN.values:
+    _DTYPES[_oid] = "bool"
+
+
+def _columna(valores: tuple, dtype: str | None) -> np.ndarray:
+    if dtype is None:
+        return np.array(valores, dtype=object)
+    if None in valores and dtype in ("int64", "bool"):
+        # Con NULLs: enteros como float (NaN) y booleanos como object
+        dtype = "float64" if dtype == "int64" else object
+    return np.array(valores, dtype=dtype)
+
+
+def _fetch(query: str, params, numeric_float: bool) -> tuple[list, list[int], list[tuple]]:
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=TupleCursor) as cur:
+            if numeric_float:
+                register_type(NUMERIC_FLOAT, cur)
+            execute_query(cur, query, params)
+            rows = cur.fetchall()
+            description = cur.description
+    columnas = [col.name for col in description]
+    tipos = [col.type_code for col in description]
+    valores = list(zip(*rows)) if rows else [() for _ in columnas]
+    return columnas, tipos, valores
+
+
+def fetch_arrays(query: str, params=None) -> dict[str, np.ndarray]:
+    """Resultado como {columna: arreglo de NumPy} con el dtype de cada tipo de PostgreSQL."""
+    columnas, tipos, valores = _fetch(query, params, numeric_float=True)
+    return {
+        nombre: _columna(col, _DTYPES.get(tipo))
+        for nombre, tipo, col in zip(columnas, tipos, valores)
+    }
+
+
+def fetch_frame(query: str, params=None) -> pd.DataFrame:
+    """Resultado como DataFrame con columnas numéricas y de fecha ya tipadas."""
+    return pd.DataFrame(fetch_arrays(query, params), copy=False)
+
+
+def fetch_arrow(query: str, params=None):
+    """Resultado como pyarrow.Table: los DECIMAL quedan como decimal128, las fechas como timestamp/date32."""
+    import pyarrow as pa  # opcional: solo se necesita para esta ruta
+
+    columnas, _, valores = _fetch(query, params, numeric_float=False)
+    return pa.table({nombre: pa.array(col) for nombre, col in zip(columnas, valores)})
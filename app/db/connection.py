@@ -1,8 +1,38 @@
 import psycopg2
+import psycopg2.errors
 from psycopg2.extras import RealDictCursor
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, cursor as TupleCursor
+from contextlib import contextmanager
+import contextvars
+import io
+import itertools
 import os
+import threading
+import time
+import weakref
 
-def get_connection():
+from db.ejecucion import admitir, ejecutar
+
+# Configuración del pool (compartido por todas las sesiones de Streamlit del proceso)
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))  # segundos
+POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))  # segundos
+POOL_CHECKOUT_TIMEOUT = float(os.getenv("DB_POOL_CHECKOUT_TIMEOUT", "10"))  # segundos
+POOL_HEALTHCHECK_AFTER = float(os.getenv("DB_POOL_HEALTHCHECK_AFTER", "30"))  # segundos
+# Filas por viaje al servidor en los cursores con nombre
+STREAM_BATCH_SIZE = int(os.getenv("DB_STREAM_BATCH_SIZE", "5000"))
+# Filas por sentencia COPY en las cargas masivas
+COPY_BATCH_SIZE = int(os.getenv("DB_COPY_BATCH_SIZE", "100000"))
+# Ejecutar las SentenciaPreparada con PREPARE/EXECUTE (0 = SQL plano)
+PREPARED_STATEMENTS = os.getenv("DB_PREPARED_STATEMENTS", "1") == "1"
+
+
+class PoolExhaustedError(psycopg2.OperationalError):
+    """No se liberó ninguna conexión dentro del tiempo de espera."""
+
+
+def _connect():
     return psycopg2.connect(
         dbname=os.getenv("POSTGRES_DB", "reporteria_db"),
         user=os.getenv("POSTGRES_USER", "admin"),
@@ -11,3 +41,407 @@ def get_connection():
         port=os.getenv("POSTGRES_PORT", "5432"),
         cursor_factory=RealDictCursor
     )
+
+
+class ConnectionPool:
+    """Pool de conexiones thread-safe con validación al préstamo y reciclaje."""
+
+    def __init__(
+        self,
+        min_size: int = POOL_MIN_SIZE,
+        max_size: int = POOL_MAX_SIZE,
+        max_lifetime: float = POOL_MAX_LIFETIME,
+        max_idle: float = POOL_MAX_IDLE,
+        checkout_timeout: float = POOL_CHECKOUT_TIMEOUT,
+        healthcheck_after: float = POOL_HEALTHCHECK_AFTER
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Tamaños de pool inválidos")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.checkout_timeout = checkout_timeout
+        self.healthcheck_after = healthcheck_after
+
+        self._cond = threading.Condition()
+        self._idle = []  # [(conn, creada_en, devuelta_en)]
+        self._created_at = {}  # id(conn) -> timestamp de creación
+        self._in_use = 0
+        self._closed = False
+        self._stats = {
+            "checkouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "discarded": 0,
+            "healthcheck_failures": 0,
+            "exhausted": 0,
+            "timeouts": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+        }
+
+        for _ in range(min_size):
+            conn = self._new_connection()
+            self._idle.append((conn, self._created_at[id(conn)], time.monotonic()))
+
+    @property
+    def size(self) -> int:
+        return self._in_use + len(self._idle)
+
+    def _new_connection(self):
+        conn = _connect()
+        self._created_at[id(conn)] = time.monotonic()
+        self._stats["created"] += 1
+        return conn
+
+    def _close(self, conn):
+        self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _is_healthy(self, conn, created_at: float, returned_at: float) -> bool:
+        """Chequeos locales (sin red); el ping lo hace getconn fuera del lock."""
+        now = time.monotonic()
+        if conn.closed:
+            return False
+        if now - created_at > self.max_lifetime:
+            self._stats["recycled"] += 1
+            return False
+        if now - returned_at > self.max_idle:
+            self._stats["recycled"] += 1
+            return False
+        return True
+
+    @staticmethod
+    def _ping(conn) -> bool:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.checkout_timeout
+        waited = False
+        while True:
+            conn = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise psycopg2.InterfaceError("El pool de conexiones está cerrado")
+                    while self._idle:
+                        conn, created_at, returned_at = self._idle.pop()
+                        if self._is_healthy(conn, created_at, returned_at):
+                            break
+                        self._close(conn)
+                        conn = None
+                    if conn is not None:
+                        if time.monotonic() - returned_at <= self.healthcheck_after:
+                            return self._checkout(conn, start)
+                        # Solo se hace ping a conexiones que llevan tiempo sin usarse;
+                        # el lugar queda reservado mientras tanto
+                        self._in_use += 1
+                        break
+                    if self.size < self.max_size:
+                        # Se reserva el lugar antes de conectar para no superar max_size
+                        self._in_use += 1
+                        break
+                    if not waited:
+                        self._stats["exhausted"] += 1
+                        waited = True
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolExhaustedError(
+                            f"Pool agotado: {self.max_size} conexiones en uso tras {self.checkout_timeout}s"
+                        )
+                    self._cond.wait(remaining)
+
+            if conn is None:
+                break
+            # Fuera del lock: un backend lento o caído no frena los demás préstamos y devoluciones
+            sana = self._ping(conn)
+            with self._cond:
+                self._in_use -= 1
+                if sana:
+                    return self._checkout(conn, start)
+                self._stats["healthcheck_failures"] += 1
+                self._close(conn)
+                self._cond.notify()
+
+        try:
+            conn = self._new_connection()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._in_use -= 1
+            return self._checkout(conn, start)
+
+    def _checkout(self, conn, start: float):
+        wait = time.monotonic() - start
+        self._in_use += 1
+        self._stats["checkouts"] += 1
+        self._stats["wait_time_total"] += wait
+        self._stats["wait_time_max"] = max(self._stats["wait_time_max"], wait)
+        return conn
+
+    def putconn(self, conn, discard: bool = False):
+        with self._cond:
+            self._in_use -= 1
+            created_at = self._created_at.get(id(conn))
+            reusable = (
+                not discard
+                and not self._closed
+                and created_at is not None
+                and not conn.closed
+                and conn.info.transaction_status == TRANSACTION_STATUS_IDLE
+            )
+            if reusable:
+                self._idle.append((conn, created_at, time.monotonic()))
+            else:
+                self._stats["discarded"] += 1
+                self._close(conn)
+            self._cond.notify()
+
+    def stats(self) -> dict:
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(
+                size=self.size,
+                in_use=self._in_use,
+                idle=len(self._idle),
+                min_size=self.min_size,
+                max_size=self.max_size,
+            )
+        return stats
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _, _ = self._idle.pop()
+                self._close(conn)
+            self._cond.notify_all()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Pool a nivel de módulo: Streamlit solo re-ejecuta main.py, así que se comparte entre sesiones."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+# Segundos esperando una conexión del pool en el contexto actual (hilo o tarea);
+# services/metricas.py mide la diferencia alrededor de cada reporte
+_espera_conexion = contextvars.ContextVar("espera_conexion", default=0.0)
+
+
+def espera_conexion() -> float:
+    return _espera_conexion.get()
+
+
+@contextmanager
+def get_connection():
+    """Presta una conexión del pool; hace commit/rollback y la devuelve al salir.
+
+    Dentro de un db.ejecucion.contexto (consultas de reportes) antes espera su
+    lugar en la admisión y la transacción corre con el statement_timeout del reporte.
+    """
+    pool = get_pool()
+    with admitir():
+        inicio = time.perf_counter()
+        conn = pool.getconn()
+        _espera_conexion.set(_espera_conexion.get() + time.perf_counter() - inicio)
+        broken = False
+        try:
+            # El commit también dentro: la conexión sigue en el turno (cancelable) hasta terminar
+            with ejecutar(conn):
+                yield conn
+                conn.commit()
+        except BaseException:
+            # BaseException: incluye GeneratorExit cuando se abandona un stream_query
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+            raise
+        finally:
+            pool.putconn(conn, discard=broken or bool(conn.closed))
+
+
+class SentenciaPreparada(str):
+    """SQL (con %s) que además tiene un nombre y su versión con $1..$n para PREPARE.
+
+    Como es un str, sirve igual en cursores con nombre, EXPLAIN o subconsultas;
+    execute_query la ejecuta con EXECUTE en las conexiones donde ya está preparada.
+    """
+
+    def __new__(cls, sql: str, nombre: str, sql_preparado: str):
+        sentencia = super().__new__(cls, sql)
+        sentencia.nombre = nombre
+        sentencia.sql_preparado = sql_preparado
+        return sentencia
+
+
+# conexión -> nombres preparados en esa sesión (se olvidan cuando la conexión se cierra)
+_preparadas = weakref.WeakKeyDictionary()
+_preparadas_lock = threading.Lock()
+_stats_preparadas = {"prepares": 0, "reutilizadas": 0, "reprepares": 0}
+
+
+def preparar(cur, query: SentenciaPreparada) -> bool:
+    """PREPARE en la conexión de `cur` si todavía no está preparada ahí (sin ejecutarla)."""
+    conn = cur.connection
+    with _preparadas_lock:
+        nombres = _preparadas.setdefault(conn, set())
+        if query.nombre in nombres:
+            return False
+        _stats_preparadas["prepares"] += 1
+    cur.execute(f"PREPARE {query.nombre} AS {query.sql_preparado}")
+    with _preparadas_lock:
+        nombres.add(query.nombre)
+    return True
+
+
+def execute_query(cur, query: str, params=None):
+    """cur.execute, salvo para SentenciaPreparada: PREPARE la primera vez en la conexión y luego EXECUTE."""
+    if not PREPARED_STATEMENTS or not isinstance(query, SentenciaPreparada):
+        cur.execute(query, params)
+        return
+    punto = ""
+    if not preparar(cur, query):
+        with _preparadas_lock:
+            _stats_preparadas["reutilizadas"] += 1
+        if not cur.connection.autocommit:
+            # Si la sesión perdió la sentencia se vuelve solo hasta aquí: lo anterior de la
+            # transacción (p. ej. el statement_timeout de db/ejecucion) sigue vigente
+            punto = "SAVEPOINT sentencia_preparada; "
+    argumentos = f" ({', '.join(['%s'] * len(params))})" if params else ""
+    try:
+        cur.execute(f"{punto}EXECUTE {query.nombre}{argumentos}", params or None)
+        if punto:
+            # En otro cursor, para no perder el resultado ya traído en `cur`; sin el
+            # RELEASE cada EXECUTE de la transacción deja una subtransacción abierta
+            with cur.connection.cursor() as aux:
+                aux.execute("RELEASE SAVEPOINT sentencia_preparada")
+    except psycopg2.errors.InvalidSqlStatementName:
+        # La sesión perdió la sentencia (DISCARD ALL, reinicio del pooler): se vuelve a preparar
+        if punto:
+            cur.execute("ROLLBACK TO SAVEPOINT sentencia_preparada; RELEASE SAVEPOINT sentencia_preparada")
+        with _preparadas_lock:
+            _stats_preparadas["reprepares"] += 1
+        cur.execute(f"PREPARE {query.nombre} AS {query.sql_preparado}")
+        cur.execute(f"EXECUTE {query.nombre}{argumentos}", params or None)
+
+
+def prepared_stats() -> dict:
+    """PREPARE emitidos y EXECUTE que reutilizaron una sentencia ya preparada."""
+    with _preparadas_lock:
+        stats = dict(_stats_preparadas)
+        stats["conexiones"] = len(_preparadas)
+        stats["sentencias"] = sum(len(n) for n in _preparadas.values())
+    total = stats["prepares"] + stats["reutilizadas"]
+    stats["reutilizacion"] = stats["reutilizadas"] / total if total else 0.0
+    return stats
+
+
+def plan_cache(conn) -> list[dict]:
+    """Planes genéricos/personalizados de cada sentencia preparada en la sesión de `conn`."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT name, generic_plans, custom_plans
+            FROM pg_prepared_statements
+            ORDER BY name
+        """)
+        return cur.fetchall()
+
+
+_cursor_ids = itertools.count()
+
+
+def stream_query(query: str, params=None, batch_size: int | None = None, columnar: bool = False):
+    """Ejecuta `query` con un cursor con nombre (del lado del servidor).
+
+    Produce tuplas (columnas, filas) por lote, donde filas es una lista de
+    tuplas; con `columnar` cada lote es en cambio una lista de columnas
+    (una lista de valores por columna). El primer lote siempre se produce
+    (aunque venga vacío) para que el consumidor conozca las columnas. La
+    conexión vuelve al pool cuando el generador se agota o se cierra.
+    """
+    batch_size = batch_size or STREAM_BATCH_SIZE
+    with get_connection() as conn:
+        name = f"stream_{os.getpid()}_{next(_cursor_ids)}"
+        with conn.cursor(name=name, cursor_factory=TupleCursor) as cur:
+            cur.itersize = batch_size
+            cur.execute(query, params)
+            rows = cur.fetchmany(batch_size)
+            columns = [col.name for col in cur.description]
+            yield columns, _columnas(rows, len(columns)) if columnar else rows
+            while rows:
+                rows = cur.fetchmany(batch_size)
+                if rows:
+                    yield columns, _columnas(rows, len(columns)) if columnar else rows
+
+
+def _columnas(rows: list[tuple], n: int) -> list[list]:
+    if not rows:
+        return [[] for _ in range(n)]
+    return [list(col) for col in zip(*rows)]
+
+
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\n": "\\n", "\r": "\\r", "\t": "\\t"})
+
+
+def _copy_value(value) -> str:
+    """Valor en el formato de texto de COPY."""
+    if value is None:
+        return r"\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, str):
+        return value.translate(_COPY_ESCAPES)
+    return str(value)
+
+
+def copy_rows(cur, table: str, columns: list[str], rows, batch_size: int | None = None) -> int:
+    """COPY ... FROM STDIN por lotes, sin armar la tabla completa en memoria.
+
+    `rows` es cualquier iterable de tuplas en el orden de `columns`; se
+    ejecuta en la transacción del cursor. Devuelve las filas copiadas.
+    """
+    batch_size = batch_size or COPY_BATCH_SIZE
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+    total = 0
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, batch_size))
+        if not chunk:
+            break
+        buf = io.StringIO("".join("\t".join(map(_copy_value, row)) + "\n" for row in chunk))
+        cur.copy_expert(sql, buf)
+        total += len(chunk)
+    return total
@@ -0,0 +1,277 @@
+"""Control de admisión, timeouts y cancelación de las consultas de reportes.
+
+db/connection.get_connection() pasa por aquí cuando se llama dentro de
+`contexto(reporte)` (services/orquestador.py y services/metricas.medir lo
+abren); las herramientas y el resto de las conexiones no se ven afectadas:
+
+- Admisión: como mucho REPORTS_MAX_CONSULTAS consultas de reportes a la vez;
+  las demás esperan en una cola FIFO de hasta REPORTS_MAX_COLA lugares y
+  REPORTS_ESPERA_COLA segundos.
+- Timeout: cada transacción corre con SET LOCAL statement_timeout según
+  REPORTS_STATEMENT_TIMEOUT o REPORTS_STATEMENT_TIMEOUT_<REPORTE>.
+- Cancelación: una consulta pertenece a un Turno (sesión y sección del panel);
+  cuando la sesión pide la misma sección con otros filtros, el turno anterior
+  se cancela con connection.cancel() (pg_cancel_backend del lado del servidor).
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.errors
+
+# Consultas de reportes ejecutándose a la vez (por debajo de DB_POOL_MAX_SIZE,
+# así quedan conexiones para las herramientas y el listener)
+REPORTS_MAX_CONSULTAS = int(os.getenv("REPORTS_MAX_CONSULTAS", "6"))
+# Consultas esperando turno; con la cola llena se rechazan
+REPORTS_MAX_COLA = int(os.getenv("REPORTS_MAX_COLA", "50"))
+# Segundos máximos en la cola
+REPORTS_ESPERA_COLA = float(os.getenv("REPORTS_ESPERA_COLA", "20"))
+# statement_timeout en segundos (0 = sin límite); se puede ajustar con REPORTS_STATEMENT_TIMEOUT_<REPORTE>
+REPORTS_STATEMENT_TIMEOUT = float(os.getenv("REPORTS_STATEMENT_TIMEOUT", "60"))
+
+
+class ConsultaCancelada(Exception):
+    """La sesión pidió otros filtros para la misma sección y la consulta se canceló."""
+
+
+class ConsultaVencida(TimeoutError):
+    """La consulta superó su statement_timeout o su espera en la cola."""
+
+
+class ConsultaRechazada(psycopg2.OperationalError):
+    """La cola de admisión está llena."""
+
+
+def statement_timeout(reporte: str) -> float:
+    return float(os.getenv(f"REPORTS_STATEMENT_TIMEOUT_{reporte.upper()}", REPORTS_STATEMENT_TIMEOUT))
+
+
+_stats_lock = threading.Lock()
+_stats = {
+    "admitidas": 0, "encoladas": 0, "rechazadas": 0, "vencidas_en_cola": 0,
+    "canceladas": 0, "vencidas": 0, "espera_cola_segundos": 0.0,
+}
+
+
+def _contar(**valores):
+    with _stats_lock:
+        for nombre, valor in valores.items():
+            _stats[nombre] += valor
+
+
+class Turno:
+    """Pedido de una sesión para una sección; junta las conexiones que están consultando por él."""
+
+    def __init__(self, clave, filtros: dict | None = None):
+        self.clave = clave
+        self.filtros = filtros
+        self.cancelado = False
+        self._conexiones = set()
+        self._lock = threading.Lock()
+
+    def registrar(self, conn) -> bool:
+        """Asocia la conexión al turno; False si el turno ya se canceló."""
+        with self._lock:
+            if self.cancelado:
+                return False
+            self._conexiones.add(conn)
+            return True
+
+    def liberar(self, conn):
+        """Se llama antes de devolver `conn` al pool: espera a un cancelar() en curso."""
+        with self._lock:
+            self._conexiones.discard(conn)
+
+    def cancelar(self):
+        # El cancel se envía con el lock tomado: una conexión registrada no puede
+        # volver al pool (y pasar a otra sesión) hasta que termine de enviarse
+        with self._lock:
+            self.cancelado = True
+            for conn in self._conexiones:
+                try:
+                    conn.cancel()
+                except psycopg2.Error:
+                    pass  # la conexión se cerró mientras tanto
+        _admision.despertar()
+
+
+_turnos = {}  # clave -> Turno en curso
+_turnos_lock = threading.Lock()
+
+
+def nuevo_turno(clave, filtros: dict) -> Turno:
+    """Turno para un pedido de `clave` (p. ej. (sesión, reporte)).
+
+    Si el turno anterior de la clave sigue en curso con otros filtros, se
+    cancela; con los mismos filtros sigue (el pedido nuevo se agrupa con él en
+    la cache de reportes).
+    """
+    turno = Turno(clave, filtros)
+    with _turnos_lock:
+        anterior = _turnos.get(clave)
+        _turnos[clave] = turno
+    if anterior is not None and anterior.filtros != filtros:
+        anterior.cancelar()
+    return turno
+
+
+def terminar_turno(turno: Turno):
+    with _turnos_lock:
+        if _turnos.get(turno.clave) is turno:
+            del _turnos[turno.clave]
+
+
+class Admision:
+    """Semáforo con cola FIFO: los pedidos entran en orden de llegada."""
+
+    def __init__(self, limite: int = REPORTS_MAX_CONSULTAS, max_cola: int = REPORTS_MAX_COLA,
+                 espera: float = REPORTS_ESPERA_COLA):
+        self.limite = limite
+        self.max_cola = max_cola
+        self.espera = espera
+        self._cond = threading.Condition()
+        self._en_curso = 0
+        self._cola = deque()
+
+    def entrar(self, turno: Turno | None = None):
+        with self._cond:
+            if self._en_curso < self.limite and not self._cola:
+                self._en_curso += 1
+                _contar(admitidas=1)
+                return
+            # Los cancelados que todavía no se despertaron no ocupan lugar
+            esperando = sum(1 for _, t in self._cola if t is None or not t.cancelado)
+            if esperando >= self.max_cola:
+                _contar(rechazadas=1)
+                raise ConsultaRechazada(f"Hay {esperando} consultas esperando turno")
+            ticket = (object(), turno)
+            self._cola.append(ticket)
+            inicio = time.monotonic()
+            _contar(encoladas=1)
+            try:
+                while True:
+                    # Antes de ver si le toca: un cancelado no ocupa el lugar aunque llegue al frente
+                    if turno is not None and turno.cancelado:
+                        _contar(canceladas=1)
+                        raise ConsultaCancelada("Cancelada mientras esperaba turno")
+                    if self._cola[0] is ticket and self._en_curso < self.limite:
+                        break
+                    restante = inicio + self.espera - time.monotonic()
+                    if restante <= 0:
+                        _contar(vencidas_en_cola=1)
+                        raise ConsultaVencida(f"Esperó más de {self.espera:g}s en la cola")
+                    self._cond.wait(restante)
+                self._en_curso += 1
+                _contar(admitidas=1)
+            finally:
+                self._cola.remove(ticket)
+                _contar(espera_cola_segundos=time.monotonic() - inicio)
+                self._cond.notify_all()
+
+    def salir(self):
+        with self._cond:
+            self._en_curso -= 1
+            self._cond.notify_all()
+
+    def despertar(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"en_curso": self._en_curso, "en_cola": len(self._cola), "limite": self.limite}
+
+
+_admision = Admision()
+
+# (reporte, turno) de las consultas del contexto actual (hilo o tarea)
+_contexto = contextvars.ContextVar("contexto_consulta", default=None)
+# Si el contexto ya ocupa un lugar de la admisión (conexiones anidadas no toman otro)
+_admitida = contextvars.ContextVar("consulta_admitida", default=False)
+
+
+@contextmanager
+def contexto(reporte: str, turno: Turno | None = None):
+    """Las conexiones que se pidan dentro del bloque son consultas de `reporte`.
+
+    Sin `turno` se conserva el del contexto exterior (p. ej. un reporte medido
+    dentro de una tarea del orquestador).
+    """
+    actual = _contexto.get()
+    if turno is None and actual is not None:
+        turno = actual[1]
+    token = _contexto.set((reporte, turno))
+    try:
+        yield
+    finally:
+        _contexto.reset(token)
+
+
+@contextmanager
+def aparte():
+    """Las conexiones del bloque no son del reporte en curso: trabajo compartido
+    entre sesiones (p. ej. reconstruir un índice) que no debe cancelarse ni
+    cortarse con el timeout de un reporte."""
+    token = _contexto.set(None)
+    try:
+        yield
+    finally:
+        _contexto.reset(token)
+
+
+@contextmanager
+def admitir():
+    """Lugar en la admisión para la consulta del contexto (nada fuera de contexto)."""
+    actual = _contexto.get()
+    if actual is None or _admitida.get():
+        yield
+        return
+    _admision.entrar(actual[1])
+    token = _admitida.set(True)
+    try:
+        yield
+    finally:
+        _admitida.reset(token)
+        _admision.salir()
+
+
+@contextmanager
+def ejecutar(conn):
+    """Aplica el statement_timeout del reporte, registra `conn` en el turno y
+    traduce QueryCanceled a ConsultaCancelada o ConsultaVencida."""
+    actual = _contexto.get()
+    if actual is None:
+        yield
+        return
+    reporte, turno = actual
+    if turno is not None and not turno.registrar(conn):
+        _contar(canceladas=1)
+        raise ConsultaCancelada(f"{reporte}: la sesión pidió otros filtros")
+    try:
+        timeout = statement_timeout(reporte)
+        if timeout > 0:
+            with conn.cursor() as cur:
+                cur.execute("SELECT set_config('statement_timeout', %s, true)", [f"{int(timeout * 1000)}ms"])
+        yield
+    except psycopg2.errors.QueryCanceled as e:
+        if turno is not None and turno.cancelado:
+            _contar(canceladas=1)
+            raise ConsultaCancelada(f"{reporte}: la sesión pidió otros filtros") from e
+        _contar(vencidas=1)
+        raise ConsultaVencida(f"{reporte}: superó el statement_timeout de {timeout:g}s") from e
+    finally:
+        if turno is not None:
+            turno.liberar(conn)
+
+
+def ejecucion_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats.update(_admision.stats())
+    with _turnos_lock:
+        stats["turnos"] = len(_turnos)
+    return stats
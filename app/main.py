@@ -1,165 +1,393 @@
+import logging
+import os
+import uuid
 import streamlit as st
 from services.reports import (
-    get_donaciones_por_campana,
-    get_voluntarios_por_actividad,
-    get_donaciones_por_donante,
-    get_distribucion_voluntarios_por_edad,
-    get_efectividad_campanas
+    frame_donaciones_por_campana,
+    frame_voluntarios_por_actividad,
+    get_ranking_donantes,
+    count_ranking_donantes,
+    frame_distribucion_voluntarios_por_edad,
+    frame_efectividad_campanas,
+    frame_recurso_utilizado_por_campana
 )
-from components.ui_elements import render_table, render_metric, render_filters
-from services.reports import get_recurso_utilizado_por_campana
-import pandas as pd
+from components.filtros import (
+    valores_por_defecto,
+    filtros_donaciones_por_campana,
+    filtros_voluntarios_por_actividad,
+    filtros_donaciones_por_donante,
+    filtros_distribucion_voluntarios_por_edad,
+    filtros_efectividad_campanas,
+    filtros_recurso_utilizado_por_campana,
+    filtros_asignacion_voluntarios
+)
+from services.asignacion import NIVELES, get_candidatos_actividad, get_habilidades
+from components.ui_elements import render_table, render_metric, render_filters, render_diagnostico
+from services.orquestador import dispatch_reportes, iter_resultados
+from services.metricas import consultas_lentas, marcar_lista, resumen, start_metrics_server
+from services.cache import get_cache
+from db.connection import get_pool, prepared_stats
+from db.ejecucion import ejecucion_stats
 from utils.helpers import format_currency, format_percentage
-from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Muestra en la barra lateral el interruptor del panel de diagnóstico
+DIAGNOSTICO_ENABLED = os.getenv("DASHBOARD_DIAGNOSTICO", "1") == "1"
+# Cada cuántos segundos se redibujan las secciones que la cache actualiza con los
+# eventos de la base (0 = solo al interactuar); se leen de la cache, sin consultas
+REFRESCO_SEGUNDOS = float(os.getenv("DASHBOARD_REFRESCO_SEGUNDOS", "10"))
+REFRESCO = REFRESCO_SEGUNDOS or None
+# Filas del ranking de donantes que se conservan en la sesión al "Cargar más";
+# al pasarse se descartan las primeras
+RANKING_MAX_FILAS = int(os.getenv("DASHBOARD_RANKING_MAX_FILAS", "500"))
+
+# Endpoint /metrics para Prometheus (una vez por proceso)
+start_metrics_server()
 
 st.set_page_config(page_title="Reportería ONG", layout="wide")
 st.title("Panel de Reportería - ONG")
 
-# Fechas por defecto para los filtros
-default_start = datetime.now() - timedelta(days=365)
-default_end = datetime.now() + timedelta(days=365)
+# Valor inicial de cada widget de filtro (key -> valor)
+DEFAULTS = valores_por_defecto()
+
+
+def valor(key: str):
+    """Valor actual de un filtro, aunque su widget todavía no se haya dibujado."""
+    return st.session_state.get(key, DEFAULTS[key])
+
+
+# Cada sección es un st.fragment: al cambiar uno de sus filtros solo se
+# re-ejecuta esa sección (y su consulta), no el resto del panel. Las de
+# donaciones y efectividad además se redibujan cada REFRESCO_SEGUNDOS con lo
+# que la cache ya tiene actualizado por los eventos de la base.
+
+def nueva_interaccion():
+    st.session_state["consultas_interaccion"] = 0
+
+
+def sesion() -> str:
+    """Identificador de la sesión: sus consultas nuevas cancelan las que quedaron viejas."""
+    if "sesion" not in st.session_state:
+        st.session_state["sesion"] = uuid.uuid4().hex
+    return st.session_state["sesion"]
+
+
+def aviso_espera(contenedor):
+    """al_esperar de iter_resultados: muestra qué falta y deja que un filtro nuevo corte la espera."""
+    def avisar(pendientes, segundos):
+        contenedor.caption(f"Consultando {', '.join(pendientes)}… {segundos:.0f} s")
+    return avisar
+
+
+def datos_seccion(nombre: str, func, filtros: dict, prefetch):
+    """Resultado del reporte: el precargado si los filtros no cambiaron, si no se consulta.
+
+    El precargado solo vale en la ejecución completa: al refrescarse sola, la
+    sección recibe el mismo argumento y debe volver a leer (de la cache).
+    """
+    if prefetch is not None and prefetch[0] == filtros and st.session_state.get("ejecucion_completa"):
+        _, datos, error = prefetch
+    else:
+        st.session_state["consultas_interaccion"] = st.session_state.get("consultas_interaccion", 0) + 1
+        logger.info("Consulta %s (%d en esta interacción)", nombre, st.session_state["consultas_interaccion"])
+        estado = st.empty()
+        futures = dispatch_reportes({nombre: (func, filtros)}, sesion=sesion())
+        _, datos, error = next(iter_resultados(futures, al_esperar=aviso_espera(estado)))
+        estado.empty()
+    if error is not None:
+        st.error(f"No se pudo cargar el reporte: {error}")
+        return None
+    return datos
+
 
 # Reporte 1: Donaciones por Campaña
-st.markdown("---")
-st.header("Resumen de Donaciones por Campaña")
-
-with st.expander("Filtros"):
-    fecha_inicio_don = st.date_input("Fecha inicio donaciones", value=default_start, key="fecha_inicio_don")
-    fecha_fin_don = st.date_input("Fecha fin donaciones", value=default_end, key="fecha_fin_don")
-    monto_min = st.number_input("Monto mínimo", min_value=0.0, value=0.0, step=10.0, key="monto_min")
-    monto_max = st.number_input("Monto máximo", min_value=0.0, value=10000.0, step=10.0, key="monto_max")
-
-donaciones = get_donaciones_por_campana(
-    fecha_inicio=fecha_inicio_don,
-    fecha_fin=fecha_fin_don,
-    monto_minimo=monto_min,
-    monto_maximo=monto_max
-)
+@st.fragment(run_every=REFRESCO)
+def seccion_donaciones_por_campana(prefetch=None):
+    st.markdown("---")
+    st.header("Resumen de Donaciones por Campaña")
 
-render_table("Donaciones por Campaña", donaciones)
+    with st.expander("Filtros"):
+        st.date_input("Fecha inicio donaciones", value=DEFAULTS["fecha_inicio_don"], key="fecha_inicio_don", on_change=nueva_interaccion)
+        st.date_input("Fecha fin donaciones", value=DEFAULTS["fecha_fin_don"], key="fecha_fin_don", on_change=nueva_interaccion)
+        st.number_input("Monto mínimo", min_value=0.0, value=DEFAULTS["monto_min"], step=10.0, key="monto_min", on_change=nueva_interaccion)
+        st.number_input("Monto máximo", min_value=0.0, value=DEFAULTS["monto_max"], step=10.0, key="monto_max", help="0 = sin límite", on_change=nueva_interaccion)
 
-if donaciones:
-    monto_total = sum(d["monto_total"] or 0 for d in donaciones)
-    total_donaciones = sum(d["total_donaciones"] or 0 for d in donaciones)
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.write("### Total Donaciones")
-        render_metric("Total Donaciones", total_donaciones)
-    
-    with col2:
-        st.write("### Monto Total")
-        render_metric("Monto Total", format_currency(monto_total))
+    filtros_don = filtros_donaciones_por_campana(valor)
+    donaciones = datos_seccion("donaciones_por_campana", frame_donaciones_por_campana, filtros_don, prefetch)
+    if donaciones is None:
+        return
+
+    render_table("Donaciones por Campaña", donaciones, report="donaciones_por_campana", filters=filtros_don)
+
+    if not donaciones.empty:
+        # Columnas float64/int64: reducciones vectorizadas (los NULL se ignoran)
+        monto_total = float(donaciones["monto_total"].sum())
+        total_donaciones = int(donaciones["total_donaciones"].sum())
+
+        col1, col2 = st.columns(2)
+
+        with col1:
+            st.write("### Total Donaciones")
+            render_metric("Total Donaciones", total_donaciones)
+
+        with col2:
+            st.write("### Monto Total")
+            render_metric("Monto Total", format_currency(monto_total))
 
 
 # Reporte 2: Voluntarios por Actividad
-st.markdown("---")
-st.header("Participación de Voluntarios por Actividad")
-
-with st.expander("Filtros"):
-    fecha_inicio_vol = st.date_input("Fecha inicio actividades", value=default_start, key="fecha_inicio_vol")
-    fecha_fin_vol = st.date_input("Fecha fin actividades", value=default_end, key="fecha_fin_vol")
-    edad_min = st.number_input("Edad mínima", min_value=16, max_value=100, value=18, key="edad_min")
-    edad_max = st.number_input("Edad máxima", min_value=16, max_value=100, value=65, key="edad_max")
-
-voluntarios = get_voluntarios_por_actividad(
-    fecha_inicio=fecha_inicio_vol,
-    fecha_fin=fecha_fin_vol,
-    edad_minima=edad_min,
-    edad_maxima=edad_max
-)
-render_table("Voluntarios por Actividad", voluntarios)
+@st.fragment
+def seccion_voluntarios_por_actividad(prefetch=None):
+    st.markdown("---")
+    st.header("Participación de Voluntarios por Actividad")
+
+    with st.expander("Filtros"):
+        st.date_input("Fecha inicio actividades", value=DEFAULTS["fecha_inicio_vol"], key="fecha_inicio_vol", on_change=nueva_interaccion)
+        st.date_input("Fecha fin actividades", value=DEFAULTS["fecha_fin_vol"], key="fecha_fin_vol", on_change=nueva_interaccion)
+        st.number_input("Edad mínima", min_value=16, max_value=100, value=DEFAULTS["edad_min"], key="edad_min", on_change=nueva_interaccion)
+        st.number_input("Edad máxima", min_value=16, max_value=100, value=DEFAULTS["edad_max"], key="edad_max", on_change=nueva_interaccion)
+
+    filtros_vol = filtros_voluntarios_por_actividad(valor)
+    voluntarios = datos_seccion("voluntarios_por_actividad", frame_voluntarios_por_actividad, filtros_vol, prefetch)
+    if voluntarios is None:
+        return
+
+    render_table("Voluntarios por Actividad", voluntarios, report="voluntarios_por_actividad", filters=filtros_vol)
+
+    if not voluntarios.empty:
+        total_voluntarios = int(voluntarios["total_voluntarios"].sum())
+        st.write("### Total voluntariados")
+        render_metric("Total voluntariados", total_voluntarios)
 
-if voluntarios:
-    total_voluntarios = sum(v["total_voluntarios"] or 0 for v in voluntarios)
-    st.write("### Total voluntariados")
-    render_metric("Total voluntariados", total_voluntarios)
 
 # Reporte 3: Donaciones por Donante
-st.markdown("---")
-st.header("Donaciones por Donante")
-
-with st.expander("Filtros"):
-    fecha_inicio_donante = st.date_input("Fecha inicio", value=default_start, key="fecha_inicio_donante")
-    fecha_fin_donante = st.date_input("Fecha fin", value=default_end, key="fecha_fin_donante")
-    tipo_donante = st.selectbox("Tipo de donante", ["Todos", "individual", "empresa"], key="tipo_donante")
-    monto_min_donante = st.number_input("Monto mínimo", min_value=0.0, value=100.0, step=10.0, key="monto_min_donante")
-
-donantes = get_donaciones_por_donante(
-    fecha_inicio=fecha_inicio_donante,
-    fecha_fin=fecha_fin_donante,
-    tipo_donante=tipo_donante if tipo_donante != "Todos" else None,
-    monto_minimo=monto_min_donante
-)
-render_table("Donaciones por Donante", donantes)
+def cargar_mas_donantes():
+    ranking = st.session_state["ranking_donantes"]
+    st.session_state["consultas_interaccion"] = 1
+    pagina = get_ranking_donantes(**ranking["filtros"], cursor=ranking["cursor"])
+    ranking["rows"].extend(pagina["rows"])
+    ranking["cursor"] = pagina["next_cursor"]
+    sobrantes = len(ranking["rows"]) - RANKING_MAX_FILAS
+    if sobrantes > 0:
+        del ranking["rows"][:sobrantes]
+        ranking["descartadas"] += sobrantes
 
-# Reporte 4: Distribución de Voluntarios por Edad
-st.markdown("---")
-st.header("Distribución de Voluntarios por Edad")
-
-with st.expander("Filtros"):
-    fecha_inicio_edad = st.date_input("Fecha inicio", value=default_start, key="fecha_inicio_edad")
-    fecha_fin_edad = st.date_input("Fecha fin", value=default_end, key="fecha_fin_edad")
-    genero = st.selectbox("Género", ["Todos", "Masculino", "Femenino", "Otro"], key="genero")
-    actividad_id = st.number_input("ID de Actividad (opcional)", min_value=1, value=None, key="actividad_id")
-
-distribucion = get_distribucion_voluntarios_por_edad(
-    fecha_inicio=fecha_inicio_edad,
-    fecha_fin=fecha_fin_edad,
-    genero=genero if genero != "Todos" else None,
-    actividad_id=actividad_id if actividad_id else None
-)
-render_table("Distribución por Edad", distribucion)
 
-if distribucion:
-    st.bar_chart(
-        data=distribucion,
-        x="grupo_edad",
-        y="total_voluntarios",
-        use_container_width=True
-    )
+def volver_inicio_donantes():
+    st.session_state.pop("ranking_donantes", None)
+    nueva_interaccion()
 
-# Reporte 5: Efectividad de Campañas
-st.markdown("---")
-st.header("Efectividad de Campañas")
-
-with st.expander("Filtros"):
-    fecha_inicio_efectividad = st.date_input("Fecha inicio", value=default_start, key="fecha_inicio_efectividad")
-    fecha_fin_efectividad = st.date_input("Fecha fin", value=default_end, key="fecha_fin_efectividad")
-    monto_min_efectividad = st.number_input("Monto objetivo mínimo", min_value=0.0, value=0.0, step=10.0, key="monto_min_efectividad")
-    monto_max_efectividad = st.number_input("Monto objetivo máximo", min_value=0.0, value=100000.0, step=10.0, key="monto_max_efectividad")
-    estado_campana = st.selectbox("Estado de la campaña", ["Todos", "activa", "finalizada", "planificada", "pausada"], key="estado_campana")
-
-efectividad = get_efectividad_campanas(
-    fecha_inicio=fecha_inicio_efectividad,
-    fecha_fin=fecha_fin_efectividad,
-    monto_objetivo_min=monto_min_efectividad,
-    monto_objetivo_max=monto_max_efectividad,
-    estado=estado_campana if estado_campana != "Todos" else None
-)
 
-# Formatear porcentaje para mostrar
-if efectividad:
-    df_efectividad = pd.DataFrame(efectividad)
-    df_efectividad['porcentaje_cumplimiento'] = df_efectividad['porcentaje_cumplimiento'].apply(lambda x: f"{x:.2%}")    
-    
-    render_table("Efectividad de Campañas", df_efectividad.to_dict('records'))
-    
+@st.fragment
+def seccion_donaciones_por_donante(prefetch=None):
+    st.markdown("---")
+    st.header("Donaciones por Donante")
+
+    with st.expander("Filtros"):
+        st.date_input("Fecha inicio", value=DEFAULTS["fecha_inicio_donante"], key="fecha_inicio_donante", on_change=nueva_interaccion)
+        st.date_input("Fecha fin", value=DEFAULTS["fecha_fin_donante"], key="fecha_fin_donante", on_change=nueva_interaccion)
+        st.selectbox("Tipo de donante", ["Todos", "individual", "empresa"], key="tipo_donante", on_change=nueva_interaccion)
+        st.number_input("Monto mínimo", min_value=0.0, value=DEFAULTS["monto_min_donante"], step=10.0, key="monto_min_donante", on_change=nueva_interaccion)
+
+    filtros_donante = filtros_donaciones_por_donante(valor)
+
+    # Ranking paginado por cursor: cada "Cargar más" pide solo la página siguiente y
+    # la sesión guarda a lo sumo RANKING_MAX_FILAS filas (una ventana del ranking)
+    ranking = st.session_state.get("ranking_donantes")
+    if ranking is None or ranking["filtros"] != filtros_donante:
+        pagina = datos_seccion("donaciones_por_donante", get_ranking_donantes, filtros_donante, prefetch)
+        if pagina is None:
+            return
+        ranking = {"filtros": filtros_donante, "rows": list(pagina["rows"]), "cursor": pagina["next_cursor"],
+                   "descartadas": 0}
+        st.session_state["ranking_donantes"] = ranking
+
+    render_table("Donaciones por Donante", ranking["rows"], report="donaciones_por_donante", filters=filtros_donante)
+
     col1, col2 = st.columns(2)
     with col1:
-        st.write("### Campañas más efectivas")
+        if ranking["cursor"] is not None:
+            st.button("Cargar más donantes", key="ranking_mas", on_click=cargar_mas_donantes)
+        if ranking["descartadas"]:
+            st.button("Volver al inicio del ranking", key="ranking_inicio", on_click=volver_inicio_donantes)
+    with col2:
+        if st.checkbox("Mostrar total de donantes", key="ranking_total", on_change=nueva_interaccion):
+            desde = ranking["descartadas"] + 1
+            hasta = ranking["descartadas"] + len(ranking["rows"])
+            render_metric("Donantes", f"{desde}–{hasta} de {count_ranking_donantes(**filtros_donante)}")
+
+
+# Reporte 4: Distribución de Voluntarios por Edad
+@st.fragment
+def seccion_distribucion_voluntarios_por_edad(prefetch=None):
+    st.markdown("---")
+    st.header("Distribución de Voluntarios por Edad")
+
+    with st.expander("Filtros"):
+        st.date_input("Fecha inicio", value=DEFAULTS["fecha_inicio_edad"], key="fecha_inicio_edad", on_change=nueva_interaccion)
+        st.date_input("Fecha fin", value=DEFAULTS["fecha_fin_edad"], key="fecha_fin_edad", on_change=nueva_interaccion)
+        st.selectbox("Género", ["Todos", "Masculino", "Femenino", "Otro"], key="genero", on_change=nueva_interaccion)
+        st.number_input("ID de Actividad (opcional)", min_value=1, value=DEFAULTS["actividad_id"], key="actividad_id", on_change=nueva_interaccion)
+
+    filtros_edad = filtros_distribucion_voluntarios_por_edad(valor)
+    distribucion = datos_seccion("distribucion_voluntarios_por_edad", frame_distribucion_voluntarios_por_edad, filtros_edad, prefetch)
+    if distribucion is None:
+        return
+
+    render_table("Distribución por Edad", distribucion, report="distribucion_voluntarios_por_edad", filters=filtros_edad)
+
+    if not distribucion.empty:
         st.bar_chart(
-            data=df_efectividad.head(5),
-            x="campana",
-            y="porcentaje_cumplimiento",
+            data=distribucion,
+            x="grupo_edad",
+            y="total_voluntarios",
             use_container_width=True
         )
+
+
+# Reporte 5: Efectividad de Campañas
+@st.fragment(run_every=REFRESCO)
+def seccion_efectividad_campanas(prefetch=None):
+    st.markdown("---")
+    st.header("Efectividad de Campañas")
+
+    with st.expander("Filtros"):
+        st.date_input("Fecha inicio", value=DEFAULTS["fecha_inicio_efectividad"], key="fecha_inicio_efectividad", on_change=nueva_interaccion)
+        st.date_input("Fecha fin", value=DEFAULTS["fecha_fin_efectividad"], key="fecha_fin_efectividad", on_change=nueva_interaccion)
+        st.number_input("Monto objetivo mínimo", min_value=0.0, value=DEFAULTS["monto_min_efectividad"], step=10.0, key="monto_min_efectividad", on_change=nueva_interaccion)
+        st.number_input("Monto objetivo máximo", min_value=0.0, value=DEFAULTS["monto_max_efectividad"], step=10.0, key="monto_max_efectividad", on_change=nueva_interaccion)
+        st.selectbox("Estado de la campaña", ["Todos", "activa", "finalizada", "planificada", "pausada"], key="estado_campana", on_change=nueva_interaccion)
+
+    filtros_efectividad = filtros_efectividad_campanas(valor)
+    efectividad = datos_seccion("efectividad_campanas", frame_efectividad_campanas, filtros_efectividad, prefetch)
+
+    # Formatear porcentaje para mostrar
+    if efectividad is not None and not efectividad.empty:
+        # Copia: el DataFrame de la cache no se modifica
+        df_efectividad = efectividad.copy()
+        df_efectividad['porcentaje_cumplimiento'] = df_efectividad['porcentaje_cumplimiento'].map("{:.2%}".format)
+
+        render_table("Efectividad de Campañas", df_efectividad, report="efectividad_campanas", filters=filtros_efectividad)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write("### Campañas más efectivas")
+            st.bar_chart(
+                data=df_efectividad.head(5),
+                x="campana",
+                y="porcentaje_cumplimiento",
+                use_container_width=True
+            )
+        with col2:
+            st.write("### Recaudación por campaña")
+            st.bar_chart(
+                data=df_efectividad,
+                x="campana",
+                y="monto_recaudado",
+                use_container_width=True
+            )
+
+
+# Reporte 6: Recursos por Campaña
+@st.fragment
+def seccion_recurso_utilizado_por_campana(prefetch=None):
+    st.markdown("---")
+    st.header("Recursos por Campaña")
+
+    with st.expander("Filtros"):
+        st.date_input("Actividades desde", value=DEFAULTS["fecha_inicio_recurso"], key="fecha_inicio_recurso", on_change=nueva_interaccion)
+        st.date_input("Actividades hasta", value=DEFAULTS["fecha_fin_recurso"], key="fecha_fin_recurso", on_change=nueva_interaccion)
+        st.text_input("Recurso", value=DEFAULTS["tipo_recurso"], key="tipo_recurso", on_change=nueva_interaccion)
+        st.number_input("Avance mínimo (%)", min_value=0.0, value=DEFAULTS["porcentaje_min_recurso"], step=5.0, key="porcentaje_min_recurso", on_change=nueva_interaccion)
+
+    filtros_recurso = filtros_recurso_utilizado_por_campana(valor)
+    recursos = datos_seccion("recurso_utilizado_por_campana", frame_recurso_utilizado_por_campana, filtros_recurso, prefetch)
+    if recursos is None:
+        return
+
+    render_table("Recursos por Campaña", recursos, report="recurso_utilizado_por_campana", filters=filtros_recurso)
+
+    if not recursos.empty:
+        completos = int((recursos["porcentaje_completado"] >= 100).sum())
+        col1, col2 = st.columns(2)
+        with col1:
+            render_metric("Recursos completos", f"{completos} de {len(recursos)}")
+        with col2:
+            render_metric("Avance promedio", f"{recursos['porcentaje_completado'].mean():.1f}%")
+
+
+# Reporte 7: Asignación de Voluntarios (índice en memoria, services/asignacion.py)
+@st.fragment
+def seccion_asignacion_voluntarios(prefetch=None):
+    st.markdown("---")
+    st.header("Asignación de Voluntarios")
+
+    with st.expander("Filtros", expanded=True):
+        habilidades = get_habilidades()
+        st.number_input("ID de Actividad", min_value=1, value=DEFAULTS["actividad_asignacion"], key="actividad_asignacion", on_change=nueva_interaccion)
+        st.multiselect("Habilidades requeridas", sorted(habilidades, key=habilidades.get), format_func=habilidades.get, key="habilidades_asignacion", on_change=nueva_interaccion)
+        st.selectbox("Nivel mínimo", NIVELES, key="nivel_asignacion", on_change=nueva_interaccion)
+        st.checkbox("Excluir inscritos", value=DEFAULTS["excluir_inscritos_asignacion"], key="excluir_inscritos_asignacion", on_change=nueva_interaccion)
+
+    filtros_asignacion = filtros_asignacion_voluntarios(valor)
+    asignacion = datos_seccion("asignacion_voluntarios", get_candidatos_actividad, filtros_asignacion, prefetch)
+    if asignacion is None:
+        return
+    actividad = asignacion["actividad"]
+    if actividad is None:
+        st.info("Ingrese una actividad para ver los voluntarios disponibles." if not filtros_asignacion["actividad_id"]
+                else "No existe la actividad.")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        render_metric("Candidatos", f"{asignacion['total']:,}")
     with col2:
-        st.write("### Recaudación por campaña")
-        st.bar_chart(
-            data=df_efectividad,
-            x="campana",
-            y="monto_recaudado",
-            use_container_width=True
-        )
\ No newline at end of file
+        capacidad = actividad["capacidad_max"]
+        render_metric("Cupos libres", f"{max(capacidad - actividad['inscritos'], 0)} de {capacidad}" if capacidad else "Sin límite")
+    with col3:
+        render_metric("Búsqueda", f"{asignacion['ms']:.1f} ms")
+    st.caption(f"{actividad['nombre']}: {actividad['fecha_inicio']:%d/%m/%Y %H:%M} a {actividad['fecha_fin']:%d/%m/%Y %H:%M}")
+
+    if asignacion["total"] > len(asignacion["rows"]):
+        st.caption(f"Se muestran y exportan los primeros {len(asignacion['rows'])}.")
+    # Sin filtros: el export se identifica por el contenido (el índice cambia con los eventos)
+    render_table("Candidatos", asignacion["rows"], report="asignacion_voluntarios")
+
+
+# reporte -> (función, filtros actuales, sección)
+SECCIONES = {
+    "donaciones_por_campana": (frame_donaciones_por_campana, filtros_donaciones_por_campana, seccion_donaciones_por_campana),
+    "voluntarios_por_actividad": (frame_voluntarios_por_actividad, filtros_voluntarios_por_actividad, seccion_voluntarios_por_actividad),
+    "donaciones_por_donante": (get_ranking_donantes, filtros_donaciones_por_donante, seccion_donaciones_por_donante),
+    "distribucion_voluntarios_por_edad": (frame_distribucion_voluntarios_por_edad, filtros_distribucion_voluntarios_por_edad, seccion_distribucion_voluntarios_por_edad),
+    "efectividad_campanas": (frame_efectividad_campanas, filtros_efectividad_campanas, seccion_efectividad_campanas),
+    "recurso_utilizado_por_campana": (frame_recurso_utilizado_por_campana, filtros_recurso_utilizado_por_campana, seccion_recurso_utilizado_por_campana),
+    "asignacion_voluntarios": (get_candidatos_actividad, filtros_asignacion_voluntarios, seccion_asignacion_voluntarios),
+}
+
+# En una ejecución completa las consultas se lanzan juntas con los filtros
+# guardados en la sesión, y cada sección se dibuja en su lugar apenas llega
+# su resultado
+contenedores = {nombre: st.container() for nombre in SECCIONES}
+filtros = {nombre: filtros_fn(valor) for nombre, (_, filtros_fn, _) in SECCIONES.items()}
+futures = dispatch_reportes({nombre: (func, filtros[nombre]) for nombre, (func, _, _) in SECCIONES.items()}, sesion=sesion())
+st.session_state["consultas_interaccion"] = len(futures)
+st.session_state["ejecucion_completa"] = True
+estado = st.sidebar.empty()
+try:
+    for nombre, datos, error in iter_resultados(futures, al_esperar=aviso_espera(estado)):
+        with contenedores[nombre]:
+            SECCIONES[nombre][2]((filtros[nombre], datos, error))
+finally:
+    # También si un filtro nuevo corta la ejecución a mitad de camino
+    st.session_state["ejecucion_completa"] = False
+estado.empty()
+# Con `streamlit run main.py` (sin serve.py) la primera carga completa hace de calentamiento
+marcar_lista()
+
+st.sidebar.caption(f"Consultas en la última interacción: {st.session_state['consultas_interaccion']}")
+
+if DIAGNOSTICO_ENABLED and st.sidebar.toggle("Panel de diagnóstico", key="diagnostico"):
+    render_diagnostico(resumen(), consultas_lentas(), get_pool().stats(), get_cache().stats(), prepared_stats(), ejecucion_stats())
@@ -0,0 +1,38 @@
+"""Arranque del contenedor: calienta el proceso y después levanta Streamlit en él.
+
+Uso (desde app/, con los mismos argumentos que `streamlit run`):
+    python serve.py --server.port=8501 --server.address=0.0.0.0
+
+Streamlit ejecuta main.py en este mismo proceso, así que el pool, las
+sentencias preparadas y la cache de reportes que deja services/arranque.py son
+los que usa la primera sesión. /ready (puerto de métricas) responde 503 hasta
+que termina el calentamiento; /_stcore/health recién existe cuando Streamlit
+ya está escuchando, después del calentamiento.
+"""
+import logging
+import os
+import sys
+
+# Calentamiento desactivable (p. ej. para desarrollo con una base vacía)
+ARRANQUE_CALENTAR = os.getenv("ARRANQUE_CALENTAR", "1") == "1"
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    from services.metricas import marcar_lista, start_metrics_server
+
+    # /metrics y /ready antes de calentar, para que el healthcheck vea el 503
+    start_metrics_server()
+    if ARRANQUE_CALENTAR:
+        from services.arranque import calentar
+        calentar()
+    else:
+        marcar_lista()
+
+    from streamlit.web import cli
+    sys.argv = ["streamlit", "run", os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py"), *sys.argv[1:]]
+    sys.exit(cli.main())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Calentamiento al arrancar el proceso: pool, sentencias preparadas y resultados por defecto.
+
+app/serve.py lo ejecuta antes de levantar Streamlit, así que la primera carga
+de la página no paga conexiones nuevas, PREPARE ni consultas: los reportes con
+los filtros por defecto ya están en la cache. GET /ready (services/metricas.py)
+responde 503 hasta que termina.
+"""
+import logging
+import os
+import time
+from contextlib import ExitStack
+
+import psycopg2
+
+from components.filtros import REPORTES_PANEL, valores_por_defecto
+from db.connection import POOL_MAX_SIZE, PREPARED_STATEMENTS, get_connection, preparar
+from services.definiciones import REPORTES
+from services.metricas import marcar_lista
+from services.orquestador import dispatch_reportes, iter_resultados
+
+logger = logging.getLogger(__name__)
+
+# Conexiones que se abren y preparan (las que ocupa una carga completa del panel)
+ARRANQUE_CONEXIONES = int(os.getenv("ARRANQUE_CONEXIONES", str(min(POOL_MAX_SIZE, len(REPORTES_PANEL)))))
+# Segundos que se espera a que la base acepte conexiones (el contenedor db puede tardar)
+ARRANQUE_ESPERA_DB = float(os.getenv("ARRANQUE_ESPERA_DB", "60"))
+
+
+def esperar_base(espera: float = ARRANQUE_ESPERA_DB) -> int:
+    """Reintenta hasta poder prestar una conexión; devuelve los intentos fallidos."""
+    limite = time.monotonic() + espera
+    fallidos = 0
+    while True:
+        try:
+            with get_connection():
+                return fallidos
+        except psycopg2.OperationalError:
+            fallidos += 1
+            if time.monotonic() >= limite:
+                raise
+            time.sleep(1)
+
+
+def precargar() -> dict:
+    """Ejecuta los reportes del panel con los filtros por defecto; {reporte: error o None}."""
+    defaults = valores_por_defecto()
+    tareas = {nombre: (func, filtros(defaults.__getitem__)) for nombre, (func, filtros) in REPORTES_PANEL.items()}
+    return {nombre: error for nombre, _, error in iter_resultados(dispatch_reportes(tareas))}
+
+
+def preparar_sentencias(conexiones: int = ARRANQUE_CONEXIONES) -> int:
+    """PREPARE de las sentencias ya compiladas en `conexiones` conexiones del pool.
+
+    Se toman todas a la vez para que sean conexiones distintas; al devolverlas
+    quedan en el pool con las sentencias preparadas. Devuelve los PREPARE emitidos.
+    """
+    if not PREPARED_STATEMENTS:
+        return 0
+    sentencias = [s for reporte in REPORTES.values() for s in reporte.compiladas()]
+    emitidos = 0
+    with ExitStack() as pila:
+        for _ in range(conexiones):
+            conn = pila.enter_context(get_connection())
+            with conn.cursor() as cur:
+                for sentencia in sentencias:
+                    emitidos += preparar(cur, sentencia)
+    return emitidos
+
+
+def calentar() -> dict:
+    """Corre los pasos del calentamiento y marca la app como lista.
+
+    Un paso que falla se registra y no frena a los demás: la app arranca igual
+    y esas consultas se hacen en la primera carga.
+    """
+    resumen = {}
+    inicio = time.perf_counter()
+    pasos = (
+        ("base", esperar_base),
+        ("precarga", precargar),
+        ("sentencias", preparar_sentencias),
+    )
+    for nombre, paso in pasos:
+        t0 = time.perf_counter()
+        try:
+            resultado = paso()
+        except Exception:
+            logger.exception("Falló el paso %s del calentamiento", nombre)
+            resumen[f"{nombre}_error"] = 1
+            if nombre == "base":
+                break
+            continue
+        finally:
+            resumen[f"{nombre}_segundos"] = round(time.perf_counter() - t0, 3)
+        if nombre == "precarga":
+            resumen["reportes_precargados"] = sum(error is None for error in resultado.values())
+            for reporte, error in resultado.items():
+                if error is not None:
+                    logger.warning("No se pudo precargar %s: %s", reporte, error)
+        elif nombre == "sentencias":
+            resumen["sentencias_preparadas"] = resultado
+    resumen["segundos"] = round(time.perf_counter() - inicio, 3)
+    logger.info("Calentamiento terminado: %s", resumen)
+    marcar_lista(resumen)
+    return resumen
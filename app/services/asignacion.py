@@ -0,0 +1,489 @@
+"""Asignación de voluntarios a actividades con índices en memoria.
+
+Responde "qué voluntarios activos están libres en la ventana de esta actividad
+y tienen las habilidades X con nivel >= Y" sin recorrer voluntario ni
+disponibilidad_voluntario en cada consulta:
+
+- Cada voluntario ocupa un bit; los conjuntos son enteros de Python (bitsets)
+  y una consulta es un AND entre ellos.
+- Habilidades: por habilidad, un bitset por nivel mínimo (>= básico,
+  >= intermedio, >= avanzado).
+- Disponibilidad: cada día de la semana se corta en las horas donde empieza o
+  termina alguna franja. Entre dos cortes los voluntarios libres son siempre
+  los mismos y se guardan como bitset; una ventana es el AND de los tramos que
+  cubre (dos franjas seguidas, 9-12 y 12-15, cubren una actividad de 10 a 14).
+
+Los triggers de V008 avisan por CANAL_CAMBIOS qué voluntarios cambiaron y la
+siguiente consulta recarga solo esos. Sin listener, el índice se reconstruye
+cada ASIGNACION_TTL segundos.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from datetime import datetime, time as dtime, timedelta
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+from psycopg2.extensions import cursor as TupleCursor
+
+from db.connection import get_connection
+from db.ejecucion import aparte
+from services.cache import listener_activo, start_listener, suscribir_cambios
+from services.metricas import instrumentado, registrar_consulta, registrar_gauges
+
+logger = logging.getLogger(__name__)
+
+# Sin listener de cambios, segundos hasta reconstruir el índice
+ASIGNACION_TTL = float(os.getenv("ASIGNACION_TTL", "600"))
+# Con más voluntarios pendientes que esto se reconstruye en lugar de recargarlos
+ASIGNACION_MAX_INCREMENTAL = int(os.getenv("ASIGNACION_MAX_INCREMENTAL", "5000"))
+# Filas de detalle que devuelve el panel (el total se calcula igual)
+ASIGNACION_LIMITE = int(os.getenv("ASIGNACION_LIMITE", "500"))
+
+# Mismo orden que date.weekday() y que los enums de la base
+DIAS = ["lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"]
+NIVELES = ["básico", "intermedio", "avanzado"]
+TABLAS = {"voluntario", "disponibilidad_voluntario", "voluntario_habilidad", "habilidad"}
+
+FIN_DEL_DIA = 24 * 3600
+_DIA = {dia: i for i, dia in enumerate(DIAS)}
+_NIVEL = {nivel: i for i, nivel in enumerate(NIVELES)}
+
+
+def _segundos(hora: dtime, fin: bool = False) -> int:
+    segundos = hora.hour * 3600 + hora.minute * 60 + hora.second
+    # Una franja "hasta las 23:59:59" llega al final del día
+    if fin and segundos >= FIN_DEL_DIA - 1:
+        return FIN_DEL_DIA
+    return segundos
+
+
+def tramos_ventana(inicio: datetime, fin: datetime) -> list[tuple[int, int, int]]:
+    """(día de la semana, desde, hasta) en segundos por cada día que toca [inicio, fin)."""
+    tramos = []
+    dia = inicio.date()
+    while datetime.combine(dia, dtime()) < fin:
+        siguiente = dia + timedelta(days=1)
+        desde = max(inicio, datetime.combine(dia, dtime()))
+        hasta = min(fin, datetime.combine(siguiente, dtime()))
+        tramos.append((
+            dia.weekday(),
+            _segundos(desde.time()),
+            FIN_DEL_DIA if hasta.date() == siguiente else _segundos(hasta.time()),
+        ))
+        dia = siguiente
+    return tramos
+
+
+def _bitset(posiciones: Iterable[int], bits: int) -> int:
+    buffer = bytearray((bits + 7) // 8)
+    for p in posiciones:
+        buffer[p >> 3] |= 1 << (p & 7)
+    return int.from_bytes(buffer, "little")
+
+
+class IndiceVoluntarios:
+    """Bitsets de voluntarios activos, por habilidad y nivel, y por tramo de cada día.
+
+    Las consultas y las actualizaciones toman el mismo lock; los avisos del
+    listener solo anotan qué recargar y se aplican en la siguiente consulta.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._avisos_lock = threading.Lock()
+        self._pendientes = set()
+        self._reconstruir = True
+        self._recargar_nombres = False
+        self._construido_en = 0.0
+        self._stats = {"reconstrucciones": 0, "actualizaciones": 0, "consultas": 0}
+        self._vaciar()
+
+    def _vaciar(self):
+        self._posiciones = {}   # voluntario_id -> bit
+        self._ids = []          # bit -> voluntario_id (-1 si se borró)
+        self._ids_array = None  # self._ids como np.ndarray, para traducir resultados
+        self._activos = 0
+        self._niveles = {}      # habilidad_id -> [>= básico, >= intermedio, >= avanzado]
+        self._cortes = [[] for _ in DIAS]  # por día, segundos ordenados
+        self._tramos = [[] for _ in DIAS]  # por día, bitset de [cortes[i], cortes[i + 1])
+        self._franjas = {}      # voluntario_id -> [(día, desde, hasta)]
+        self._habilidades = {}  # voluntario_id -> {habilidad_id: nivel}
+        self.nombres = {}       # habilidad_id -> nombre
+
+    # --- Construcción ---------------------------------------------------------
+
+    def construir(self, voluntarios, franjas, habilidades, nombres: dict):
+        """Reemplaza el índice con filas (voluntario_id, activo), (voluntario_id,
+        día, hora_inicio, hora_fin) y (voluntario_id, habilidad_id, nivel)."""
+        posiciones, ids, activos = {}, [], []
+        for voluntario_id, activo in voluntarios:
+            posiciones[voluntario_id] = len(ids)
+            if activo:
+                activos.append(len(ids))
+            ids.append(voluntario_id)
+        bits = len(ids)
+
+        por_voluntario = {}
+        cortes = [set() for _ in DIAS]
+        for voluntario_id, dia, hora_inicio, hora_fin in franjas:
+            if voluntario_id not in posiciones:
+                continue
+            franja = (_DIA[dia], _segundos(hora_inicio), _segundos(hora_fin, fin=True))
+            por_voluntario.setdefault(voluntario_id, []).append(franja)
+            cortes[franja[0]].update(franja[1:])
+
+        por_habilidad = {}
+        niveles_voluntario = {}
+        for voluntario_id, habilidad_id, nivel in habilidades:
+            if voluntario_id not in posiciones:
+                continue
+            nivel = _NIVEL[nivel]
+            niveles_voluntario.setdefault(voluntario_id, {})[habilidad_id] = nivel
+            listas = por_habilidad.setdefault(habilidad_id, [[] for _ in NIVELES])
+            for minimo in range(nivel + 1):
+                listas[minimo].append(posiciones[voluntario_id])
+
+        cortes = [sorted(c) for c in cortes]
+        buffers = [[bytearray((bits + 7) // 8) for _ in range(max(len(c) - 1, 0))] for c in cortes]
+        for voluntario_id, lista in por_voluntario.items():
+            p = posiciones[voluntario_id]
+            byte, mascara = p >> 3, 1 << (p & 7)
+            for dia, desde, hasta in lista:
+                c = cortes[dia]
+                for tramo in range(bisect.bisect_left(c, desde), bisect.bisect_left(c, hasta)):
+                    buffers[dia][tramo][byte] |= mascara
+
+        with self._lock:
+            self._vaciar()
+            self._posiciones, self._ids = posiciones, ids
+            self._activos = _bitset(activos, bits)
+            self._niveles = {h: [_bitset(l, bits) for l in listas] for h, listas in por_habilidad.items()}
+            self._cortes = cortes
+            self._tramos = [[int.from_bytes(b, "little") for b in dia] for dia in buffers]
+            self._franjas = por_voluntario
+            self._habilidades = niveles_voluntario
+            self.nombres = dict(nombres)
+            self._construido_en = time.monotonic()
+            self._stats["reconstrucciones"] += 1
+
+    def actualizar(self, voluntario_id: int, activo: Optional[bool], franjas=(), habilidades=()):
+        """Reemplaza los datos de un voluntario (activo None = se borró)."""
+        with self._lock:
+            posicion = self._posiciones.get(voluntario_id)
+            if posicion is not None:
+                self._quitar(voluntario_id, posicion)
+            elif activo is None:
+                return
+            else:
+                posicion = self._posiciones[voluntario_id] = len(self._ids)
+                self._ids.append(voluntario_id)
+            self._ids_array = None
+            if activo is None:
+                del self._posiciones[voluntario_id]
+                self._ids[posicion] = -1
+                return
+
+            bit = 1 << posicion
+            if activo:
+                self._activos |= bit
+            propias = []
+            for dia, hora_inicio, hora_fin in franjas:
+                franja = (_DIA[dia], _segundos(hora_inicio), _segundos(hora_fin, fin=True))
+                inicio, fin = self._cortar(franja[0], franja[1]), self._cortar(franja[0], franja[2])
+                tramos = self._tramos[franja[0]]
+                for tramo in range(inicio, fin):
+                    tramos[tramo] |= bit
+                propias.append(franja)
+            niveles = {}
+            for habilidad_id, nivel in habilidades:
+                niveles[habilidad_id] = _NIVEL[nivel]
+                bitsets = self._niveles.setdefault(habilidad_id, [0] * len(NIVELES))
+                for minimo in range(_NIVEL[nivel] + 1):
+                    bitsets[minimo] |= bit
+            self._franjas[voluntario_id] = propias
+            self._habilidades[voluntario_id] = niveles
+            self._stats["actualizaciones"] += 1
+
+    def _quitar(self, voluntario_id: int, posicion: int):
+        mascara = ~(1 << posicion)
+        self._activos &= mascara
+        for habilidad_id in self._habilidades.pop(voluntario_id, {}):
+            bitsets = self._niveles[habilidad_id]
+            for minimo in range(len(bitsets)):
+                bitsets[minimo] &= mascara
+        for dia, desde, hasta in self._franjas.pop(voluntario_id, []):
+            cortes, tramos = self._cortes[dia], self._tramos[dia]
+            for tramo in range(bisect.bisect_left(cortes, desde), bisect.bisect_left(cortes, hasta)):
+                tramos[tramo] &= mascara
+
+    def _cortar(self, dia: int, segundo: int) -> int:
+        """Índice del corte `segundo` del día; si no existía, parte el tramo que lo contiene.
+
+        Los cortes no se eliminan al quitar franjas: un tramo de más no cambia
+        los resultados y la siguiente reconstrucción los compacta.
+        """
+        cortes, tramos = self._cortes[dia], self._tramos[dia]
+        i = bisect.bisect_left(cortes, segundo)
+        if i < len(cortes) and cortes[i] == segundo:
+            return i
+        cortes.insert(i, segundo)
+        if len(cortes) == 1:
+            pass  # todavía no hay tramos
+        elif i == 0:
+            tramos.insert(0, 0)
+        elif i == len(cortes) - 1:
+            tramos.append(0)
+        else:
+            # Las dos mitades tienen a los mismos voluntarios libres
+            tramos.insert(i, tramos[i - 1])
+        return i
+
+    # --- Consultas ------------------------------------------------------------
+
+    def _libres(self, dia: int, desde: int, hasta: int) -> int:
+        cortes, tramos = self._cortes[dia], self._tramos[dia]
+        if desde >= hasta:
+            return -1  # tramo vacío: no restringe (AND con todos los bits)
+        if not cortes or desde < cortes[0] or hasta > cortes[-1]:
+            return 0
+        bits = -1
+        for tramo in range(bisect.bisect_right(cortes, desde) - 1, bisect.bisect_left(cortes, hasta)):
+            bits &= tramos[tramo]
+            if not bits:
+                break
+        return bits
+
+    def buscar(self, tramos: Iterable[tuple[int, int, int]], requisitos: Optional[dict] = None,
+               excluir: Iterable[int] = ()) -> int:
+        """Bitset de los activos libres en todos los `tramos` con {habilidad_id: nivel mínimo}."""
+        with self._lock:
+            bits = self._activos
+            for habilidad_id, nivel in (requisitos or {}).items():
+                bitsets = self._niveles.get(habilidad_id)
+                bits &= bitsets[_NIVEL[nivel]] if bitsets else 0
+            for dia, desde, hasta in tramos:
+                if not bits:
+                    break
+                bits &= self._libres(dia, desde, hasta)
+            excluidos = [self._posiciones[v] for v in excluir if v in self._posiciones]
+            if bits and excluidos:
+                bits &= ~_bitset(excluidos, len(self._ids))
+            self._stats["consultas"] += 1
+            return bits
+
+    def ids(self, bits: int, limite: Optional[int] = None) -> np.ndarray:
+        """voluntario_id de los bits encendidos, en el orden de los bits."""
+        with self._lock:
+            if self._ids_array is None:
+                self._ids_array = np.array(self._ids, dtype=np.int64)
+            ids = self._ids_array
+        if not bits:
+            return ids[:0]
+        tamano = (len(ids) + 7) // 8
+        encendidos = np.unpackbits(np.frombuffer(bits.to_bytes(tamano, "little"), dtype=np.uint8), bitorder="little")
+        posiciones = np.flatnonzero(encendidos[:len(ids)])
+        return ids[posiciones[:limite]]
+
+    @staticmethod
+    def contar(bits: int) -> int:
+        return bits.bit_count()
+
+    # --- Refresco -------------------------------------------------------------
+
+    def avisar(self, evento: Optional[dict]):
+        """Suscriptor de services/cache.py: anota qué recargar (corre en el hilo del listener)."""
+        if evento is not None and evento.get("tabla") not in TABLAS:
+            return
+        with self._avisos_lock:
+            if evento is None:
+                self._reconstruir = True
+            elif evento["tabla"] == "habilidad":
+                self._recargar_nombres = True
+            elif evento.get("voluntarios") is None:
+                self._reconstruir = True
+            else:
+                self._pendientes.update(evento["voluntarios"])
+
+    def asegurar(self):
+        """Aplica los avisos pendientes (o reconstruye) antes de consultar.
+
+        Los avisos se toman antes de leer la base: uno que llega durante la
+        lectura queda pendiente para la próxima vez (recargar dos veces a un
+        voluntario da lo mismo). Las lecturas van aparte del reporte que la
+        pidió: el índice es de todas las sesiones.
+        """
+        start_listener()
+        with self._lock, aparte():
+            vencido = not listener_activo() and time.monotonic() - self._construido_en > ASIGNACION_TTL
+            with self._avisos_lock:
+                reconstruir = self._reconstruir or vencido or len(self._pendientes) > ASIGNACION_MAX_INCREMENTAL
+                pendientes, self._pendientes = self._pendientes, set()
+                nombres = self._recargar_nombres
+                self._reconstruir = self._recargar_nombres = False
+            try:
+                if reconstruir:
+                    self.recargar()
+                    return
+                if nombres:
+                    with get_connection() as conn, conn.cursor(cursor_factory=TupleCursor) as cur:
+                        self.nombres = _leer_nombres(cur)
+                if pendientes:
+                    self.recargar_voluntarios(pendientes)
+            except Exception:
+                with self._avisos_lock:
+                    self._reconstruir |= reconstruir
+                    self._recargar_nombres |= nombres
+                    self._pendientes |= pendientes
+                raise
+
+    def recargar(self):
+        inicio = time.perf_counter()
+        with get_connection() as conn, conn.cursor(cursor_factory=TupleCursor) as cur:
+            # Las cuatro lecturas ven la misma foto de la base
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            filas = _leer_voluntarios(cur)
+        self.construir(*filas)
+        logger.info("Índice de asignación: %d voluntarios en %.2f s", len(self._posiciones), time.perf_counter() - inicio)
+
+    def recargar_voluntarios(self, voluntarios: Iterable[int]):
+        voluntarios = list(voluntarios)
+        with get_connection() as conn, conn.cursor(cursor_factory=TupleCursor) as cur:
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            activos, franjas, habilidades, _ = _leer_voluntarios(cur, voluntarios, nombres=False)
+        por_voluntario = {v: (None, [], []) for v in voluntarios}
+        for voluntario_id, activo in activos:
+            por_voluntario[voluntario_id] = (activo, [], [])
+        for voluntario_id, dia, hora_inicio, hora_fin in franjas:
+            por_voluntario[voluntario_id][1].append((dia, hora_inicio, hora_fin))
+        for voluntario_id, habilidad_id, nivel in habilidades:
+            por_voluntario[voluntario_id][2].append((habilidad_id, nivel))
+        with self._lock:
+            for voluntario_id, (activo, propias, niveles) in por_voluntario.items():
+                self.actualizar(voluntario_id, activo, propias, niveles)
+
+    def stats(self) -> dict:
+        with self._lock:
+            bitsets = [self._activos, *(b for niveles in self._niveles.values() for b in niveles),
+                       *(t for tramos in self._tramos for t in tramos)]
+            return {
+                **self._stats,
+                "voluntarios": len(self._posiciones),
+                "activos": self._activos.bit_count(),
+                "habilidades": len(self._niveles),
+                "tramos": sum(len(t) for t in self._tramos),
+                "bytes": sum((b.bit_length() + 7) // 8 for b in bitsets),
+                "pendientes": len(self._pendientes),
+                "edad_segundos": round(time.monotonic() - self._construido_en, 1) if self._construido_en else 0,
+            }
+
+
+def _leer_nombres(cur) -> dict:
+    cur.execute("SELECT habilidad_id, nombre FROM habilidad")
+    return dict(cur.fetchall())
+
+
+def _leer_voluntarios(cur, voluntarios: Optional[list] = None, nombres: bool = True) -> tuple:
+    """(voluntarios, franjas, habilidades, nombres) con las filas que usa construir()."""
+    where = "WHERE voluntario_id = ANY(%s)" if voluntarios is not None else "WHERE voluntario_id IS NOT NULL"
+    params = [voluntarios] if voluntarios is not None else []
+    cur.execute(f"SELECT voluntario_id, activo IS TRUE FROM voluntario {where}", params)
+    activos = cur.fetchall()
+    cur.execute(f"SELECT voluntario_id, dia::text, hora_inicio, hora_fin FROM disponibilidad_voluntario {where}", params)
+    franjas = cur.fetchall()
+    cur.execute(f"SELECT voluntario_id, habilidad_id, nivel::text FROM voluntario_habilidad {where}", params)
+    habilidades = cur.fetchall()
+    return activos, franjas, habilidades, _leer_nombres(cur) if nombres else {}
+
+
+_indice = IndiceVoluntarios()
+suscribir_cambios(_indice.avisar)
+registrar_gauges("asignacion", _indice.stats)
+
+
+def get_indice() -> IndiceVoluntarios:
+    return _indice
+
+
+def get_habilidades() -> dict:
+    """{habilidad_id: nombre} del índice ya cargado (para los filtros del panel)."""
+    return dict(_indice.nombres)
+
+
+# --- Reporte del panel ----------------------------------------------------------
+
+_ACTIVIDAD = """
+    SELECT a.actividad_id, a.nombre, a.fecha_inicio, a.fecha_fin, a.capacidad_max,
+           COALESCE(array_agg(va.voluntario_id) FILTER (WHERE va.voluntario_id IS NOT NULL), '{}') AS inscritos
+    FROM actividad a
+    LEFT JOIN voluntario_actividad va ON va.actividad_id = a.actividad_id AND va.estado IS DISTINCT FROM 'cancelado'
+    WHERE a.actividad_id = %s
+    GROUP BY a.actividad_id
+"""
+
+_DETALLE = """
+    SELECT v.voluntario_id,
+           CONCAT(v.nombre, ' ', v.apellido) AS voluntario,
+           v.email,
+           COALESCE(v.telefono, '') AS telefono,
+           COALESCE(string_agg(h.nombre || ' (' || vh.nivel || ')', ', ' ORDER BY h.nombre), '') AS habilidades
+    FROM voluntario v
+    LEFT JOIN voluntario_habilidad vh ON vh.voluntario_id = v.voluntario_id
+    LEFT JOIN habilidad h ON h.habilidad_id = vh.habilidad_id
+    WHERE v.voluntario_id = ANY(%s)
+    GROUP BY v.voluntario_id
+    ORDER BY v.voluntario_id
+"""
+
+_COLUMNAS = ["voluntario_id", "voluntario", "email", "telefono", "habilidades"]
+
+
+@instrumentado("reporte", "asignacion_voluntarios")
+def get_candidatos_actividad(
+    actividad_id: Optional[int] = None,
+    habilidades: tuple = (),
+    nivel_minimo: str = NIVELES[0],
+    excluir_inscritos: bool = True,
+    limite: int = ASIGNACION_LIMITE
+) -> dict:
+    """Voluntarios activos libres en la ventana de la actividad con las habilidades pedidas.
+
+    {"rows": DataFrame con los primeros `limite`, "total": candidatos,
+     "actividad": fila de la actividad (None si no existe), "ms": búsqueda en el índice}.
+    Sin actividad solo deja el índice cargado.
+    """
+    _indice.asegurar()
+    vacio = {"rows": pd.DataFrame(columns=_COLUMNAS), "total": 0, "actividad": None, "ms": 0.0}
+    if not actividad_id:
+        return vacio
+    with get_connection() as conn, conn.cursor() as cur:
+        registrar_consulta(_ACTIVIDAD, [actividad_id])
+        cur.execute(_ACTIVIDAD, [actividad_id])
+        actividad = cur.fetchone()
+        if actividad is None:
+            return vacio
+
+        inicio = time.perf_counter()
+        bits = _indice.buscar(
+            tramos_ventana(actividad["fecha_inicio"], actividad["fecha_fin"]),
+            {habilidad_id: nivel_minimo for habilidad_id in habilidades},
+            excluir=actividad["inscritos"] if excluir_inscritos else (),
+        )
+        ids = _indice.ids(bits, limite)
+        ms = (time.perf_counter() - inicio) * 1000
+
+        filas = []
+        if len(ids):
+            registrar_consulta(_DETALLE, [ids.tolist()])
+            cur.execute(_DETALLE, [ids.tolist()])
+            filas = cur.fetchall()
+    actividad = dict(actividad, inscritos=len(actividad["inscritos"]))
+    return {
+        "rows": pd.DataFrame(filas, columns=_COLUMNAS),
+        "total": _indice.contar(bits),
+        "actividad": actividad,
+        "ms": ms,
+    }
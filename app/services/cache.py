@@ -0,0 +1,628 @@
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import pickle
+import select
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from datetime import date, datetime
+from decimal import Decimal
+
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+from db.connection import _connect, get_connection
+from db.ejecucion import ConsultaCancelada
+from services.metricas import marcar_cache, registrar_gauges
+from utils.helpers import estimate_size
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = os.getenv("REPORT_CACHE_ENABLED", "1") == "1"
+CACHE_MAX_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "256"))
+CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Cada cuánto se consulta estadisticas_campana cuando no hay listener activo
+CACHE_POLL_INTERVAL = float(os.getenv("REPORT_CACHE_POLL_INTERVAL", "5"))
+CACHE_LISTEN = os.getenv("REPORT_CACHE_LISTEN", "1") == "1"
+# "memoria": cache del proceso (compartida por todas las sesiones de Streamlit);
+# "redis": compartida entre procesos/réplicas (Redis o compatible, p. ej. Valkey)
+CACHE_BACKEND = os.getenv("REPORT_CACHE_BACKEND", "memoria")
+CACHE_REDIS_URL = os.getenv("REPORT_CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_REDIS_PREFIX = os.getenv("REPORT_CACHE_REDIS_PREFIX", "reporteria:")
+# Máximo que una llamada espera el resultado de una idéntica en curso; luego consulta por su cuenta
+CACHE_WAIT_TIMEOUT = float(os.getenv("REPORT_CACHE_WAIT_TIMEOUT", "60"))
+
+# Canal alimentado por los triggers de database/DDL.sql: payload = tabla modificada,
+# o un evento JSON con el delta por campaña (migración V005)
+CANAL_CAMBIOS = "reporteria_cambios"
+TAG_DONACION = "donacion"
+TAG_VOLUNTARIO = "voluntario_actividad"
+
+
+class ReportCache:
+    """Cache LRU con TTL por entrada, límite de memoria e invalidación por tags.
+
+    Las entradas pueden traer una función `delta(valor, evento)` que devuelve el
+    valor actualizado con un evento de cambios (o None si no sabe aplicarlo).
+
+    Cada tag lleva una generación que avanza con cada invalidación o evento.
+    Un valor consultado mientras llegaba un evento de sus tags no se guarda
+    (`set(..., generacion=...)`): no se sabe si la consulta ya veía el cambio,
+    y el evento no encontró la entrada para aplicarse.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (valor, expira_en, tags, tamaño, delta)
+        self._bytes = 0
+        self._generaciones = {}  # tag -> eventos/invalidaciones recibidos
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0, "deltas": 0,
+                       "descartadas": 0}
+
+    def get(self, key, contar: bool = True):
+        """Devuelve (encontrado, valor). Con `contar=False` no suma hits/misses
+        (volver a mirar una llave ya contada)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += contar
+                return False, None
+            value, expires_at, _, _, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self._stats["expirations"] += 1
+                self._stats["misses"] += contar
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += contar
+            return True, value
+
+    def generacion(self, tags: tuple = ()) -> tuple:
+        """Marca a pasar a `set` si el valor se consulta a partir de ahora."""
+        with self._lock:
+            return self._generacion(tags)
+
+    def _generacion(self, tags) -> tuple:
+        return tuple(self._generaciones.get(tag, 0) for tag in sorted(tags))
+
+    def _avanzar(self, tags):
+        for tag in tags:
+            self._generaciones[tag] = self._generaciones.get(tag, 0) + 1
+
+    def set(self, key, value, ttl: float, tags: tuple = (), delta=None, generacion: tuple | None = None):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generacion is not None and self._generacion(tags) != generacion:
+                # Llegó un evento de sus tags mientras se consultaba
+                self._stats["descartadas"] += 1
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl, frozenset(tags), size, delta)
+            self._bytes += size
+            self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._stats["evictions"] += 1
+
+    def _remove(self, key):
+        _, _, _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def invalidate(self, *tags: str) -> int:
+        """Elimina las entradas que dependen de alguno de los tags indicados."""
+        tags = set(tags)
+        with self._lock:
+            self._avanzar(tags)
+            keys = [k for k, (_, _, entry_tags, _, _) in self._entries.items() if entry_tags & tags]
+            for key in keys:
+                self._remove(key)
+            self._stats["invalidations"] += len(keys)
+        return len(keys)
+
+    def apply_delta(self, evento: dict) -> int:
+        """Aplica un evento de cambios a las entradas con el tag evento["tabla"].
+
+        Las entradas sin función delta, o cuya función devuelve None, se invalidan.
+        Las actualizadas conservan su vencimiento: al expirar se vuelven a consultar.
+        Devuelve cuántas entradas se actualizaron.
+        """
+        tag = evento["tabla"]
+        with self._lock:
+            self._avanzar((tag,))
+            entradas = [(k, e) for k, e in self._entries.items() if tag in e[2]]
+
+        actualizadas = invalidadas = 0
+        for key, (value, expires_at, tags, _, delta) in entradas:
+            nuevo = None
+            if delta is not None:
+                try:
+                    nuevo = delta(value, evento)
+                except Exception:
+                    logger.exception("No se pudo aplicar el evento de %s a %s", tag, key[1])
+            size = estimate_size(nuevo) if nuevo is not None and nuevo is not value else 0
+            with self._lock:
+                actual = self._entries.get(key)
+                if actual is None or actual[0] is not value:
+                    continue  # expiró o se volvió a consultar mientras tanto
+                if nuevo is None:
+                    self._remove(key)
+                    invalidadas += 1
+                elif nuevo is not value:
+                    # Mismo lugar en el orden LRU
+                    self._entries[key] = (nuevo, expires_at, tags, size, delta)
+                    self._bytes += size - actual[3]
+                    actualizadas += 1
+        with self._lock:
+            self._stats["invalidations"] += invalidadas
+            self._stats["deltas"] += actualizadas
+            self._evict()
+        return actualizadas
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(entries=len(self._entries), bytes=self._bytes)
+        return stats
+
+    # Coordinación entre procesos: en memoria no hace falta (SingleFlight ya
+    # agrupa las llamadas del proceso)
+    def reservar(self, key, ttl: float) -> bool:
+        return True
+
+    def liberar(self, key):
+        pass
+
+    def esperar(self, key, timeout: float):
+        return False, None
+
+
+class RedisCache:
+    """Misma interfaz que ReportCache sobre Redis, compartida entre procesos.
+
+    Los valores se guardan con pickle y vencen con el TTL de Redis; cada tag es
+    un set con las llaves que dependen de él. El presupuesto de memoria y la
+    política de desalojo son los del servidor (maxmemory / maxmemory-policy).
+    Los eventos con delta invalidan: cada proceso recibe el mismo NOTIFY y no
+    se puede aplicar el delta una sola vez sobre el valor compartido. Las
+    generaciones por tag son las del proceso (cada uno recibe los mismos
+    eventos) y se comparan justo antes de escribir.
+    """
+
+    def __init__(self, url: str = CACHE_REDIS_URL, prefix: str = CACHE_REDIS_PREFIX,
+                 max_bytes: int = CACHE_MAX_BYTES):
+        import redis  # opcional: solo se necesita con REPORT_CACHE_BACKEND=redis
+
+        self._redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._generaciones = {}
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "errors": 0, "descartadas": 0}
+
+    def _key(self, key) -> str:
+        return self.prefix + hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+    def _tag(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
+
+    def _count(self, stat: str, n: int = 1):
+        with self._lock:
+            self._stats[stat] += n
+
+    def get(self, key, contar: bool = True):
+        try:
+            data = self._redis.get(self._key(key))
+        except Exception:
+            # Sin Redis se consulta la base directamente
+            logger.exception("No se pudo leer la cache de Redis")
+            self._count("errors")
+            data = None
+        if data is None:
+            self._count("misses", contar)
+            return False, None
+        self._count("hits", contar)
+        return True, pickle.loads(data)
+
+    def generacion(self, tags: tuple = ()) -> tuple:
+        with self._lock:
+            return tuple(self._generaciones.get(tag, 0) for tag in sorted(tags))
+
+    def set(self, key, value, ttl: float, tags: tuple = (), delta=None, generacion: tuple | None = None):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        if generacion is not None and self.generacion(tags) != generacion:
+            self._count("descartadas")
+            return
+        key = self._key(key)
+        try:
+            pipe = self._redis.pipeline()
+            pipe.set(key, data, px=int(ttl * 1000))
+            for tag in tags:
+                pipe.sadd(self._tag(tag), key)
+            pipe.execute()
+        except Exception:
+            logger.exception("No se pudo escribir en la cache de Redis")
+            self._count("errors")
+
+    def invalidate(self, *tags: str) -> int:
+        with self._lock:
+            for tag in tags:
+                self._generaciones[tag] = self._generaciones.get(tag, 0) + 1
+        try:
+            pipe = self._redis.pipeline()
+            for tag in tags:
+                pipe.smembers(self._tag(tag))
+                pipe.delete(self._tag(tag))
+            keys = set()
+            for members in pipe.execute()[::2]:
+                keys |= members
+            if keys:
+                self._redis.delete(*keys)
+        except Exception:
+            logger.exception("No se pudo invalidar la cache de Redis")
+            self._count("errors")
+            return 0
+        self._count("invalidations", len(keys))
+        return len(keys)
+
+    def apply_delta(self, evento: dict) -> int:
+        self.invalidate(evento["tabla"])
+        return 0
+
+    def clear(self):
+        keys = list(self._redis.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self._redis.delete(*keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        try:
+            stats.update(entries=self._redis.dbsize(), bytes=self._redis.info("memory")["used_memory"])
+        except Exception:
+            stats.update(entries=0, bytes=0)
+        return stats
+
+    def reservar(self, key, ttl: float) -> bool:
+        """True si este proceso debe calcular la llave (nadie más la está calculando)."""
+        try:
+            return bool(self._redis.set(self._key(key) + ":calculando", 1, nx=True, px=int(ttl * 1000)))
+        except Exception:
+            return True
+
+    def liberar(self, key):
+        try:
+            self._redis.delete(self._key(key) + ":calculando")
+        except Exception:
+            pass
+
+    def esperar(self, key, timeout: float):
+        """Espera a que otro proceso deje el valor; (False, None) si terminó sin dejarlo."""
+        limite = time.monotonic() + timeout
+        marca = self._key(key) + ":calculando"
+        while time.monotonic() < limite:
+            hit, value = self.get(key, contar=False)
+            if hit:
+                return hit, value
+            try:
+                if not self._redis.exists(marca):
+                    return self.get(key, contar=False)
+            except Exception:
+                break
+            time.sleep(0.05)
+        return False, None
+
+
+class SingleFlight:
+    """Una sola ejecución por llave a la vez: las llamadas idénticas concurrentes
+    esperan el resultado (o la excepción) de la que ya está en curso."""
+
+    def __init__(self, timeout: float = CACHE_WAIT_TIMEOUT):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._en_curso = {}  # key -> Future
+        self._stats = {"ejecuciones": 0, "agrupadas": 0, "esperas_vencidas": 0, "lider_cancelado": 0}
+
+    def do(self, key, func):
+        """Devuelve (ejecutada_aqui, valor)."""
+        with self._lock:
+            future = self._en_curso.get(key)
+            lider = future is None
+            if lider:
+                future = self._en_curso[key] = Future()
+                self._stats["ejecuciones"] += 1
+            else:
+                self._stats["agrupadas"] += 1
+        if not lider:
+            try:
+                return False, future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                with self._lock:
+                    self._stats["esperas_vencidas"] += 1
+                return True, func()
+            except ConsultaCancelada:
+                # Se canceló la sesión que la estaba calculando, no esta
+                with self._lock:
+                    self._stats["lider_cancelado"] += 1
+                return True, func()
+        try:
+            value = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return True, value
+        finally:
+            with self._lock:
+                del self._en_curso[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(en_curso=len(self._en_curso))
+        return stats
+
+
+def _crear_cache():
+    if CACHE_BACKEND == "redis":
+        return RedisCache()
+    if CACHE_BACKEND != "memoria":
+        raise ValueError(f"REPORT_CACHE_BACKEND inválido: {CACHE_BACKEND}")
+    return ReportCache()
+
+
+_cache = _crear_cache()
+_single_flight = SingleFlight()
+registrar_gauges("cache_reportes", _cache.stats)
+registrar_gauges("cache_single_flight", _single_flight.stats)
+
+
+def get_cache() -> ReportCache:
+    return _cache
+
+
+def _normalize(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, float)):
+        return float(value)
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_normalize(v) for v in value)
+    if isinstance(value, dict):  # **filtros
+        return tuple((k, _normalize(v)) for k, v in sorted(value.items()))
+    return value
+
+
+def _arguments(func, args, kwargs) -> dict:
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    return bound.arguments
+
+
+def make_key(func, args, kwargs) -> tuple:
+    """Llave = función + argumentos con nombre (defaults incluidos) normalizados."""
+    return (func.__module__, func.__qualname__) + tuple(
+        (name, _normalize(value)) for name, value in sorted(_arguments(func, args, kwargs).items())
+    )
+
+
+def _filtros(func, args, kwargs) -> dict:
+    """Argumentos con nombre de la llamada, con los **filtros aplanados."""
+    parametros = inspect.signature(func).parameters
+    filtros = {}
+    for name, value in _arguments(func, args, kwargs).items():
+        if parametros[name].kind is inspect.Parameter.VAR_KEYWORD:
+            filtros.update(value)
+        else:
+            filtros[name] = value
+    return filtros
+
+
+# --- Invalidación por escrituras ---------------------------------------------
+
+_ultimo_estado = None
+_ultimo_poll = 0.0
+_poll_lock = threading.Lock()
+
+
+def check_estadisticas():
+    """Invalida entradas si estadisticas_campana cambió desde el último sondeo."""
+    global _ultimo_estado, _ultimo_poll
+    if _listener.is_alive():
+        return
+    with _poll_lock:
+        if time.monotonic() - _ultimo_poll < CACHE_POLL_INTERVAL:
+            return
+        _ultimo_poll = time.monotonic()
+        try:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        SELECT MAX(ultima_actualizacion) AS ultima_actualizacion,
+                               COALESCE(SUM(num_donaciones), 0) AS num_donaciones,
+                               COALESCE(SUM(num_voluntarios), 0) AS num_voluntarios
+                        FROM estadisticas_campana
+                    """)
+                    estado = cur.fetchone()
+        except psycopg2.Error:
+            logger.exception("No se pudo consultar estadisticas_campana")
+            return
+
+        anterior, _ultimo_estado = _ultimo_estado, estado
+        if anterior is None or anterior == estado:
+            return
+        tags = []
+        if anterior["num_donaciones"] != estado["num_donaciones"]:
+            tags.append(TAG_DONACION)
+        if anterior["num_voluntarios"] != estado["num_voluntarios"]:
+            tags.append(TAG_VOLUNTARIO)
+        # Solo cambió la fecha (p. ej. un voluntario ya contado en otra actividad)
+        _cache.invalidate(*(tags or [TAG_DONACION, TAG_VOLUNTARIO]))
+
+
+_suscriptores = []
+
+
+def suscribir_cambios(callback):
+    """Llama a `callback(evento)` con cada aviso de CANAL_CAMBIOS.
+
+    Los avisos sin JSON llegan como {"tabla": payload}; None indica que el
+    listener se desconectó y pudo perder avisos. Corre en el hilo del
+    listener: tiene que ser rápido.
+    """
+    _suscriptores.append(callback)
+
+
+def _avisar(evento):
+    for callback in _suscriptores:
+        try:
+            callback(evento)
+        except Exception:
+            logger.exception("Falló un suscriptor de %s", CANAL_CAMBIOS)
+
+
+class ChangeListener(threading.Thread):
+    """Hilo que escucha NOTIFY en CANAL_CAMBIOS: aplica los eventos con delta e
+    invalida los tags del resto."""
+
+    def __init__(self, cache: ReportCache, reconnect_delay: float = 5.0):
+        super().__init__(name="report-cache-listener", daemon=True)
+        self.cache = cache
+        self.reconnect_delay = reconnect_delay
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self._listen()
+            except psycopg2.Error:
+                logger.exception("Listener de %s desconectado", CANAL_CAMBIOS)
+                # Mientras tanto no sabemos qué cambió
+                self.cache.invalidate(TAG_DONACION, TAG_VOLUNTARIO)
+                _avisar(None)
+                self._stop_event.wait(self.reconnect_delay)
+
+    def _listen(self):
+        conn = _connect()
+        try:
+            conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CANAL_CAMBIOS};")
+            while not self._stop_event.is_set():
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+                # En orden: un evento no se aplica sobre un resultado ya invalidado
+                tags = set()
+                while conn.notifies:
+                    payload = conn.notifies.pop(0).payload
+                    if not payload.startswith("{"):
+                        tags.add(payload)
+                        _avisar({"tabla": payload})
+                        continue
+                    if tags:
+                        self.cache.invalidate(*tags)
+                        tags.clear()
+                    evento = json.loads(payload, parse_float=Decimal)
+                    self.cache.apply_delta(evento)
+                    _avisar(evento)
+                if tags:
+                    self.cache.invalidate(*tags)
+        finally:
+            conn.close()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_listener = ChangeListener(_cache)
+_listener_lock = threading.Lock()
+
+
+def start_listener():
+    with _listener_lock:
+        if CACHE_LISTEN and not _listener.is_alive() and not _listener._stop_event.is_set():
+            try:
+                _listener.start()
+            except RuntimeError:
+                pass
+
+
+def listener_activo() -> bool:
+    return _listener.is_alive()
+
+
+def cached_report(ttl: float, tags: tuple = (), delta=None):
+    """Memoiza el resultado de una función de reporte por `ttl` segundos.
+
+    `delta(valor, evento, **filtros)` actualiza un resultado en cache con un
+    evento de CANAL_CAMBIOS en lugar de invalidarlo (None = no se puede).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not CACHE_ENABLED:
+                return func(*args, **kwargs)
+            start_listener()
+            check_estadisticas()
+            key = make_key(func, args, kwargs)
+            hit, value = _cache.get(key)
+            if hit:
+                marcar_cache(True)
+                return value
+
+            def calcular():
+                # Otro hilo pudo guardarlo entre el get y tomar la llave (el miss ya se contó)
+                hit, value = _cache.get(key, contar=False)
+                reservada = False
+                if not hit:
+                    reservada = _cache.reservar(key, CACHE_WAIT_TIMEOUT)
+                    if not reservada:
+                        # Otro proceso la está calculando (backend compartido)
+                        hit, value = _cache.esperar(key, CACHE_WAIT_TIMEOUT)
+                marcar_cache(hit)
+                if hit:
+                    return value
+                try:
+                    # Antes de consultar: si llega un evento de los tags en el medio, no se guarda
+                    generacion = _cache.generacion(tags)
+                    value = func(*args, **kwargs)
+                    aplicar = functools.partial(delta, **_filtros(func, args, kwargs)) if delta is not None else None
+                    _cache.set(key, value, ttl, tags, aplicar, generacion)
+                finally:
+                    # Si se venció la espera y se calcula igual, la marca es del otro proceso
+                    if reservada:
+                        _cache.liberar(key)
+                return value
+
+            ejecutada, value = _single_flight.do(key, calcular)
+            if not ejecutada:
+                # Agrupada con una llamada idéntica: no consultó la base
+                marcar_cache(True)
+            return value
+
+        wrapper.ttl = ttl
+        wrapper.tags = tags
+        wrapper.delta = delta
+        return wrapper
+    return decorator
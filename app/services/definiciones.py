@@ -0,0 +1,140 @@
+"""Reportes declarativos: columnas, agrupación y filtros en lugar de SQL concatenado.
+
+Cada combinación de filtros presentes (una máscara de bits) se compila una sola
+vez a una SentenciaPreparada; como el texto no depende de los valores,
+PostgreSQL la prepara una vez por conexión y la vuelve a ejecutar con EXECUTE.
+"""
+import threading
+from typing import Callable, Optional
+
+from db.connection import SentenciaPreparada
+
+PREFIJO_SENTENCIA = "rep_"
+CLAUSULAS = ("where", "having", "limit")
+
+
+class Filtro:
+    """Condición que se agrega si el filtro trae un valor (mismo criterio que `if valor:`).
+
+    `condicion` lleva un %s por parámetro y `valor` convierte el valor del
+    filtro en la lista de parámetros (por defecto, [valor]).
+    """
+
+    def __init__(self, condicion: str, valor: Optional[Callable] = None, clausula: str = "where"):
+        if clausula not in CLAUSULAS:
+            raise ValueError(f"Cláusula inválida: {clausula}")
+        self.condicion = condicion
+        self.valor = valor or (lambda v: [v])
+        self.clausula = clausula
+
+
+class Reporte:
+    """Definición de un reporte.
+
+    - desde: FROM (tablas y joins). Si contiene {where}, los filtros WHERE van
+      ahí (p. ej. dentro de una subconsulta) en lugar de después del FROM.
+    - dimensiones / medidas: alias -> expresión; por defecto se agrupa por las
+      dimensiones cuando hay medidas.
+    - agrupar: GROUP BY explícito ([] = sin GROUP BY).
+    - columnas: orden de las columnas del resultado (por defecto dimensiones y luego medidas).
+    """
+
+    def __init__(
+        self,
+        nombre: str,
+        desde: str,
+        dimensiones: dict,
+        medidas: Optional[dict] = None,
+        filtros: Optional[dict] = None,
+        orden: Optional[str] = None,
+        agrupar: Optional[list] = None,
+        columnas: Optional[list] = None,
+    ):
+        self.nombre = nombre
+        self.desde = desde
+        self.dimensiones = dimensiones
+        self.medidas = medidas or {}
+        self.filtros = filtros or {}
+        self.orden = orden
+        self.agrupar = list(self.dimensiones.values()) if agrupar is None and self.medidas else (agrupar or [])
+        expresiones = {**self.dimensiones, **self.medidas}
+        self.columnas = [(alias, expresiones[alias]) for alias in (columnas or expresiones)]
+        self._nombres_filtros = list(self.filtros)
+        self._compiladas = {}  # máscara -> (SentenciaPreparada, filtros en el orden de sus %s)
+        self._lock = threading.Lock()
+
+    def mascara(self, filtros: dict) -> int:
+        desconocidos = set(filtros) - set(self.filtros)
+        if desconocidos:
+            raise ValueError(f"Filtros desconocidos para {self.nombre}: {', '.join(sorted(desconocidos))}")
+        mascara = 0
+        for bit, nombre in enumerate(self._nombres_filtros):
+            if filtros.get(nombre):
+                mascara |= 1 << bit
+        return mascara
+
+    def compilar(self, mascara: int) -> tuple[SentenciaPreparada, list[str]]:
+        compilada = self._compiladas.get(mascara)
+        if compilada is None:
+            with self._lock:
+                compilada = self._compiladas.get(mascara)
+                if compilada is None:
+                    compilada = self._compiladas[mascara] = self._compilar(mascara)
+        return compilada
+
+    def _compilar(self, mascara: int) -> tuple[SentenciaPreparada, list[str]]:
+        activos = {c: [] for c in CLAUSULAS}
+        for bit, nombre in enumerate(self._nombres_filtros):
+            if mascara & (1 << bit):
+                activos[self.filtros[nombre].clausula].append(nombre)
+
+        where = " AND ".join(self.filtros[n].condicion for n in activos["where"])
+        desde = self.desde
+        if "{where}" in desde:
+            desde = desde.replace("{where}", f"WHERE {where}" if where else "")
+            where = ""
+
+        columnas = ",\n        ".join(f"{expresion} AS {alias}" for alias, expresion in self.columnas)
+        sql = f"SELECT\n        {columnas}\n    FROM {desde}"
+        if where:
+            sql += f"\n    WHERE {where}"
+        if self.agrupar:
+            sql += f"\n    GROUP BY {', '.join(self.agrupar)}"
+        if activos["having"]:
+            sql += f"\n    HAVING {' AND '.join(self.filtros[n].condicion for n in activos['having'])}"
+        if self.orden:
+            sql += f"\n    ORDER BY {self.orden}"
+        if activos["limit"]:
+            sql += f"\n    LIMIT {self.filtros[activos['limit'][0]].condicion}"
+
+        # Los %s aparecen en el orden WHERE, HAVING, LIMIT
+        orden = activos["where"] + activos["having"] + activos["limit"]
+        partes = sql.split("%s")
+        preparado = partes[0] + "".join(f"${i}{parte}" for i, parte in enumerate(partes[1:], start=1))
+        nombre = f"{PREFIJO_SENTENCIA}{self.nombre}_{mascara}"
+        return SentenciaPreparada(sql, nombre, preparado), orden
+
+    def sql(self, **filtros) -> tuple[SentenciaPreparada, list]:
+        """(consulta, parámetros) para los filtros dados, como los _sql_* de services/reports.py."""
+        sentencia, orden = self.compilar(self.mascara(filtros))
+        params = []
+        for nombre in orden:
+            params += self.filtros[nombre].valor(filtros[nombre])
+        return sentencia, params
+
+    def sentencias(self) -> list[str]:
+        """Nombres de las sentencias ya compiladas."""
+        return sorted(s.nombre for s, _ in self._compiladas.values())
+
+    def compiladas(self) -> list[SentenciaPreparada]:
+        """Sentencias ya compiladas (p. ej. para prepararlas en otras conexiones)."""
+        with self._lock:
+            return [s for s, _ in self._compiladas.values()]
+
+
+REPORTES = {}
+
+
+def registrar(reporte: Reporte) -> Reporte:
+    REPORTES[reporte.nombre] = reporte
+    return reporte
@@ -0,0 +1,50 @@
+import os
+from typing import Optional
+
+# Edad desde la que empieza cada grupo (después de "Menor de ..."); una sola
+# definición para todos los reportes. Por defecto: <18, 18-25, 26-35, 36-50, >50.
+LIMITES_EDAD = tuple(
+    int(limite) for limite in os.getenv("REPORTS_LIMITES_EDAD", "18,26,36,51").split(",")
+)
+
+
+def grupos_edad(limites: tuple = LIMITES_EDAD) -> list[tuple[str, Optional[int], Optional[int]]]:
+    """(etiqueta, edad mínima, edad máxima) de cada grupo, de menor a mayor edad."""
+    limites = sorted(limites)
+    grupos = [(f"Menor de {limites[0]}", None, limites[0] - 1)]
+    for desde, hasta in zip(limites, limites[1:]):
+        grupos.append((f"{desde}-{hasta - 1}", desde, hasta - 1))
+    grupos.append((f"Mayor de {limites[-1] - 1}", limites[-1], None))
+    return grupos
+
+
+def _corte(anios: str) -> str:
+    # Fecha de nacimiento de quien cumple `anios` hoy; (29-feb → 28-feb como AGE)
+    return f"(CURRENT_DATE - make_interval(years => {anios}))::date"
+
+
+def condicion_edad_minima(columna: str) -> str:
+    """edad >= m  <=>  nacimiento <= hoy - m años (un parámetro: m)."""
+    return f"{columna} <= {_corte('%s')}"
+
+
+def condicion_edad_maxima(columna: str) -> str:
+    """edad <= M  <=>  nacimiento > hoy - (M + 1) años (un parámetro: M + 1)."""
+    return f"{columna} > {_corte('%s')}"
+
+
+def grupo_edad_sql(columna: str, limites: tuple = LIMITES_EDAD) -> tuple[str, str]:
+    """Expresiones CASE (etiqueta, orden) del grupo de edad comparando fechas, sin AGE()."""
+    etiquetas, ordenes = [], []
+    grupos = grupos_edad(limites)
+    for orden, (etiqueta, _, _) in enumerate(grupos[:-1]):
+        # Nacido después del corte del siguiente grupo => todavía no llega a esa edad
+        siguiente = grupos[orden + 1][1]
+        condicion = f"{columna} > {_corte(str(int(siguiente)))}"
+        etiquetas.append(f"WHEN {condicion} THEN '{etiqueta}'")
+        ordenes.append(f"WHEN {condicion} THEN {orden}")
+    ultimo = grupos[-1][0]
+    return (
+        "CASE " + " ".join(etiquetas) + f" ELSE '{ultimo}' END",
+        "CASE " + " ".join(ordenes) + f" ELSE {len(grupos) - 1} END",
+    )
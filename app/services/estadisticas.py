@@ -0,0 +1,98 @@
+from db.connection import get_connection
+from services.cache import CANAL_CAMBIOS, TAG_DONACION, TAG_VOLUNTARIO
+
+# Valores que deberían tener las filas de estadisticas_campana, calculados desde
+# las tablas base con la misma semántica que los triggers de database/DDL.sql
+# (monto_recaudado solo suma donaciones monetarias). Las donaciones de meses
+# archivados (migración V006) siguen contando: se leen de donacion_historica.
+_REAL_SQL = """
+    SELECT
+        c.campana_id,
+        COALESCE(d.monto_recaudado, 0) AS monto_recaudado,
+        COALESCE(d.num_donaciones, 0) AS num_donaciones,
+        COALESCE(v.num_voluntarios, 0) AS num_voluntarios,
+        CASE WHEN c.meta_monetaria > 0
+             THEN LEAST(COALESCE(d.monto_recaudado, 0) / c.meta_monetaria * 100, 999.99)
+             ELSE 0
+        END AS porcentaje_meta
+    FROM campana c
+    LEFT JOIN (
+        SELECT campana_id,
+               SUM(monto) FILTER (WHERE tipo = 'monetaria') AS monto_recaudado,
+               COUNT(*) AS num_donaciones
+        FROM donacion_historica
+        GROUP BY campana_id
+    ) d ON c.campana_id = d.campana_id
+    LEFT JOIN (
+        SELECT a.campana_id, COUNT(DISTINCT va.voluntario_id) AS num_voluntarios
+        FROM voluntario_actividad va
+        JOIN actividad a ON va.actividad_id = a.actividad_id
+        GROUP BY a.campana_id
+    ) v ON c.campana_id = v.campana_id
+"""
+
+_DRIFT_SQL = f"""
+    WITH real AS ({_REAL_SQL})
+    SELECT
+        r.campana_id,
+        e.monto_recaudado AS rollup_monto_recaudado,
+        r.monto_recaudado AS real_monto_recaudado,
+        e.num_donaciones AS rollup_num_donaciones,
+        r.num_donaciones AS real_num_donaciones,
+        e.num_voluntarios AS rollup_num_voluntarios,
+        r.num_voluntarios AS real_num_voluntarios
+    FROM real r
+    LEFT JOIN estadisticas_campana e ON r.campana_id = e.campana_id
+    WHERE (e.campana_id IS NULL AND (r.num_donaciones > 0 OR r.num_voluntarios > 0))
+       OR (e.campana_id IS NOT NULL AND (
+               COALESCE(e.monto_recaudado, 0) <> r.monto_recaudado
+            OR COALESCE(e.num_donaciones, 0) <> r.num_donaciones
+            OR COALESCE(e.num_voluntarios, 0) <> r.num_voluntarios))
+    ORDER BY r.campana_id
+"""
+
+
+def check_rollup_drift() -> list[dict]:
+    """Campañas cuyo rollup no coincide con donacion / voluntario_actividad."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(_DRIFT_SQL)
+            return cur.fetchall()
+
+
+def repair_rollup(campana_ids: list[int] | None = None) -> int:
+    """Recalcula las filas de estadisticas_campana con drift (o las indicadas).
+
+    Bloquea la tabla en modo SHARE ROW EXCLUSIVE mientras tanto: los triggers
+    concurrentes esperan y aplican su incremento sobre el valor ya reparado.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("LOCK TABLE estadisticas_campana IN SHARE ROW EXCLUSIVE MODE")
+            if campana_ids is None:
+                cur.execute(_DRIFT_SQL)
+                campana_ids = [row["campana_id"] for row in cur.fetchall()]
+            if not campana_ids:
+                return 0
+            cur.execute(f"""
+                WITH real AS ({_REAL_SQL})
+                INSERT INTO estadisticas_campana (
+                    campana_id, monto_recaudado, porcentaje_meta,
+                    num_donaciones, num_voluntarios, ultima_actualizacion
+                )
+                SELECT campana_id, monto_recaudado, porcentaje_meta,
+                       num_donaciones, num_voluntarios, CURRENT_TIMESTAMP
+                FROM real
+                WHERE campana_id = ANY(%s)
+                ON CONFLICT (campana_id) DO UPDATE SET
+                    monto_recaudado = EXCLUDED.monto_recaudado,
+                    porcentaje_meta = EXCLUDED.porcentaje_meta,
+                    num_donaciones = EXCLUDED.num_donaciones,
+                    num_voluntarios = EXCLUDED.num_voluntarios,
+                    ultima_actualizacion = EXCLUDED.ultima_actualizacion
+            """, (list(campana_ids),))
+            repaired = cur.rowcount
+            # Los reportes en cache se calcularon con el rollup anterior
+            cur.execute("SELECT pg_notify(%s, %s), pg_notify(%s, %s)",
+                        (CANAL_CAMBIOS, TAG_DONACION, CANAL_CAMBIOS, TAG_VOLUNTARIO))
+            return repaired
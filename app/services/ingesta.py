@@ -0,0 +1,220 @@
+from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Optional
+
+from db.connection import copy_rows, get_connection
+
+# Valores de los enums y límites de las columnas de database/DDL.sql
+TIPOS_DONACION = ("monetaria", "especie")
+MONTO_MAXIMO = Decimal("1e10")  # DECIMAL(12,2)
+HORAS_MAXIMO = Decimal("1e3")  # DECIMAL(5,2)
+ESTADO_MAX_LEN = 20
+
+COLUMNAS_DONACION = [
+    "donante_id", "campana_id", "tipo", "monto", "descripcion_especie", "fecha", "anonima", "mensaje",
+]
+COLUMNAS_VOLUNTARIO_ACTIVIDAD = [
+    "voluntario_id", "actividad_id", "fecha_registro", "horas_dedicadas", "comentarios", "estado",
+]
+
+
+class FilaInvalida(ValueError):
+    """Una fila no cumple las restricciones de la tabla destino."""
+
+
+def _entero(fila: dict, campo: str, requerido: bool = True) -> Optional[int]:
+    valor = fila.get(campo)
+    if valor is None or valor == "":
+        if requerido:
+            raise FilaInvalida(f"{campo} es obligatorio")
+        return None
+    if isinstance(valor, bool):
+        raise FilaInvalida(f"{campo} debe ser entero")
+    try:
+        entero = int(valor)
+    except (TypeError, ValueError):
+        raise FilaInvalida(f"{campo} debe ser entero") from None
+    if entero != valor and str(entero) != str(valor).strip():
+        raise FilaInvalida(f"{campo} debe ser entero")
+    if not -2 ** 31 <= entero < 2 ** 31:
+        raise FilaInvalida(f"{campo} fuera de rango")
+    return entero
+
+
+def _decimal(fila: dict, campo: str, maximo: Decimal) -> Optional[Decimal]:
+    """Decimal con 2 decimales, redondeado como lo hace PostgreSQL."""
+    valor = fila.get(campo)
+    if valor is None or valor == "":
+        return None
+    try:
+        numero = Decimal(str(valor)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    except (InvalidOperation, ValueError):
+        raise FilaInvalida(f"{campo} debe ser numérico") from None
+    if not numero.is_finite() or abs(numero) >= maximo:
+        raise FilaInvalida(f"{campo} fuera de rango")
+    return numero
+
+
+def _texto(fila: dict, campo: str, max_len: Optional[int] = None) -> Optional[str]:
+    valor = fila.get(campo)
+    if valor is None:
+        return None
+    valor = str(valor)
+    if "\x00" in valor:
+        raise FilaInvalida(f"{campo} contiene un carácter nulo")
+    if max_len is not None and len(valor) > max_len:
+        raise FilaInvalida(f"{campo} supera {max_len} caracteres")
+    return valor
+
+
+def _fecha(fila: dict, campo: str) -> datetime:
+    valor = fila.get(campo)
+    if valor is None or valor == "":
+        return datetime.now()  # DEFAULT CURRENT_TIMESTAMP
+    if isinstance(valor, datetime):
+        return valor
+    if isinstance(valor, date):
+        return datetime.combine(valor, datetime.min.time())
+    try:
+        return datetime.fromisoformat(str(valor))
+    except ValueError:
+        raise FilaInvalida(f"{campo} no es una fecha válida") from None
+
+
+def _booleano(fila: dict, campo: str, defecto: bool) -> bool:
+    valor = fila.get(campo)
+    if valor is None or valor == "":
+        return defecto
+    if isinstance(valor, bool):
+        return valor
+    texto = str(valor).strip().lower()
+    if texto in ("t", "true", "1", "si", "sí"):
+        return True
+    if texto in ("f", "false", "0", "no"):
+        return False
+    raise FilaInvalida(f"{campo} debe ser booleano")
+
+
+def validar_donacion(fila: dict) -> tuple:
+    """Fila de donacion lista para COPY; lanza FilaInvalida si viola el DDL."""
+    tipo = fila.get("tipo")
+    if tipo not in TIPOS_DONACION:
+        raise FilaInvalida(f"tipo debe ser uno de {', '.join(TIPOS_DONACION)}")
+    monto = _decimal(fila, "monto", MONTO_MAXIMO)
+    if monto is not None and monto <= 0:
+        raise FilaInvalida("monto debe ser mayor que 0")
+    descripcion = _texto(fila, "descripcion_especie")
+    # chk_tipo_donacion
+    if tipo == "monetaria" and (monto is None or descripcion is not None):
+        raise FilaInvalida("una donación monetaria requiere monto y no lleva descripcion_especie")
+    if tipo == "especie" and descripcion is None:
+        raise FilaInvalida("una donación en especie requiere descripcion_especie")
+    return (
+        _entero(fila, "donante_id"),
+        _entero(fila, "campana_id"),
+        tipo,
+        monto,
+        descripcion,
+        _fecha(fila, "fecha"),
+        _booleano(fila, "anonima", False),
+        _texto(fila, "mensaje"),
+    )
+
+
+def validar_voluntario_actividad(fila: dict) -> tuple:
+    """Fila de voluntario_actividad lista para COPY; lanza FilaInvalida si viola el DDL."""
+    horas = _decimal(fila, "horas_dedicadas", HORAS_MAXIMO)
+    estado = _texto(fila, "estado", ESTADO_MAX_LEN)
+    return (
+        _entero(fila, "voluntario_id"),
+        _entero(fila, "actividad_id"),
+        _fecha(fila, "fecha_registro"),
+        Decimal("0.00") if horas is None else horas,
+        _texto(fila, "comentarios"),
+        "pendiente" if estado is None else estado,
+    )
+
+
+def _existentes(cur, tabla: str, columna: str, ids: set) -> set:
+    if not ids:
+        return set()
+    cur.execute(f"SELECT {columna} AS id FROM {tabla} WHERE {columna} = ANY(%s)", (list(ids),))
+    return {row["id"] for row in cur.fetchall()}
+
+
+def _cargar(tabla: str, columnas: list[str], validas: list[tuple], rechazadas: list[dict], verificar) -> dict:
+    """Verifica FKs/PKs contra la base y copia las filas válidas en una sola transacción."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            filas = verificar(cur, validas, rechazadas)
+            insertadas = copy_rows(cur, tabla, columnas, (registro for _, registro in filas))
+    rechazadas.sort(key=lambda r: r["fila"])
+    return {"insertadas": insertadas, "rechazadas": rechazadas}
+
+
+def _validar(filas, validar) -> tuple[list, list]:
+    validas, rechazadas = [], []
+    for i, fila in enumerate(filas):
+        try:
+            validas.append((i, validar(fila)))
+        except FilaInvalida as e:
+            rechazadas.append({"fila": i, "error": str(e)})
+    return validas, rechazadas
+
+
+def _verificar_donaciones(cur, validas: list, rechazadas: list) -> list:
+    donantes = _existentes(cur, "donante", "donante_id", {r[0] for _, r in validas})
+    campanas = _existentes(cur, "campana", "campana_id", {r[1] for _, r in validas})
+    filas = []
+    for i, registro in validas:
+        if registro[0] not in donantes:
+            rechazadas.append({"fila": i, "error": f"donante {registro[0]} no existe"})
+        elif registro[1] not in campanas:
+            rechazadas.append({"fila": i, "error": f"campaña {registro[1]} no existe"})
+        else:
+            filas.append((i, registro))
+    return filas
+
+
+def _verificar_voluntario_actividad(cur, validas: list, rechazadas: list) -> list:
+    voluntarios = _existentes(cur, "voluntario", "voluntario_id", {r[0] for _, r in validas})
+    actividades = _existentes(cur, "actividad", "actividad_id", {r[1] for _, r in validas})
+    pares = [(r[0], r[1]) for _, r in validas]
+    cur.execute("""
+        SELECT va.voluntario_id, va.actividad_id
+        FROM voluntario_actividad va
+        JOIN unnest(%s::int[], %s::int[]) AS p(voluntario_id, actividad_id)
+          ON va.voluntario_id = p.voluntario_id AND va.actividad_id = p.actividad_id
+    """, ([p[0] for p in pares], [p[1] for p in pares]))
+    vistos = {(row["voluntario_id"], row["actividad_id"]) for row in cur.fetchall()}
+    filas = []
+    for i, registro in validas:
+        par = (registro[0], registro[1])
+        if registro[0] not in voluntarios:
+            rechazadas.append({"fila": i, "error": f"voluntario {registro[0]} no existe"})
+        elif registro[1] not in actividades:
+            rechazadas.append({"fila": i, "error": f"actividad {registro[1]} no existe"})
+        elif par in vistos:
+            rechazadas.append({"fila": i, "error": f"el voluntario {par[0]} ya está inscrito en la actividad {par[1]}"})
+        else:
+            vistos.add(par)
+            filas.append((i, registro))
+    return filas
+
+
+def ingest_donaciones(filas: list[dict]) -> dict:
+    """Valida e inserta un lote de donaciones con COPY en una sola transacción.
+
+    Devuelve {"insertadas": n, "rechazadas": [{"fila": índice, "error": motivo}]};
+    las filas rechazadas no impiden cargar las demás.
+    """
+    validas, rechazadas = _validar(filas, validar_donacion)
+    return _cargar("donacion", COLUMNAS_DONACION, validas, rechazadas, _verificar_donaciones)
+
+
+def ingest_voluntario_actividad(filas: list[dict]) -> dict:
+    """Igual que ingest_donaciones, para inscripciones de voluntarios a actividades."""
+    validas, rechazadas = _validar(filas, validar_voluntario_actividad)
+    return _cargar(
+        "voluntario_actividad", COLUMNAS_VOLUNTARIO_ACTIVIDAD, validas, rechazadas, _verificar_voluntario_actividad
+    )
@@ -0,0 +1,393 @@
+"""Instrumentación de reportes y exports.
+
+Cada llamada medida registra duración, filas, bytes, acierto de cache y
+espera por una conexión del pool. Las que superan METRICS_SLOW_QUERY_SECONDS
+van al log de consultas lentas con su SQL y parámetros. Las métricas se
+publican en formato de texto de Prometheus (GET /metrics en METRICS_PORT) y
+como resumen para el panel de diagnóstico del dashboard.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from psycopg2.extensions import adapt
+
+from db.connection import espera_conexion, get_pool, prepared_stats
+from db.ejecucion import contexto, ejecucion_stats
+from utils.helpers import estimate_size
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger("reporteria.consultas_lentas")
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# Puerto del endpoint /metrics; 0 lo desactiva
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9101"))
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+SLOW_QUERY_SECONDS = float(os.getenv("METRICS_SLOW_QUERY_SECONDS", "1"))
+# Consultas lentas que se guardan en memoria para el panel de diagnóstico
+SLOW_QUERY_LOG_SIZE = int(os.getenv("METRICS_SLOW_QUERY_LOG_SIZE", "50"))
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PREFIJO = "reporteria"
+# nombre -> (tipo, ayuda)
+METRICAS = {
+    "llamadas_total": ("counter", "Llamadas medidas por operación, reporte, cache y resultado"),
+    "duracion_segundos": ("histogram", "Duración de cada llamada"),
+    "filas_total": ("counter", "Filas devueltas"),
+    "bytes_total": ("counter", "Bytes del resultado (tamaño estimado en memoria; en exports, del archivo)"),
+    "espera_conexion_segundos_total": ("counter", "Tiempo esperando una conexión del pool"),
+    "consultas_lentas_total": ("counter", f"Llamadas que superaron {SLOW_QUERY_SECONDS}s"),
+}
+
+
+class Registro:
+    """Contadores e histogramas con etiquetas, thread-safe."""
+
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._contadores = {}  # (nombre, etiquetas) -> valor
+        self._histogramas = {}  # (nombre, etiquetas) -> [conteo por bucket..., suma, total]
+        self._gauges = {}  # prefijo -> función que devuelve {nombre: valor}
+
+    def inc(self, nombre: str, valor: float = 1.0, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0.0) + valor
+
+    def observe(self, nombre: str, valor: float, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            h = self._histogramas.get(clave)
+            if h is None:
+                h = self._histogramas[clave] = [0] * len(self.buckets) + [0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    h[i] += 1
+            h[-2] += valor
+            h[-1] += 1
+
+    def registrar_gauges(self, prefijo: str, func):
+        self._gauges[prefijo] = func
+
+    def reset(self):
+        with self._lock:
+            self._contadores.clear()
+            self._histogramas.clear()
+
+    def render(self) -> str:
+        """Formato de exposición de texto de Prometheus."""
+        with self._lock:
+            contadores = dict(self._contadores)
+            histogramas = {k: list(v) for k, v in self._histogramas.items()}
+        lineas = []
+        for nombre, (tipo, ayuda) in METRICAS.items():
+            completo = f"{PREFIJO}_{nombre}"
+            lineas += [f"# HELP {completo} {ayuda}", f"# TYPE {completo} {tipo}"]
+            if tipo == "histogram":
+                for (n, etiquetas), h in sorted(histogramas.items()):
+                    if n != nombre:
+                        continue
+                    for limite, conteo in zip(self.buckets, h):
+                        lineas.append(f"{completo}_bucket{_etiquetas(etiquetas + (('le', limite),))} {conteo}")
+                    lineas.append(f"{completo}_bucket{_etiquetas(etiquetas + (('le', '+Inf'),))} {h[-1]}")
+                    lineas.append(f"{completo}_sum{_etiquetas(etiquetas)} {h[-2]}")
+                    lineas.append(f"{completo}_count{_etiquetas(etiquetas)} {h[-1]}")
+            else:
+                for (n, etiquetas), valor in sorted(contadores.items()):
+                    if n == nombre:
+                        lineas.append(f"{completo}{_etiquetas(etiquetas)} {valor}")
+        for prefijo, func in list(self._gauges.items()):
+            try:
+                valores = func()
+            except Exception:
+                logger.exception("No se pudieron leer las métricas de %s", prefijo)
+                continue
+            for nombre, valor in sorted(valores.items()):
+                if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                    completo = f"{PREFIJO}_{prefijo}_{nombre}"
+                    lineas += [f"# TYPE {completo} gauge", f"{completo} {valor}"]
+        return "\n".join(lineas) + "\n"
+
+
+def _etiquetas(etiquetas: tuple) -> str:
+    if not etiquetas:
+        return ""
+    partes = []
+    for clave, valor in etiquetas:
+        texto = str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        partes.append(f'{clave}="{texto}"')
+    return "{" + ",".join(partes) + "}"
+
+
+_registro = Registro()
+_registro.registrar_gauges("pool", lambda: get_pool().stats())
+_registro.registrar_gauges("sentencias", prepared_stats)
+_registro.registrar_gauges("ejecucion", ejecucion_stats)
+_lentas = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+_resumen = {}  # (operacion, reporte) -> acumulados para el panel de diagnóstico
+_resumen_lock = threading.Lock()
+
+
+def get_registro() -> Registro:
+    return _registro
+
+
+def registrar_gauges(prefijo: str, func):
+    """Publica en /metrics los valores numéricos de `func()` (p. ej. stats() de una cache)."""
+    _registro.registrar_gauges(prefijo, func)
+
+
+# --- Medición de una llamada -------------------------------------------------
+
+_medicion = contextvars.ContextVar("medicion", default=None)
+
+
+def registrar_consulta(query: str, params=None):
+    """Asocia la SQL ejecutada a la medición en curso (para el log de consultas lentas)."""
+    medicion = _medicion.get()
+    if medicion is not None:
+        medicion["sql"], medicion["params"] = query, params
+
+
+def marcar_cache(hit: bool):
+    medicion = _medicion.get()
+    if medicion is not None and medicion["cache"] is None:
+        medicion["cache"] = "hit" if hit else "miss"
+
+
+def render_sql(query: str, params=None) -> str:
+    """SQL con los parámetros interpolados, solo para mostrar en el log."""
+    query = query.strip()
+    if not params:
+        return query
+    try:
+        return query % tuple(adapt(p).getquoted().decode("utf-8", "replace") for p in params)
+    except Exception:
+        return query
+
+
+def _filas(resultado) -> int | None:
+    if resultado is None:
+        return 0
+    if isinstance(resultado, int):
+        return 1
+    if isinstance(resultado, dict) and "rows" in resultado:
+        return len(resultado["rows"])
+    if hasattr(resultado, "num_rows"):  # pyarrow.Table
+        return resultado.num_rows
+    try:
+        return len(resultado)
+    except TypeError:
+        return None
+
+
+@contextmanager
+def medir(operacion: str, reporte: str, **etiquetas):
+    """Mide el bloque; quien lo usa puede completar medicion["filas"] y medicion["bytes"]."""
+    # Las conexiones del bloque pasan por la admisión y el timeout del reporte (db/ejecucion.py)
+    with contexto(reporte):
+        if not METRICS_ENABLED:
+            yield {"sql": None, "params": None, "cache": None, "filas": None, "bytes": None}
+            return
+        medicion = {"sql": None, "params": None, "cache": None, "filas": None, "bytes": None}
+        token = _medicion.set(medicion)
+        espera = espera_conexion()
+        inicio = time.perf_counter()
+        error = None
+        try:
+            yield medicion
+        except GeneratorExit:
+            # Un stream que se cierra antes de agotarse (p. ej. first_page_report) no es un error
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _medicion.reset(token)
+            _registrar(operacion, reporte, etiquetas, medicion, time.perf_counter() - inicio,
+                       espera_conexion() - espera, error)
+
+
+def _registrar(operacion, reporte, etiquetas, medicion, segundos, espera, error):
+    cache = medicion["cache"] or "none"
+    base = dict(operacion=operacion, reporte=reporte, **etiquetas)
+    resultado = "ok" if error is None else type(error).__name__
+    _registro.inc("llamadas_total", cache=cache, resultado=resultado, **base)
+    _registro.observe("duracion_segundos", segundos, cache=cache, **base)
+    if medicion["filas"] is not None:
+        _registro.inc("filas_total", medicion["filas"], **base)
+    if medicion["bytes"] is not None:
+        _registro.inc("bytes_total", medicion["bytes"], **base)
+    if espera:
+        _registro.inc("espera_conexion_segundos_total", espera, **base)
+
+    with _resumen_lock:
+        r = _resumen.setdefault((operacion, reporte), {
+            "operacion": operacion, "reporte": reporte, "llamadas": 0, "hits": 0, "errores": 0,
+            "segundos": 0.0, "max_segundos": 0.0, "filas": 0, "bytes": 0, "espera_segundos": 0.0,
+        })
+        r["llamadas"] += 1
+        r["hits"] += cache == "hit"
+        r["errores"] += error is not None
+        r["segundos"] += segundos
+        r["max_segundos"] = max(r["max_segundos"], segundos)
+        r["filas"] += medicion["filas"] or 0
+        r["bytes"] += medicion["bytes"] or 0
+        r["espera_segundos"] += espera
+
+    if segundos >= SLOW_QUERY_SECONDS:
+        _registro.inc("consultas_lentas_total", **base)
+        sql = render_sql(medicion["sql"], medicion["params"]) if medicion["sql"] else None
+        _lentas.append({
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "reporte": reporte,
+            "operacion": operacion,
+            "segundos": round(segundos, 3),
+            "espera_conexion": round(espera, 3),
+            "cache": cache,
+            "filas": medicion["filas"],
+            "sql": sql,
+            "params": medicion["params"],
+        })
+        slow_logger.warning("%s %s tardó %.3fs (espera de conexión %.3fs, cache %s): %s | params=%r",
+                            operacion, reporte, segundos, espera, cache, sql, medicion["params"])
+
+
+def _medir_stream(operacion: str, reporte: str, stream, sql: str | None, params):
+    """Mide un generador de lotes (columnas, filas) hasta que se agota o se cierra."""
+    with medir(operacion, reporte) as medicion:
+        medicion.update(sql=sql, params=params, filas=0)
+        for columnas, filas in stream:
+            # En modo columnar `filas` es una lista de columnas
+            medicion["filas"] += len(filas[0]) if filas and isinstance(filas[0], list) else len(filas)
+            yield columnas, filas
+
+
+def _stream_en_contexto(reporte: str, stream):
+    """Consume el generador de lotes dentro del contexto del reporte (sin métricas)."""
+    with contexto(reporte):
+        yield from stream
+
+
+def instrumentado(operacion: str, reporte: str | None = None, stream: bool = False):
+    """Decorador para las funciones de services/reports.py.
+
+    Sin `reporte`, el nombre se toma del primer argumento (report). Con
+    `stream`, la función devuelve un generador de lotes y se mide su consumo.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            nombre = reporte or (args[0] if args else kwargs.get("report"))
+            if not METRICS_ENABLED:
+                # La admisión y el timeout del reporte no dependen de que se midan las métricas
+                with contexto(nombre):
+                    resultado = func(*args, **kwargs)
+                return _stream_en_contexto(nombre, resultado) if stream else resultado
+            if stream:
+                # La llamada solo arma la consulta; se guarda su SQL para la medición del consumo
+                consulta = {"sql": None, "params": None, "cache": None}
+                token = _medicion.set(consulta)
+                try:
+                    resultado = func(*args, **kwargs)
+                finally:
+                    _medicion.reset(token)
+                return _medir_stream(operacion, nombre, resultado, consulta["sql"], consulta["params"])
+            with medir(operacion, nombre) as medicion:
+                resultado = func(*args, **kwargs)
+                medicion["filas"] = _filas(resultado)
+                medicion["bytes"] = estimate_size(resultado)
+            return resultado
+        return wrapper
+    return decorator
+
+
+# --- Consulta de métricas ------------------------------------------------------
+
+def resumen() -> list[dict]:
+    """Acumulados por (operación, reporte) desde que arrancó el proceso."""
+    with _resumen_lock:
+        filas = [dict(r) for r in _resumen.values()]
+    for r in filas:
+        r["promedio_segundos"] = r["segundos"] / r["llamadas"] if r["llamadas"] else 0.0
+        r["tasa_hits"] = r["hits"] / r["llamadas"] if r["llamadas"] else 0.0
+    return sorted(filas, key=lambda r: r["segundos"], reverse=True)
+
+
+def consultas_lentas() -> list[dict]:
+    return list(reversed(_lentas))
+
+
+# --- Arranque ------------------------------------------------------------------
+
+_lista = threading.Event()
+_arranque = {}  # resumen del calentamiento (services/arranque.py)
+
+
+def marcar_lista(detalle: dict | None = None):
+    """La app puede recibir tráfico: GET /ready pasa de 503 a 200."""
+    if detalle:
+        _arranque.update(detalle)
+    _lista.set()
+
+
+def esta_lista() -> bool:
+    return _lista.is_set()
+
+
+_registro.registrar_gauges("arranque", lambda: {"lista": int(_lista.is_set()), **_arranque})
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        ruta = self.path.split("?")[0]
+        if ruta == "/metrics":
+            self._responder(200, _registro.render(), "text/plain; version=0.0.4; charset=utf-8")
+        elif ruta == "/ready":
+            # Para el healthcheck: 503 mientras dura el calentamiento
+            lista = _lista.is_set()
+            cuerpo = json.dumps({"lista": lista, **_arranque}, default=str)
+            self._responder(200 if lista else 503, cuerpo, "application/json")
+        else:
+            self.send_error(404)
+
+    def _responder(self, codigo: int, cuerpo: str, tipo: str):
+        body = cuerpo.encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_servidor = None
+_servidor_lock = threading.Lock()
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = METRICS_HOST):
+    """Levanta los endpoints /metrics y /ready en un hilo (una vez por proceso)."""
+    global _servidor
+    if not port or not METRICS_ENABLED:
+        return None
+    with _servidor_lock:
+        if _servidor is None:
+            try:
+                _servidor = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError:
+                logger.warning("No se pudo abrir el puerto de métricas %s", port, exc_info=True)
+                return None
+            _servidor.daemon_threads = True
+            threading.Thread(target=_servidor.serve_forever, name="metrics-server", daemon=True).start()
+    return _servidor
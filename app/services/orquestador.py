@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from db.connection import POOL_MAX_SIZE
+from db.ejecucion import ConsultaCancelada, Turno, contexto, nuevo_turno, terminar_turno
+
+# Hilos compartidos por todas las sesiones; cada uno ocupa una conexión del pool
+REPORTS_MAX_WORKERS = int(os.getenv("REPORTS_MAX_WORKERS", str(POOL_MAX_SIZE)))
+# Tiempo máximo de espera por reporte; se puede ajustar con REPORTS_TIMEOUT_<REPORTE>
+REPORTS_TIMEOUT = float(os.getenv("REPORTS_TIMEOUT", "30"))
+# Cada cuántos segundos iter_resultados avisa que sigue esperando (al_esperar)
+REPORTS_AVISO_ESPERA = float(os.getenv("REPORTS_AVISO_ESPERA", "0.25"))
+
+
+class ReportTimeoutError(TimeoutError):
+    """El reporte no terminó dentro de su tiempo de espera."""
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=REPORTS_MAX_WORKERS, thread_name_prefix="reportes")
+    return _executor
+
+
+def timeout_reporte(nombre: str) -> float:
+    return float(os.getenv(f"REPORTS_TIMEOUT_{nombre.upper()}", REPORTS_TIMEOUT))
+
+
+def _ejecutar(nombre: str, turno: Turno | None, func, filtros: dict):
+    try:
+        if turno is not None and turno.cancelado:
+            # Se canceló mientras esperaba un hilo libre
+            raise ConsultaCancelada(f"{nombre}: la sesión pidió otros filtros")
+        with contexto(nombre, turno):
+            return func(**filtros)
+    finally:
+        if turno is not None:
+            terminar_turno(turno)
+
+
+def dispatch_reportes(tareas: dict, sesion=None) -> dict[str, Future]:
+    """Lanza cada tarea {nombre: (función, filtros)} en el pool de hilos.
+
+    Con `sesion`, cada tarea es el turno (sesion, nombre): si esa sesión todavía
+    estaba consultando el mismo reporte con otros filtros, esa consulta se cancela.
+    """
+    executor = get_executor()
+    futures = {}
+    for nombre, (func, filtros) in tareas.items():
+        turno = nuevo_turno((sesion, nombre), filtros) if sesion is not None else None
+        futures[nombre] = executor.submit(_ejecutar, nombre, turno, func, filtros)
+    return futures
+
+
+def iter_resultados(futures: dict[str, Future], timeouts: dict | None = None, al_esperar=None):
+    """Produce (nombre, resultado, error) en el orden en que terminan los reportes.
+
+    Un reporte que supera su timeout se produce con ReportTimeoutError; la
+    consulta sigue en su hilo y, al terminar, su resultado queda en la cache
+    de reportes para el siguiente rerun.
+
+    `al_esperar(pendientes, segundos)` se llama cada REPORTS_AVISO_ESPERA
+    mientras no termina ninguno. En Streamlit, dibujar algo ahí le da al script
+    la oportunidad de cortarse si el usuario cambió un filtro; el rerun vuelve a
+    pedir el reporte y dispatch_reportes cancela la consulta vieja.
+    """
+    inicio = time.monotonic()
+    timeouts = timeouts or {}
+    limites = {nombre: inicio + timeouts.get(nombre, timeout_reporte(nombre)) for nombre in futures}
+    pendientes = {future: nombre for nombre, future in futures.items()}
+
+    while pendientes:
+        espera = max(0.0, min(limites[nombre] for nombre in pendientes.values()) - time.monotonic())
+        if al_esperar is not None:
+            espera = min(espera, REPORTS_AVISO_ESPERA)
+        listos, _ = wait(pendientes, timeout=espera, return_when=FIRST_COMPLETED)
+        if not listos and al_esperar is not None:
+            al_esperar(sorted(pendientes.values()), time.monotonic() - inicio)
+        for future in listos:
+            nombre = pendientes.pop(future)
+            error = future.exception()
+            yield nombre, (None if error else future.result()), error
+
+        ahora = time.monotonic()
+        for future, nombre in list(pendientes.items()):
+            if limites[nombre] <= ahora:
+                del pendientes[future]
+                future.cancel()
+                yield nombre, None, ReportTimeoutError(
+                    f"{nombre} no respondió en {limites[nombre] - inicio:.0f}s"
+                )
@@ -0,0 +1,105 @@
+"""Mantenimiento de las particiones mensuales de donacion (migración V006).
+
+Las particiones se llaman donacion_AAAA_MM. Las de meses futuros se crean por
+adelantado para que las donaciones nuevas no caigan en donacion_default; las
+de meses fríos pasan a donacion_archivo, fuera de la tabla donde se escribe.
+Los reportes leen donacion_historica y los agregados no cambian: el total es
+el mismo antes y después de archivar.
+"""
+import logging
+import os
+from datetime import date, datetime
+
+from db.connection import get_connection
+
+logger = logging.getLogger(__name__)
+
+# Meses futuros que se crean por adelantado
+MESES_ADELANTE = int(os.getenv("DONACION_MESES_ADELANTE", "3"))
+# Meses (contando el actual) que quedan en donacion al archivar
+MESES_CALIENTES = int(os.getenv("DONACION_MESES_CALIENTES", "24"))
+
+
+def _primer_dia(valor) -> date:
+    if isinstance(valor, datetime):
+        valor = valor.date()
+    return valor.replace(day=1)
+
+
+def _restar_meses(mes: date, meses: int) -> date:
+    total = mes.year * 12 + mes.month - 1 - meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def listar_particiones() -> list[dict]:
+    """Particiones de donacion y donacion_archivo con sus límites, filas estimadas y tamaño."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT c.relname AS particion,
+                       p.relname AS tabla,
+                       pg_get_expr(c.relpartbound, c.oid) AS limites,
+                       GREATEST(c.reltuples, 0)::bigint AS filas_estimadas,
+                       pg_total_relation_size(c.oid) AS bytes
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                JOIN pg_class p ON p.oid = i.inhparent
+                WHERE i.inhparent IN ('donacion'::regclass, 'donacion_archivo'::regclass)
+                ORDER BY p.relname, c.relname
+            """)
+            return cur.fetchall()
+
+
+def crear_particiones(desde: date | None = None, hasta: date | None = None,
+                      meses_adelante: int = MESES_ADELANTE) -> list[str]:
+    """Crea las particiones mensuales que falten en [desde, hasta + meses_adelante]
+    (por defecto desde el mes actual) y las de los meses con filas en
+    donacion_default, que se mueven a su partición (la archivada si el mes ya
+    está en donacion_archivo; se avisa con un warning).
+
+    Devuelve los nombres de las particiones creadas.
+    """
+    hoy = date.today()
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT crear_particion_donacion(m.mes) AS particion
+                FROM (
+                    SELECT generate_series(%s::date, %s::date + make_interval(months => %s), INTERVAL '1 month')::date AS mes
+                    UNION
+                    SELECT DISTINCT date_trunc('month', fecha)::date FROM donacion_default
+                ) m
+                ORDER BY m.mes
+            """, (_primer_dia(desde or hoy), _primer_dia(hasta or hoy), meses_adelante))
+            creadas = [row["particion"] for row in cur.fetchall() if row["particion"]]
+        for aviso in conn.notices:
+            logger.warning(aviso.strip())
+        del conn.notices[:]
+    return creadas
+
+
+def archivar_particiones(meses_calientes: int = MESES_CALIENTES) -> list[str]:
+    """Pasa a donacion_archivo las particiones anteriores a los últimos `meses_calientes` meses.
+
+    DETACH no dispara los triggers: estadisticas_campana y los buckets siguen
+    contando esos meses, igual que los reportes que leen filas (van por
+    donacion_historica): los resultados en cache siguen valiendo.
+    """
+    if meses_calientes < 1:
+        raise ValueError("meses_calientes debe ser al menos 1")
+    limite = _restar_meses(_primer_dia(date.today()), meses_calientes - 1)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT c.relname AS particion
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'donacion'::regclass
+                  AND c.relname ~ '^donacion_[0-9]{4}_[0-9]{2}$'
+                  AND to_date(right(c.relname, 7), 'YYYY_MM') < %s
+                ORDER BY c.relname
+            """, (limite,))
+            particiones = [row["particion"] for row in cur.fetchall()]
+            for particion in particiones:
+                cur.execute("SELECT archivar_particion_donacion(%s)", (particion,))
+            return particiones
@@ -1,100 +1,436 @@
-from datetime import datetime
-from db.connection import get_connection
-from utils.helpers import safe_divide
+import bisect
+from datetime import date, datetime, timedelta
+import os
+from db.columnar import fetch_arrow, fetch_frame
+from db.connection import execute_query, get_connection, stream_query
+from services.cache import cached_report, TAG_DONACION, TAG_VOLUNTARIO
+from services.metricas import instrumentado, registrar_consulta
+from services.definiciones import Filtro, Reporte, registrar
+from services.edad import condicion_edad_maxima, condicion_edad_minima, grupo_edad_sql
 from typing import Optional
 
+# estadisticas_campana (mantenida por triggers) responde los totales por campaña
+# cuando los filtros no recortan la ventana de donaciones
+ROLLUP_ENABLED = os.getenv("REPORTS_USE_ROLLUP", "1") == "1"
+# donacion_diaria / donacion_mensual (migración V002) responden ventanas de fechas
+BUCKETS_ENABLED = os.getenv("REPORTS_USE_BUCKETS", "1") == "1"
 
-def get_donaciones_por_campana(
+
+def _fetch_all(query: str, params: list) -> list[dict]:
+    registrar_consulta(query, params)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            execute_query(cur, query, params)
+            return cur.fetchall()
+
+# Los montos por campaña suman solo donaciones monetarias en todos los caminos
+# (crudo, buckets y rollup), igual que estadisticas_campana; total_donaciones
+# cuenta todas.
+MONTO_MONETARIO = "COALESCE(SUM(d.monto) FILTER (WHERE d.tipo = 'monetaria'), 0)"
+
+# Totales por campaña leyendo las filas (cuando hay filtros de monto). Las lecturas
+# de filas van a donacion_historica (donacion y los meses archivados, V006), que
+# es lo que cuentan el rollup y los buckets. Los filtros van dentro de la
+# subconsulta: la ventana llega al scan de cada partición (poda, también en
+# donacion_archivo) y las campañas sin donaciones en la ventana quedan en 0.
+DONACIONES_POR_CAMPANA = registrar(Reporte(
+    "donaciones_por_campana",
+    desde="""campana c
+    LEFT JOIN (
+        SELECT d.campana_id, d.donacion_id, d.tipo, d.monto
+        FROM donacion_historica d
+        {where}
+    ) d ON c.campana_id = d.campana_id""",
+    dimensiones={
+        "campana_id": "c.campana_id",
+        "campana": "c.nombre",
+        "fecha_inicio": "c.fecha_inicio",
+        "fecha_fin": "c.fecha_fin",
+        "meta_monetaria": "c.meta_monetaria",
+    },
+    medidas={
+        "total_donaciones": "COUNT(d.donacion_id)",
+        "monto_total": MONTO_MONETARIO,
+        "porcentaje_cumplimiento": f"""CASE 
+            WHEN c.meta_monetaria > 0 THEN {MONTO_MONETARIO} / c.meta_monetaria 
+            ELSE 0 
+        END""",
+    },
+    filtros={
+        "fecha_inicio": Filtro("d.fecha >= %s"),
+        "fecha_fin": Filtro("d.fecha <= %s"),
+        "monto_minimo": Filtro("(d.monto IS NULL OR d.monto >= %s)"),
+        "monto_maximo": Filtro("(d.monto IS NULL OR d.monto <= %s)"),
+    },
+    orden="monto_total DESC",
+    columnas=["campana_id", "campana", "total_donaciones", "monto_total", "fecha_inicio", "fecha_fin",
+              "meta_monetaria", "porcentaje_cumplimiento"],
+))
+
+# Sin filtros de donación: estadisticas_campana ya tiene los totales
+DONACIONES_POR_CAMPANA_ROLLUP = registrar(Reporte(
+    "donaciones_por_campana_rollup",
+    desde="""campana c
+    LEFT JOIN estadisticas_campana e ON c.campana_id = e.campana_id""",
+    dimensiones={
+        "campana_id": "c.campana_id",
+        "campana": "c.nombre",
+        "total_donaciones": "COALESCE(e.num_donaciones, 0)",
+        "monto_total": "COALESCE(e.monto_recaudado, 0)",
+        "fecha_inicio": "c.fecha_inicio",
+        "fecha_fin": "c.fecha_fin",
+        "meta_monetaria": "c.meta_monetaria",
+        "porcentaje_cumplimiento": """CASE 
+            WHEN c.meta_monetaria > 0 THEN COALESCE(e.monto_recaudado, 0) / c.meta_monetaria 
+            ELSE 0 
+        END""",
+    },
+    orden="monto_total DESC",
+))
+
+def _sql_donaciones_por_campana(
     fecha_inicio: Optional[datetime] = None,
     fecha_fin: Optional[datetime] = None,
     monto_minimo: Optional[float] = None,
     monto_maximo: Optional[float] = None
-) -> list[dict]:
-    query = """
+) -> tuple[str, list]:
+    if _usa_rollup(fecha_inicio, fecha_fin, monto_minimo, monto_maximo):
+        return DONACIONES_POR_CAMPANA_ROLLUP.sql()
+    if BUCKETS_ENABLED and not monto_minimo and not monto_maximo:
+        # Los segmentos dependen de la ventana: SQL armado en cada llamada
+        return _sql_donaciones_por_campana_buckets(fecha_inicio, fecha_fin)
+    return DONACIONES_POR_CAMPANA.sql(
+        fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, monto_minimo=monto_minimo, monto_maximo=monto_maximo
+    )
+
+def _usa_rollup(*filtros_donacion) -> bool:
+    """El rollup solo sirve si ningún filtro restringe fechas o montos de donación."""
+    return ROLLUP_ENABLED and not any(filtros_donacion)
+
+def _as_datetime(value) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime(value.year, value.month, value.day)
+
+def _next_month(day: date) -> date:
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+def _segmentos_fecha(fecha_inicio, fecha_fin) -> dict:
+    """Parte [fecha_inicio, fecha_fin] en meses completos, días completos y bordes crudos.
+
+    Un día d está completo si todo [d, d+1) cae en la ventana; los tramos que
+    no cubren un día entero (hora de inicio distinta de medianoche y el día de
+    fecha_fin, que es inclusiva) se leen de donacion para que el total sea exacto.
+    Cada segmento es un par (desde, hasta) semiabierto; None = sin límite.
+    """
+    inicio, fin = _as_datetime(fecha_inicio), _as_datetime(fecha_fin)
+    crudos = []
+
+    if inicio is None:
+        dia_desde = None
+    elif inicio.time() == datetime.min.time():
+        dia_desde = inicio.date()
+    else:
+        dia_desde = inicio.date() + timedelta(days=1)
+        crudos.append((inicio, datetime.combine(dia_desde, datetime.min.time())))
+    dia_hasta = fin.date() if fin is not None else None
+
+    if dia_desde is not None and dia_hasta is not None and dia_desde >= dia_hasta:
+        # La ventana no cubre ningún día entero
+        return {"meses": [], "dias": [], "crudos": [(inicio, fin)]}
+    if fin is not None:
+        # Desde la medianoche del último día hasta fecha_fin (inclusive)
+        crudos.append((datetime.combine(dia_hasta, datetime.min.time()), fin))
+
+    if dia_desde is None or dia_desde.day == 1:
+        mes_desde = dia_desde
+    else:
+        mes_desde = _next_month(dia_desde)
+    mes_hasta = dia_hasta.replace(day=1) if dia_hasta is not None else None
+
+    if mes_desde is not None and mes_hasta is not None and mes_desde >= mes_hasta:
+        return {"meses": [], "dias": [(dia_desde, dia_hasta)], "crudos": crudos}
+
+    dias = []
+    if dia_desde is not None and dia_desde < mes_desde:
+        dias.append((dia_desde, mes_desde))
+    if dia_hasta is not None and mes_hasta < dia_hasta:
+        dias.append((mes_hasta, dia_hasta))
+    return {"meses": [(mes_desde, mes_hasta)], "dias": dias, "crudos": crudos}
+
+def _rango_sql(columna: str, desde, hasta, incluir_hasta: bool = False) -> tuple[str, list]:
+    condiciones, params = [], []
+    if desde is not None:
+        condiciones.append(f"{columna} >= %s")
+        params.append(desde)
+    if hasta is not None:
+        condiciones.append(f"{columna} {'<=' if incluir_hasta else '<'} %s")
+        params.append(hasta)
+    return "(" + (" AND ".join(condiciones) or "TRUE") + ")", params
+
+def _sql_donaciones_por_campana_buckets(fecha_inicio, fecha_fin) -> tuple[str, list]:
+    segmentos = _segmentos_fecha(fecha_inicio, fecha_fin)
+    partes, params = [], []
+
+    for tabla, columna, clave in (("donacion_mensual", "mes", "meses"), ("donacion_diaria", "dia", "dias")):
+        for desde, hasta in segmentos[clave]:
+            condicion, valores = _rango_sql(columna, desde, hasta)
+            partes.append(
+                f"SELECT campana_id, num_donaciones, CASE WHEN tipo_donacion = 'monetaria' THEN monto_total END AS monto_total "
+                f"FROM {tabla} WHERE {condicion}"
+            )
+            params += valores
+
+    if segmentos["crudos"]:
+        condiciones = []
+        ultimo = len(segmentos["crudos"]) - 1
+        for i, (desde, hasta) in enumerate(segmentos["crudos"]):
+            # El último tramo termina en fecha_fin, que es inclusiva
+            condicion, valores = _rango_sql("fecha", desde, hasta, incluir_hasta=(i == ultimo and fecha_fin is not None))
+            condiciones.append(condicion)
+            params += valores
+        partes.append(
+            "SELECT campana_id, 1 AS num_donaciones, CASE WHEN tipo = 'monetaria' THEN monto END AS monto_total FROM donacion_historica WHERE "
+            + " OR ".join(condiciones)
+        )
+
+    query = f"""
+    WITH agregado AS (
+        SELECT campana_id, SUM(num_donaciones) AS total_donaciones, SUM(monto_total) AS monto_total
+        FROM ({" UNION ALL ".join(partes)}) partes
+        GROUP BY campana_id
+    )
     SELECT 
         c.campana_id,
         c.nombre AS campana, 
-        COUNT(d.donacion_id) AS total_donaciones, 
-        COALESCE(SUM(d.monto), 0) AS monto_total,
+        COALESCE(a.total_donaciones, 0) AS total_donaciones, 
+        COALESCE(a.monto_total, 0) AS monto_total,
         c.fecha_inicio,
         c.fecha_fin,
         c.meta_monetaria,
         CASE 
-            WHEN c.meta_monetaria > 0 THEN COALESCE(SUM(d.monto), 0) / c.meta_monetaria 
+            WHEN c.meta_monetaria > 0 THEN COALESCE(a.monto_total, 0) / c.meta_monetaria 
             ELSE 0 
         END AS porcentaje_cumplimiento
     FROM campana c
-    LEFT JOIN donacion d ON c.campana_id = d.campana_id
-    WHERE 1=1
-    """
-    params = []
-    
-    if fecha_inicio:
-        query += " AND (d.fecha IS NULL OR d.fecha >= %s)"
-        params.append(fecha_inicio)
-    if fecha_fin:
-        query += " AND (d.fecha IS NULL OR d.fecha <= %s)"
-        params.append(fecha_fin)
-    if monto_minimo:
-        query += " AND (d.monto IS NULL OR d.monto >= %s)"
-        params.append(monto_minimo)
-    if monto_maximo:
-        query += " AND (d.monto IS NULL OR d.monto <= %s)"
-        params.append(monto_maximo)
-    
-    query += """
-    GROUP BY c.campana_id, c.nombre, c.fecha_inicio, c.fecha_fin, c.meta_monetaria
+    LEFT JOIN agregado a ON c.campana_id = a.campana_id
     ORDER BY monto_total DESC;
     """
-    
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute(query, params)
-            return cur.fetchall()
+    return query, params
+
+# --- Eventos de cambios (migración V005) -------------------------------------
+# Los triggers de donacion publican el delta por campaña de cada sentencia (el
+# monto solo de donaciones monetarias, como los totales de arriba); con él se
+# actualizan los resultados en cache sin volver a consultar.
+
+def _evento_en_filtros(evento: dict, fecha_inicio=None, fecha_fin=None, monto_minimo=None, monto_maximo=None) -> bool:
+    """True si todas las filas del evento (viejas y nuevas) pasan los filtros de donación."""
+    if evento["desde"] is None:  # la sentencia no tocó filas
+        return True
+    inicio, fin = _as_datetime(fecha_inicio), _as_datetime(fecha_fin)
+    if inicio is not None and datetime.fromisoformat(evento["desde"]) < inicio:
+        return False
+    if fin is not None and datetime.fromisoformat(evento["hasta"]) > fin:
+        return False
+    if evento["monto_min"] is None:  # solo donaciones en especie (monto NULL pasa los filtros)
+        return True
+    # Mismo criterio que los Filtro: un filtro en 0/None no se aplica
+    return not (monto_minimo and evento["monto_min"] < monto_minimo) and not (monto_maximo and evento["monto_max"] > monto_maximo)
+
+def _aplicar_deltas(valor, evento: dict, columna_monto: str, orden: str, todas: bool):
+    """Suma los deltas del evento a un resultado por campaña (lista de dicts o DataFrame).
+
+    Devuelve un objeto nuevo (el de la cache se comparte), reordenado por `orden`.
+    Con `todas`, el resultado trae todas las campañas: si falta una del evento
+    (p. ej. una campaña nueva) se devuelve None para que se vuelva a consultar.
+    """
+    montos = {campana_id: monto for campana_id, monto, _ in evento["campanas"]}
+    conteos = {campana_id: n for campana_id, _, n in evento["campanas"]}
+    if not montos:
+        return valor
+
+    if isinstance(valor, list):
+        filas, encontradas = [], 0
+        for fila in valor:
+            if fila["campana_id"] in montos:
+                encontradas += 1
+                fila = dict(fila)
+                fila[columna_monto] += montos[fila["campana_id"]]
+                fila["total_donaciones"] += conteos[fila["campana_id"]]
+                meta = fila["meta_monetaria"]
+                fila["porcentaje_cumplimiento"] = fila[columna_monto] / meta if meta and meta > 0 else 0
+            filas.append(fila)
+        if todas and encontradas < len(montos):
+            return None
+        filas.sort(key=lambda fila: fila[orden], reverse=True)
+        return filas
+
+    cambia = valor["campana_id"].isin(list(montos))
+    if todas and cambia.sum() < len(montos):
+        return None
+    df = valor.copy()
+    ids = df.loc[cambia, "campana_id"]
+    df.loc[cambia, columna_monto] += ids.map(lambda i: float(montos[i]))
+    df.loc[cambia, "total_donaciones"] += ids.map(conteos).astype(df["total_donaciones"].dtype)
+    meta = df.loc[cambia, "meta_monetaria"]
+    df.loc[cambia, "porcentaje_cumplimiento"] = (df.loc[cambia, columna_monto] / meta).where(meta > 0, 0.0)
+    return df.sort_values(orden, ascending=False, kind="stable", ignore_index=True)
+
+def _delta_donaciones_por_campana(valor, evento: dict, fecha_inicio=None, fecha_fin=None, monto_minimo=None, monto_maximo=None):
+    if _usa_rollup(fecha_inicio, fecha_fin, monto_minimo, monto_maximo):
+        # estadisticas_campana solo acumula INSERTs (V004): UPDATE/DELETE no cambian el resultado
+        if evento["op"] != "INSERT":
+            return valor
+    elif not _evento_en_filtros(evento, fecha_inicio, fecha_fin, monto_minimo, monto_maximo):
+        return None
+    return _aplicar_deltas(valor, evento, "monto_total", "monto_total", todas=True)
+
+@instrumentado("reporte", "donaciones_por_campana")
+@cached_report(ttl=300, tags=(TAG_DONACION,), delta=_delta_donaciones_por_campana)
+def get_donaciones_por_campana(
+    fecha_inicio: Optional[datetime] = None,
+    fecha_fin: Optional[datetime] = None,
+    monto_minimo: Optional[float] = None,
+    monto_maximo: Optional[float] = None
+) -> list[dict]:
+    return _fetch_all(*_sql_donaciones_por_campana(fecha_inicio, fecha_fin, monto_minimo, monto_maximo))
 
+VOLUNTARIOS_POR_ACTIVIDAD = registrar(Reporte(
+    "voluntarios_por_actividad",
+    desde="""actividad a
+    LEFT JOIN voluntario_actividad va ON a.actividad_id = va.actividad_id
+    LEFT JOIN voluntario v ON va.voluntario_id = v.voluntario_id""",
+    dimensiones={
+        "actividad_id": "a.actividad_id",
+        "actividad": "a.nombre",
+        "fecha_inicio": "a.fecha_inicio",
+        "fecha_fin": "a.fecha_fin",
+    },
+    medidas={
+        "total_voluntarios": "COUNT(DISTINCT va.voluntario_id)",
+        "edad_promedio": "AVG(EXTRACT(YEAR FROM AGE(CURRENT_DATE, v.fecha_nacimiento)))",
+    },
+    filtros={
+        "fecha_inicio": Filtro("a.fecha_inicio >= %s"),
+        "fecha_fin": Filtro("a.fecha_fin <= %s"),
+        "edad_minima": Filtro(condicion_edad_minima("v.fecha_nacimiento"), lambda v: [int(v)]),
+        "edad_maxima": Filtro(condicion_edad_maxima("v.fecha_nacimiento"), lambda v: [int(v) + 1]),
+    },
+    orden="total_voluntarios DESC NULLS LAST",
+    columnas=["actividad_id", "actividad", "total_voluntarios", "fecha_inicio", "fecha_fin", "edad_promedio"],
+))
+
+@instrumentado("reporte", "voluntarios_por_actividad")
+@cached_report(ttl=300, tags=(TAG_VOLUNTARIO,))
 def get_voluntarios_por_actividad(
     fecha_inicio: Optional[datetime] = None,
     fecha_fin: Optional[datetime] = None,
     edad_minima: Optional[int] = None,
     edad_maxima: Optional[int] = None
 ) -> list[dict]:
-    query = """
-    SELECT 
-        a.actividad_id,
-        a.nombre AS actividad, 
-        COUNT(DISTINCT va.voluntario_id) AS total_voluntarios,
-        a.fecha_inicio,
-        a.fecha_fin,
-        AVG(EXTRACT(YEAR FROM AGE(CURRENT_DATE, v.fecha_nacimiento))) AS edad_promedio
-    FROM actividad a
-    LEFT JOIN voluntario_actividad va ON a.actividad_id = va.actividad_id
-    LEFT JOIN voluntario v ON va.voluntario_id = v.voluntario_id
-    WHERE 1=1
-    """
-    params = []
-    
-    if fecha_inicio:
-        query += " AND a.fecha_inicio >= %s"
-        params.append(fecha_inicio)
-    if fecha_fin:
-        query += " AND a.fecha_fin <= %s"
-        params.append(fecha_fin)
-    if edad_minima:
-        query += " AND EXTRACT(YEAR FROM AGE(CURRENT_DATE, v.fecha_nacimiento)) >= %s"
-        params.append(edad_minima)
-    if edad_maxima:
-        query += " AND EXTRACT(YEAR FROM AGE(CURRENT_DATE, v.fecha_nacimiento)) <= %s"
-        params.append(edad_maxima)
-    
-    query += """
-    GROUP BY a.actividad_id, a.nombre, a.fecha_inicio, a.fecha_fin
-    ORDER BY total_voluntarios DESC NULLS LAST;
-    """
-    
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute(query, params)
-            return cur.fetchall()
+    return _fetch_all(*VOLUNTARIOS_POR_ACTIVIDAD.sql(
+        fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, edad_minima=edad_minima, edad_maxima=edad_maxima
+    ))
+
+FILTROS_DONANTE = {
+    "fecha_inicio": Filtro("d.fecha >= %s"),
+    "fecha_fin": Filtro("d.fecha <= %s"),
+    "tipo_donante": Filtro("dn.tipo = %s"),
+    "monto_minimo": Filtro("d.monto >= %s"),
+}
+
+# Ranking de donantes ordenado por (monto_total, donante_id) descendente. La
+# agregación recorre todas las donaciones de la ventana, así que se calcula una
+# vez por juego de filtros (_ranking_donantes) y las páginas se cortan de ahí.
+DONACIONES_POR_DONANTE = registrar(Reporte(
+    "donaciones_por_donante",
+    desde="""donacion_historica d
+    JOIN donante dn ON d.donante_id = dn.donante_id""",
+    dimensiones={
+        "donante_id": "d.donante_id",
+        "donante": """CASE 
+            WHEN dn.tipo = 'individual' THEN CONCAT(dn.nombre, ' ', dn.apellido)
+            ELSE dn.empresa
+        END""",
+        "tipo_donante": "dn.tipo",
+    },
+    medidas={
+        "total_donaciones": "COUNT(d.donacion_id)",
+        "monto_total": "COALESCE(SUM(d.monto), 0)",
+        "ultima_donacion": "MAX(d.fecha)",
+    },
+    filtros={
+        **FILTROS_DONANTE,
+        "limite": Filtro("%s", clausula="limit"),
+    },
+    agrupar=["d.donante_id", "dn.nombre", "dn.apellido", "dn.empresa", "dn.tipo"],
+    orden="monto_total DESC, d.donante_id DESC",
+))
+
+RANKING_DONANTES_TOTAL = registrar(Reporte(
+    "ranking_donantes_total",
+    desde=DONACIONES_POR_DONANTE.desde,
+    dimensiones={},
+    medidas={"total": "COUNT(DISTINCT d.donante_id)"},
+    filtros=FILTROS_DONANTE,
+))
+
+def _sql_donaciones_por_donante(
+    fecha_inicio: Optional[datetime] = None,
+    fecha_fin: Optional[datetime] = None,
+    tipo_donante: Optional[str] = None,
+    monto_minimo: Optional[float] = None,
+    limite: Optional[int] = None
+) -> tuple[str, list]:
+    return DONACIONES_POR_DONANTE.sql(
+        fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, tipo_donante=tipo_donante, monto_minimo=monto_minimo,
+        limite=limite
+    )
+
+@cached_report(ttl=300, tags=(TAG_DONACION,))
+def _ranking_donantes(
+    fecha_inicio: Optional[datetime] = None,
+    fecha_fin: Optional[datetime] = None,
+    tipo_donante: Optional[str] = None,
+    monto_minimo: Optional[float] = None
+) -> list[dict]:
+    """Ranking completo para un juego de filtros; lo comparten todas sus páginas."""
+    return _fetch_all(*_sql_donaciones_por_donante(fecha_inicio, fecha_fin, tipo_donante, monto_minimo))
+
+@instrumentado("reporte", "ranking_donantes")
+def get_ranking_donantes(
+    fecha_inicio: Optional[datetime] = None,
+    fecha_fin: Optional[datetime] = None,
+    tipo_donante: Optional[str] = None,
+    monto_minimo: Optional[float] = None,
+    page_size: int = 50,
+    cursor: Optional[tuple] = None
+) -> dict:
+    """Una página del ranking: {"rows": [...], "next_cursor": (monto_total, donante_id) | None}."""
+    ranking = _ranking_donantes(fecha_inicio, fecha_fin, tipo_donante, monto_minimo)
+    inicio = 0
+    if cursor is not None:
+        # Primera fila después del cursor en el orden (monto_total, donante_id) descendente
+        inicio = bisect.bisect_right(ranking, (-cursor[0], -cursor[1]),
+                                     key=lambda r: (-r["monto_total"], -r["donante_id"]))
+    rows = ranking[inicio:inicio + page_size]
+    next_cursor = None
+    if inicio + page_size < len(ranking):
+        next_cursor = (rows[-1]["monto_total"], rows[-1]["donante_id"])
+    return {"rows": rows, "next_cursor": next_cursor}
+
+@instrumentado("total", "ranking_donantes")
+@cached_report(ttl=300, tags=(TAG_DONACION,))
+def count_ranking_donantes(
+    fecha_inicio: Optional[datetime] = None,
+    fecha_fin: Optional[datetime] = None,
+    tipo_donante: Optional[str] = None,
+    monto_minimo: Optional[float] = None
+) -> int:
+    """Total de donantes del ranking; aparte para calcularlo solo si se pide."""
+    return _fetch_all(*RANKING_DONANTES_TOTAL.sql(
+        fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, tipo_donante=tipo_donante, monto_minimo=monto_minimo
+    ))[0]["total"]
 
 def get_donaciones_por_donante(
     fecha_inicio: Optional[datetime] = None,
@@ -102,100 +438,132 @@ def get_donaciones_por_donante(
     tipo_donante: Optional[str] = None,
     monto_minimo: Optional[float] = None
 ) -> list[dict]:
-    query = """
-    SELECT 
-        d.donante_id,
-        CASE 
-            WHEN dn.tipo = 'individual' THEN CONCAT(dn.nombre, ' ', dn.apellido)
-            ELSE dn.empresa
-        END AS donante,
-        dn.tipo AS tipo_donante,
-        COUNT(d.donacion_id) AS total_donaciones,
-        SUM(d.monto) AS monto_total,
-        MAX(d.fecha) AS ultima_donacion
-    FROM donacion d
-    JOIN donante dn ON d.donante_id = dn.donante_id
-    WHERE 1=1
-    """
-    params = []
-    
-    if fecha_inicio:
-        query += " AND d.fecha >= %s"
-        params.append(fecha_inicio)
-    if fecha_fin:
-        query += " AND d.fecha <= %s"
-        params.append(fecha_fin)
-    if tipo_donante:
-        query += " AND dn.tipo = %s"
-        params.append(tipo_donante)
-    if monto_minimo:
-        query += " AND d.monto >= %s"
-        params.append(monto_minimo)
-    
-    query += """
-    GROUP BY d.donante_id, dn.nombre, dn.apellido, dn.empresa, dn.tipo
-    ORDER BY monto_total DESC NULLS LAST
-    LIMIT 50;
-    """
-    
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute(query, params)
-            return cur.fetchall()
+    """Top 50 del ranking (primera página de get_ranking_donantes)."""
+    return get_ranking_donantes(fecha_inicio, fecha_fin, tipo_donante, monto_minimo)["rows"]
+
+_GRUPO_EDAD, _ORDEN_EDAD = grupo_edad_sql("v.fecha_nacimiento")
+
+# La edad y el grupo se calculan una sola vez por fila en la subconsulta
+DISTRIBUCION_VOLUNTARIOS_POR_EDAD = registrar(Reporte(
+    "distribucion_voluntarios_por_edad",
+    desde=f"""(
+        SELECT 
+            v.voluntario_id,
+            EXTRACT(YEAR FROM AGE(CURRENT_DATE, v.fecha_nacimiento)) AS edad,
+            {_GRUPO_EDAD} AS grupo_edad,
+            {_ORDEN_EDAD} AS orden
+        FROM voluntario v
+        JOIN voluntario_actividad va ON v.voluntario_id = va.voluntario_id
+        JOIN actividad a ON va.actividad_id = a.actividad_id
+        {{where}}
+    ) filas""",
+    dimensiones={"grupo_edad": "grupo_edad"},
+    medidas={
+        "total_voluntarios": "COUNT(DISTINCT voluntario_id)",
+        "edad_promedio": "ROUND(AVG(edad))",
+    },
+    filtros={
+        "fecha_inicio": Filtro("a.fecha_inicio >= %s"),
+        "fecha_fin": Filtro("a.fecha_fin <= %s"),
+        "genero": Filtro("v.genero = %s"),
+        "actividad_id": Filtro("a.actividad_id = %s"),
+    },
+    agrupar=["grupo_edad", "orden"],
+    orden="orden",
+))
 
+@instrumentado("reporte", "distribucion_voluntarios_por_edad")
+@cached_report(ttl=600, tags=(TAG_VOLUNTARIO,))
 def get_distribucion_voluntarios_por_edad(
     fecha_inicio: Optional[datetime] = None,
     fecha_fin: Optional[datetime] = None,
     genero: Optional[str] = None,
     actividad_id: Optional[int] = None
 ) -> list[dict]:
-    query = """
-    SELECT 
-        CASE
-            WHEN EXTRACT(YEAR FROM AGE(CURRENT_DATE, v.fecha_nacimiento)) < 18 THEN 'Menor de 18'
-            WHEN EXTRACT(YEAR FROM AGE(CURRENT_DATE, v.fecha_nacimiento)) BETWEEN 18 AND 25 THEN '18-25'
-            WHEN EXTRACT(YEAR FROM AGE(CURRENT_DATE, v.fecha_nacimiento)) BETWEEN 26 AND 35 THEN '26-35'
-            WHEN EXTRACT(YEAR FROM AGE(CURRENT_DATE, v.fecha_nacimiento)) BETWEEN 36 AND 50 THEN '36-50'
-            ELSE 'Mayor de 50'
-        END AS grupo_edad,
-        COUNT(DISTINCT v.voluntario_id) AS total_voluntarios,
-        ROUND(AVG(EXTRACT(YEAR FROM AGE(CURRENT_DATE, v.fecha_nacimiento)))) AS edad_promedio
-    FROM voluntario v
-    JOIN voluntario_actividad va ON v.voluntario_id = va.voluntario_id
-    JOIN actividad a ON va.actividad_id = a.actividad_id
-    WHERE 1=1
-    """
-    params = []
-
-    if fecha_inicio:
-        query += " AND a.fecha_inicio >= %s"
-        params.append(fecha_inicio)
-    if fecha_fin:
-        query += " AND a.fecha_fin <= %s"
-        params.append(fecha_fin)
-    if genero:
-        query += " AND v.genero = %s"
-        params.append(genero)
-    if actividad_id:
-        query += " AND a.actividad_id = %s"
-        params.append(actividad_id)
-
-    query += """
-    GROUP BY 
-        CASE
-            WHEN EXTRACT(YEAR FROM AGE(CURRENT_DATE, v.fecha_nacimiento)) < 18 THEN 'Menor de 18'
-            WHEN EXTRACT(YEAR FROM AGE(CURRENT_DATE, v.fecha_nacimiento)) BETWEEN 18 AND 25 THEN '18-25'
-            WHEN EXTRACT(YEAR FROM AGE(CURRENT_DATE, v.fecha_nacimiento)) BETWEEN 26 AND 35 THEN '26-35'
-            WHEN EXTRACT(YEAR FROM AGE(CURRENT_DATE, v.fecha_nacimiento)) BETWEEN 36 AND 50 THEN '36-50'
-            ELSE 'Mayor de 50'
-        END
-    """
+    return _fetch_all(*DISTRIBUCION_VOLUNTARIOS_POR_EDAD.sql(
+        fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, genero=genero, actividad_id=actividad_id
+    ))
 
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute(query, params)
-            return cur.fetchall()
+FILTROS_CAMPANA = {
+    "fecha_inicio": Filtro("c.fecha_inicio >= %s"),
+    "fecha_fin": Filtro("(c.fecha_fin IS NULL OR c.fecha_fin <= %s)"),
+    "monto_objetivo_min": Filtro("c.meta_monetaria >= %s"),
+    "monto_objetivo_max": Filtro("c.meta_monetaria <= %s"),
+    "estado": Filtro("c.estado = %s"),
+}
+_COLUMNAS_EFECTIVIDAD = ["campana_id", "campana", "fecha_inicio", "fecha_fin", "meta_monetaria", "estado",
+                         "monto_recaudado", "porcentaje_cumplimiento", "total_donaciones", "total_voluntarios"]
+_DIMENSIONES_CAMPANA = {
+    "campana_id": "c.campana_id",
+    "campana": "c.nombre",
+    "fecha_inicio": "c.fecha_inicio",
+    "fecha_fin": "c.fecha_fin",
+    "meta_monetaria": "c.meta_monetaria",
+    "estado": "c.estado",
+}
+
+# Todos los filtros son sobre la campaña: con el rollup no hace falta agregar donaciones
+EFECTIVIDAD_CAMPANAS_ROLLUP = registrar(Reporte(
+    "efectividad_campanas_rollup",
+    desde="""campana c
+    LEFT JOIN estadisticas_campana e ON c.campana_id = e.campana_id""",
+    dimensiones={
+        **_DIMENSIONES_CAMPANA,
+        "monto_recaudado": "COALESCE(e.monto_recaudado, 0)",
+        "porcentaje_cumplimiento": """CASE 
+            WHEN c.meta_monetaria > 0 THEN COALESCE(e.monto_recaudado, 0) / c.meta_monetaria
+            ELSE 0
+        END""",
+        "total_donaciones": "COALESCE(e.num_donaciones, 0)",
+        "total_voluntarios": "COALESCE(e.num_voluntarios, 0)",
+    },
+    filtros=FILTROS_CAMPANA,
+    orden="porcentaje_cumplimiento DESC NULLS LAST",
+))
+
+EFECTIVIDAD_CAMPANAS = registrar(Reporte(
+    "efectividad_campanas",
+    desde="""campana c
+    LEFT JOIN donacion_historica d ON c.campana_id = d.campana_id""",
+    dimensiones=_DIMENSIONES_CAMPANA,
+    medidas={
+        "monto_recaudado": MONTO_MONETARIO,
+        "porcentaje_cumplimiento": f"""CASE 
+            WHEN c.meta_monetaria > 0 THEN {MONTO_MONETARIO} / c.meta_monetaria
+            ELSE 0
+        END""",
+        "total_donaciones": "COUNT(d.donacion_id)",
+        "total_voluntarios": """(SELECT COUNT(DISTINCT va.voluntario_id)
+          FROM voluntario_actividad va
+          JOIN actividad a ON va.actividad_id = a.actividad_id
+          WHERE a.campana_id = c.campana_id)""",
+    },
+    filtros=FILTROS_CAMPANA,
+    orden="porcentaje_cumplimiento DESC NULLS LAST",
+    columnas=_COLUMNAS_EFECTIVIDAD,
+))
 
+def _sql_efectividad_campanas(
+    fecha_inicio: Optional[datetime] = None,
+    fecha_fin: Optional[datetime] = None,
+    monto_objetivo_min: Optional[float] = None,
+    monto_objetivo_max: Optional[float] = None,
+    estado: Optional[str] = None
+) -> tuple[str, list]:
+    reporte = EFECTIVIDAD_CAMPANAS_ROLLUP if ROLLUP_ENABLED else EFECTIVIDAD_CAMPANAS
+    return reporte.sql(
+        fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, monto_objetivo_min=monto_objetivo_min,
+        monto_objetivo_max=monto_objetivo_max, estado=estado
+    )
+
+def _delta_efectividad_campanas(valor, evento: dict, **filtros):
+    # Los filtros son sobre la campaña: las que no están en el resultado quedaron fuera
+    if ROLLUP_ENABLED and evento["op"] != "INSERT":
+        return valor
+    return _aplicar_deltas(valor, evento, "monto_recaudado", "porcentaje_cumplimiento", todas=False)
+
+@instrumentado("reporte", "efectividad_campanas")
+@cached_report(ttl=300, tags=(TAG_DONACION, TAG_VOLUNTARIO), delta=_delta_efectividad_campanas)
 def get_efectividad_campanas(
     fecha_inicio: Optional[datetime] = None,
     fecha_fin: Optional[datetime] = None,
@@ -203,99 +571,172 @@ def get_efectividad_campanas(
     monto_objetivo_max: Optional[float] = None,
     estado: Optional[str] = None
 ) -> list[dict]:
-    query = """
-    SELECT 
-        c.campana_id,
-        c.nombre AS campana,
-        c.fecha_inicio,
-        c.fecha_fin,
-        c.meta_monetaria,
-        c.estado,
-        COALESCE(SUM(d.monto), 0) AS monto_recaudado,
-        CASE 
-            WHEN c.meta_monetaria > 0 THEN COALESCE(SUM(d.monto), 0) / c.meta_monetaria
-            ELSE 0
-        END AS porcentaje_cumplimiento,
-        COUNT(d.donacion_id) AS total_donaciones,
-        (SELECT COUNT(DISTINCT va.voluntario_id)
-          FROM voluntario_actividad va
-          JOIN actividad a ON va.actividad_id = a.actividad_id
-          WHERE a.campana_id = c.campana_id) AS total_voluntarios
-    FROM campana c
-    LEFT JOIN donacion d ON c.campana_id = d.campana_id
-    WHERE 1=1
-    """
-    params = []
-    
-    if fecha_inicio:
-        query += " AND c.fecha_inicio >= %s"
-        params.append(fecha_inicio)
-    if fecha_fin:
-        query += " AND (c.fecha_fin IS NULL OR c.fecha_fin <= %s)"
-        params.append(fecha_fin)
-    if monto_objetivo_min:
-        query += " AND c.meta_monetaria >= %s"
-        params.append(monto_objetivo_min)
-    if monto_objetivo_max:
-        query += " AND c.meta_monetaria <= %s"
-        params.append(monto_objetivo_max)
-    if estado:
-        query += " AND c.estado = %s"
-        params.append(estado)
-    
-    query += """
-    GROUP BY c.campana_id, c.nombre, c.fecha_inicio, c.fecha_fin, c.meta_monetaria, c.estado
-    ORDER BY porcentaje_cumplimiento DESC NULLS LAST;
-    """
-    
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute(query, params)
-            return cur.fetchall()   
+    return _fetch_all(*_sql_efectividad_campanas(fecha_inicio, fecha_fin, monto_objetivo_min, monto_objetivo_max, estado))
 
+# Campañas con alguna actividad en la ventana: semi-join (EXISTS), así cada
+# recurso sale una sola vez sin importar cuántas actividades tenga su campaña
+# y no hace falta GROUP BY. Con las dos fechas se usa `ventana`, para que sea
+# la misma actividad la que cumple ambas.
+_ACTIVIDAD_EN_VENTANA = "EXISTS (SELECT 1 FROM actividad a WHERE a.campana_id = c.campana_id AND {})"
+
+RECURSO_UTILIZADO_POR_CAMPANA = registrar(Reporte(
+    "recurso_utilizado_por_campana",
+    desde="""campana c
+    JOIN recurso r ON c.campana_id = r.campana_id""",
+    dimensiones={
+        "campana_id": "c.campana_id",
+        "campana": "c.nombre",
+        "recurso_id": "r.recurso_id",
+        "recurso": "r.nombre",
+        "cantidad_requerida": "r.cantidad_requerida",
+        "cantidad_actual": "r.cantidad_actual",
+        # 0-100, como lo espera render_table; cantidad_requerida > 0 por CHECK
+        "porcentaje_completado": "ROUND(r.cantidad_actual * 100.0 / r.cantidad_requerida, 2)",
+        "unidad_medida": "r.unidad_medida",
+    },
+    filtros={
+        "fecha_inicio": Filtro(_ACTIVIDAD_EN_VENTANA.format("a.fecha_inicio >= %s")),
+        "fecha_fin": Filtro(_ACTIVIDAD_EN_VENTANA.format("a.fecha_fin <= %s")),
+        "ventana": Filtro(_ACTIVIDAD_EN_VENTANA.format("a.fecha_inicio >= %s AND a.fecha_fin <= %s"), list),
+        "tipo_recurso": Filtro("r.nombre ILIKE %s", lambda v: [f"%{v}%"]),
+        "porcentaje_minimo": Filtro("r.cantidad_actual * 100.0 >= %s * r.cantidad_requerida"),
+    },
+    orden="porcentaje_completado DESC, r.recurso_id",
+))
+
+def _sql_recurso_utilizado_por_campana(
+    fecha_inicio: Optional[datetime] = None,
+    fecha_fin: Optional[datetime] = None,
+    tipo_recurso: Optional[str] = None,
+    porcentaje_minimo: Optional[float] = None
+) -> tuple[str, list]:
+    ventana = None
+    if fecha_inicio and fecha_fin:
+        ventana, fecha_inicio, fecha_fin = (fecha_inicio, fecha_fin), None, None
+    return RECURSO_UTILIZADO_POR_CAMPANA.sql(
+        fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, ventana=ventana, tipo_recurso=tipo_recurso,
+        porcentaje_minimo=porcentaje_minimo
+    )
+
+@instrumentado("reporte", "recurso_utilizado_por_campana")
+@cached_report(ttl=120)
 def get_recurso_utilizado_por_campana(
     fecha_inicio: Optional[datetime] = None,
     fecha_fin: Optional[datetime] = None,
     tipo_recurso: Optional[str] = None,
     porcentaje_minimo: Optional[float] = None
 ) -> list[dict]:
-    """NUEVO REPORTE 5: Recursos utilizados por campaña"""
-    query = """
-    SELECT 
-        c.campana_id,
-        c.nombre AS campana,
-        r.nombre AS recurso,
-        r.cantidad_requerida,
-        r.cantidad_actual,
-        safe_divide(r.cantidad_actual, r.cantidad_requerida) AS porcentaje_completado,
-        r.unidad_medida
-    FROM campana c
-    JOIN recurso r ON c.campana_id = r.campana_id
-    JOIN actividad a ON c.campana_id = a.campana_id
-    WHERE 1=1
-    """
-    params = []
-    
-    if fecha_inicio:
-        query += " AND a.fecha_inicio >= %s"
-        params.append(fecha_inicio)
-    if fecha_fin:
-        query += " AND a.fecha_fin <= %s"
-        params.append(fecha_fin)
-    if tipo_recurso:
-        query += " AND r.nombre ILIKE %s"
-        params.append(f'%{tipo_recurso}%')
-    if porcentaje_minimo:
-        query += " AND (r.cantidad_actual / r.cantidad_requerida) >= %s"
-        params.append(porcentaje_minimo/100)
-    
-    query += """
-    GROUP BY c.campana_id, c.nombre, r.recurso_id, r.nombre, r.cantidad_requerida, 
-             r.cantidad_actual, r.unidad_medida
-    ORDER BY porcentaje_completado DESC;
-    """
-    
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute(query, params)
-            return cur.fetchall()
\ No newline at end of file
+    """Avance de cada recurso (porcentaje_completado de 0 a 100) en las campañas con actividades en la ventana."""
+    return _fetch_all(*_sql_recurso_utilizado_por_campana(fecha_inicio, fecha_fin, tipo_recurso, porcentaje_minimo))
+
+
+# Constructores de SQL por reporte (usados para streaming/exports y diagnóstico)
+CONSULTAS = {
+    "donaciones_por_campana": _sql_donaciones_por_campana,
+    "voluntarios_por_actividad": VOLUNTARIOS_POR_ACTIVIDAD.sql,
+    "donaciones_por_donante": _sql_donaciones_por_donante,
+    "distribucion_voluntarios_por_edad": DISTRIBUCION_VOLUNTARIOS_POR_EDAD.sql,
+    "efectividad_campanas": _sql_efectividad_campanas,
+    "recurso_utilizado_por_campana": _sql_recurso_utilizado_por_campana,
+}
+
+
+def build_query(report: str, **filters) -> tuple[str, list]:
+    if report not in CONSULTAS:
+        raise ValueError(f"Reporte desconocido: {report}")
+    return CONSULTAS[report](**filters)
+
+
+@instrumentado("stream", stream=True)
+def stream_report(report: str, batch_size: Optional[int] = None, columnar: bool = False, **filters):
+    """Filas del reporte en lotes de tuplas (o de columnas), leídas con un cursor del lado del servidor."""
+    query, params = build_query(report, **filters)
+    registrar_consulta(query, params)
+    return stream_query(query, params, batch_size, columnar)
+
+
+def iter_report(report: str, batch_size: Optional[int] = None, **filters):
+    """Filas del reporte una por una, como tuplas; `batch_size` es el itersize del cursor."""
+    for _, rows in stream_report(report, batch_size, **filters):
+        yield from rows
+
+
+def first_page_report(report: str, limite: int = 50, **filters) -> tuple[list, list]:
+    """(columnas, primeras `limite` filas) sin traer el resto del resultado."""
+    stream = stream_report(report, batch_size=limite, **filters)
+    try:
+        return next(stream)
+    finally:
+        # Cierra el cursor con nombre: el resto de las filas nunca sale del servidor
+        stream.close()
+
+
+def _subconsulta(report: str, **filters) -> tuple[str, list]:
+    """Consulta del reporte lista para usarse dentro de un FROM (...)."""
+    query, params = build_query(report, **filters)
+    return query.strip().rstrip(";"), params
+
+
+@instrumentado("total")
+def count_report(report: str, **filters) -> int:
+    """Filas que tendría el reporte, contadas en la base."""
+    query, params = _subconsulta(report, **filters)
+    return _fetch_all(f"SELECT COUNT(*) AS total FROM ({query}) AS r", params)[0]["total"]
+
+
+@instrumentado("total")
+def totales_report(report: str, columnas: list[str], **filters) -> dict:
+    """Suma de las columnas indicadas sobre todo el reporte, calculada en la base."""
+    for columna in columnas:
+        if not columna.isidentifier():
+            raise ValueError(f"Columna inválida: {columna}")
+    query, params = _subconsulta(report, **filters)
+    sumas = ", ".join(f"SUM(r.{c}) AS {c}" for c in columnas)
+    return dict(_fetch_all(f"SELECT COUNT(*) AS filas, {sumas} FROM ({query}) AS r", params)[0])
+
+
+def _streaming(report: str):
+    def stream(batch_size: Optional[int] = None, columnar: bool = False, **filters):
+        return stream_report(report, batch_size, columnar, **filters)
+    stream.__name__ = stream.__qualname__ = f"stream_{report}"
+    stream.__doc__ = f"Versión en streaming de get_{report}: lotes (columnas, filas) de un cursor con nombre."
+    return stream
+
+
+# Variantes en streaming de cada reporte (mismos filtros que get_*)
+stream_donaciones_por_campana = _streaming("donaciones_por_campana")
+stream_voluntarios_por_actividad = _streaming("voluntarios_por_actividad")
+stream_donaciones_por_donante = _streaming("donaciones_por_donante")
+stream_distribucion_voluntarios_por_edad = _streaming("distribucion_voluntarios_por_edad")
+stream_efectividad_campanas = _streaming("efectividad_campanas")
+stream_recurso_utilizado_por_campana = _streaming("recurso_utilizado_por_campana")
+
+
+@instrumentado("arrow")
+def arrow_report(report: str, **filters):
+    """Reporte como pyarrow.Table (DECIMAL -> decimal128, TIMESTAMP -> timestamp)."""
+    query, params = build_query(report, **filters)
+    registrar_consulta(query, params)
+    return fetch_arrow(query, params)
+
+
+def _columnar(report: str):
+    """Versión de get_<report> que devuelve un DataFrame tipado, con la misma cache."""
+    get = globals()[f"get_{report}"]
+
+    def frame(**filters):
+        query, params = build_query(report, **filters)
+        registrar_consulta(query, params)
+        return fetch_frame(query, params)
+    frame.__name__ = frame.__qualname__ = f"frame_{report}"
+    frame.__doc__ = f"Resultado de get_{report} como DataFrame con columnas float64/int64/datetime64."
+    return instrumentado("frame", report)(cached_report(ttl=get.ttl, tags=get.tags, delta=get.delta)(frame))
+
+
+# DataFrames tipados de cada reporte (mismos filtros que get_*); no modificar
+# en el lugar: el mismo objeto se comparte desde la cache
+frame_donaciones_por_campana = _columnar("donaciones_por_campana")
+frame_voluntarios_por_actividad = _columnar("voluntarios_por_actividad")
+frame_distribucion_voluntarios_por_edad = _columnar("distribucion_voluntarios_por_edad")
+frame_efectividad_campanas = _columnar("efectividad_campanas")
+frame_recurso_utilizado_por_campana = _columnar("recurso_utilizado_por_campana")
@@ -0,0 +1,114 @@
+"""Admisión de consultas (db/ejecucion.py): orden FIFO, cola llena, vencimiento y cancelación."""
+import threading
+import time
+
+import pytest
+
+from db import ejecucion
+from db.ejecucion import Admision, ConsultaCancelada, ConsultaRechazada, ConsultaVencida, Turno
+
+
+def _esperar(condicion, timeout: float = 2.0):
+    limite = time.monotonic() + timeout
+    while not condicion():
+        assert time.monotonic() < limite, "la condición no se cumplió a tiempo"
+        time.sleep(0.005)
+
+
+def _en_hilo(admision: Admision, resultados: list, nombre, turno: Turno | None = None) -> threading.Thread:
+    """Entra, anota el resultado (nombre o excepción) y sale."""
+    def correr():
+        try:
+            admision.entrar(turno)
+        except Exception as e:
+            resultados.append((nombre, type(e)))
+            return
+        resultados.append(nombre)
+        admision.salir()
+
+    hilo = threading.Thread(target=correr, daemon=True)
+    hilo.start()
+    return hilo
+
+
+def test_entra_sin_esperar_hasta_el_limite():
+    admision = Admision(limite=2, max_cola=1, espera=1)
+    admision.entrar()
+    admision.entrar()
+    assert admision.stats() == {"en_curso": 2, "en_cola": 0, "limite": 2}
+    admision.salir()
+    admision.salir()
+    assert admision.stats()["en_curso"] == 0
+
+
+def test_la_cola_respeta_el_orden_de_llegada():
+    admision = Admision(limite=1, max_cola=10, espera=5)
+    admision.entrar()
+    orden, hilos = [], []
+    for i in range(5):
+        hilos.append(_en_hilo(admision, orden, i))
+        _esperar(lambda: admision.stats()["en_cola"] == i + 1)
+    admision.salir()
+    for hilo in hilos:
+        hilo.join(2)
+    assert orden == [0, 1, 2, 3, 4]
+    assert admision.stats() == {"en_curso": 0, "en_cola": 0, "limite": 1}
+
+
+def test_rechaza_con_la_cola_llena():
+    admision = Admision(limite=1, max_cola=1, espera=5)
+    admision.entrar()
+    resultados = []
+    hilo = _en_hilo(admision, resultados, "encolada")
+    _esperar(lambda: admision.stats()["en_cola"] == 1)
+
+    with pytest.raises(ConsultaRechazada):
+        admision.entrar()
+    admision.salir()
+    hilo.join(2)
+    assert resultados == ["encolada"]
+
+
+def test_vence_si_espera_demasiado():
+    admision = Admision(limite=1, max_cola=5, espera=0.1)
+    admision.entrar()
+    inicio = time.monotonic()
+    with pytest.raises(ConsultaVencida):
+        admision.entrar()
+    assert 0.1 <= time.monotonic() - inicio < 1
+    assert admision.stats() == {"en_curso": 1, "en_cola": 0, "limite": 1}
+    admision.salir()
+
+
+def test_un_turno_cancelado_sale_de_la_cola(monkeypatch):
+    admision = Admision(limite=1, max_cola=5, espera=5)
+    monkeypatch.setattr(ejecucion, "_admision", admision)  # Turno.cancelar despierta a esta
+    admision.entrar()
+    turno, resultados = Turno("sesion"), []
+    hilo = _en_hilo(admision, resultados, "cancelada", turno)
+    _esperar(lambda: admision.stats()["en_cola"] == 1)
+
+    inicio = time.monotonic()
+    turno.cancelar()
+    hilo.join(2)
+    assert resultados == [("cancelada", ConsultaCancelada)]
+    assert time.monotonic() - inicio < 1
+    assert admision.stats()["en_cola"] == 0
+    admision.salir()
+
+
+def test_los_cancelados_no_ocupan_lugar_en_la_cola():
+    # Sin monkeypatch: el cancelado sigue en la cola hasta que algo despierte a esta admisión
+    admision = Admision(limite=1, max_cola=1, espera=5)
+    admision.entrar()
+    turno, resultados = Turno("sesion"), []
+    cancelada = _en_hilo(admision, resultados, "cancelada", turno)
+    _esperar(lambda: admision.stats()["en_cola"] == 1)
+    turno.cancelar()
+
+    siguiente = _en_hilo(admision, resultados, "siguiente")
+    _esperar(lambda: admision.stats()["en_cola"] == 2)
+    admision.salir()
+    cancelada.join(2)
+    siguiente.join(2)
+    assert resultados == [("cancelada", ConsultaCancelada), "siguiente"]
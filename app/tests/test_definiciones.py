@@ -0,0 +1,102 @@
+"""Compilador de services/definiciones.py: numeración $n y nombre de sentencia por máscara."""
+import re
+
+import pytest
+
+import services.reports  # noqa: F401  (registra los reportes en REPORTES)
+from services.definiciones import PREFIJO_SENTENCIA, REPORTES, Filtro, Reporte
+
+
+def _reporte(**extra) -> Reporte:
+    return Reporte(
+        "prueba",
+        desde="donacion d",
+        dimensiones={"campana_id": "d.campana_id"},
+        medidas={"total": "SUM(d.monto)"},
+        filtros={
+            "desde": Filtro("d.fecha >= %s"),
+            "ventana": Filtro("d.fecha BETWEEN %s AND %s", list),
+            "minimo": Filtro("SUM(d.monto) >= %s", clausula="having"),
+            "limite": Filtro("%s", clausula="limit"),
+        },
+        orden="total DESC",
+        **extra,
+    )
+
+
+def _marcadores(sql: str) -> list[int]:
+    return [int(n) for n in re.findall(r"\$(\d+)", sql)]
+
+
+def test_mascara_solo_cuenta_filtros_con_valor():
+    reporte = _reporte()
+    assert reporte.mascara({}) == 0
+    assert reporte.mascara({"desde": "2024-01-01", "minimo": None, "limite": 0}) == 0b0001
+    assert reporte.mascara({"ventana": ["a", "b"], "limite": 10}) == 0b1010
+
+
+def test_mascara_rechaza_filtros_desconocidos():
+    with pytest.raises(ValueError, match="otro"):
+        _reporte().mascara({"otro": 1})
+
+
+def test_numera_parametros_en_orden_where_having_limit():
+    sentencia, params = _reporte().sql(limite=50, minimo=100, ventana=["2024-01-01", "2024-12-31"], desde="2023-01-01")
+
+    assert _marcadores(sentencia.sql_preparado) == [1, 2, 3, 4, 5]
+    assert "%s" not in sentencia.sql_preparado
+    assert sentencia.count("%s") == len(params) == 5
+    assert params == ["2023-01-01", "2024-01-01", "2024-12-31", 100, 50]
+    assert sentencia.sql_preparado.index("$3") < sentencia.sql_preparado.index("HAVING") < sentencia.sql_preparado.index("$4")
+    assert sentencia.sql_preparado.rstrip().endswith("LIMIT $5")
+
+
+def test_sin_filtros_no_hay_parametros():
+    sentencia, params = _reporte().sql()
+    assert params == []
+    assert _marcadores(sentencia.sql_preparado) == []
+    assert "WHERE" not in sentencia and "HAVING" not in sentencia and "LIMIT" not in sentencia
+
+
+def test_nombre_de_sentencia_por_mascara():
+    reporte = _reporte()
+    con_desde, _ = reporte.sql(desde="2024-01-01")
+    con_minimo, _ = reporte.sql(minimo=10)
+    otra_vez, _ = reporte.sql(desde="2025-06-01")
+
+    assert con_desde.nombre == f"{PREFIJO_SENTENCIA}prueba_1"
+    assert con_minimo.nombre == f"{PREFIJO_SENTENCIA}prueba_4"
+    # El texto no depende de los valores: misma máscara, misma sentencia compilada
+    assert otra_vez is con_desde
+    assert reporte.sentencias() == [f"{PREFIJO_SENTENCIA}prueba_1", f"{PREFIJO_SENTENCIA}prueba_4"]
+
+
+def test_where_dentro_de_la_subconsulta():
+    reporte = Reporte(
+        "sub",
+        desde="campana c LEFT JOIN (SELECT * FROM donacion d {where}) d ON c.campana_id = d.campana_id",
+        dimensiones={"campana_id": "c.campana_id"},
+        filtros={"desde": Filtro("d.fecha >= %s")},
+    )
+    con_filtro, _ = reporte.sql(desde="2024-01-01")
+    sin_filtro, _ = reporte.sql()
+
+    assert "FROM donacion d WHERE d.fecha >= $1) d" in con_filtro.sql_preparado
+    assert "{where}" not in sin_filtro and "WHERE" not in sin_filtro
+
+
+def test_filtro_en_clausula_invalida():
+    with pytest.raises(ValueError):
+        Filtro("x = %s", clausula="order")
+
+
+@pytest.mark.parametrize("nombre", sorted(REPORTES))
+def test_reportes_registrados_numeran_todos_los_parametros(nombre):
+    reporte = REPORTES[nombre]
+    for mascara in range(1 << len(reporte.filtros)):
+        sentencia, orden = reporte.compilar(mascara)
+        marcadores = _marcadores(sentencia.sql_preparado)
+        assert marcadores == list(range(1, len(marcadores) + 1))
+        assert len(marcadores) == sentencia.count("%s")
+        assert sentencia.nombre == f"{PREFIJO_SENTENCIA}{nombre}_{mascara}"
+        assert len(orden) == bin(mascara).count("1")
@@ -0,0 +1,94 @@
+"""Validación por fila de la ingesta (services/ingesta.py), sin tocar la base."""
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from services.ingesta import (
+    COLUMNAS_DONACION, COLUMNAS_VOLUNTARIO_ACTIVIDAD, FilaInvalida, _validar, validar_donacion,
+    validar_voluntario_actividad,
+)
+
+
+def _donacion(**cambios) -> dict:
+    fila = {"donante_id": "1", "campana_id": "2", "tipo": "monetaria", "monto": "150.50", "fecha": "2024-03-01T10:00:00"}
+    fila.update(cambios)
+    return fila
+
+
+def test_donacion_monetaria_desde_texto():
+    registro = validar_donacion(_donacion(anonima="sí", mensaje="gracias"))
+    assert len(registro) == len(COLUMNAS_DONACION)
+    assert registro == (1, 2, "monetaria", Decimal("150.50"), None, datetime(2024, 3, 1, 10), True, "gracias")
+
+
+def test_donacion_en_especie():
+    registro = validar_donacion(_donacion(tipo="especie", monto="", descripcion_especie="Ropa"))
+    assert registro[2:5] == ("especie", None, "Ropa")
+
+
+@pytest.mark.parametrize("monto, esperado", [("10.005", "10.01"), ("10.004", "10.00"), (7, "7.00"), (2.5, "2.50")])
+def test_monto_se_redondea_como_postgres(monto, esperado):
+    assert validar_donacion(_donacion(monto=monto))[3] == Decimal(esperado)
+
+
+@pytest.mark.parametrize("cambios, error", [
+    ({"tipo": "otro"}, "tipo debe ser"),
+    ({"tipo": None}, "tipo debe ser"),
+    ({"monto": ""}, "requiere monto"),
+    ({"descripcion_especie": "Ropa"}, "no lleva descripcion_especie"),
+    ({"tipo": "especie", "monto": None}, "requiere descripcion_especie"),
+    ({"monto": "0"}, "mayor que 0"),
+    ({"monto": "-5"}, "mayor que 0"),
+    ({"monto": "1e10"}, "fuera de rango"),
+    ({"monto": "NaN"}, "fuera de rango"),
+    ({"monto": "diez"}, "numérico"),
+    ({"donante_id": ""}, "donante_id es obligatorio"),
+    ({"donante_id": "1.5"}, "donante_id debe ser entero"),
+    ({"donante_id": 3.5}, "donante_id debe ser entero"),
+    ({"donante_id": True}, "donante_id debe ser entero"),
+    ({"campana_id": str(2 ** 31)}, "campana_id fuera de rango"),
+    ({"fecha": "ayer"}, "fecha no es una fecha válida"),
+    ({"anonima": "quizás"}, "anonima debe ser booleano"),
+    ({"mensaje": "a\x00b"}, "carácter nulo"),
+])
+def test_donacion_invalida(cambios, error):
+    with pytest.raises(FilaInvalida, match=error):
+        validar_donacion(_donacion(**cambios))
+
+
+def test_enteros_y_fechas_aceptan_formatos_equivalentes():
+    registro = validar_donacion(_donacion(donante_id=" 7 ", campana_id=3.0, fecha=date(2024, 2, 29), anonima="0"))
+    assert registro[:2] == (7, 3)
+    assert registro[5] == datetime(2024, 2, 29)
+    assert registro[6] is False
+
+
+def test_fecha_vacia_es_ahora():
+    antes = datetime.now()
+    assert antes <= validar_donacion(_donacion(fecha=""))[5] <= datetime.now()
+
+
+def test_voluntario_actividad_con_valores_por_defecto():
+    registro = validar_voluntario_actividad({"voluntario_id": 4, "actividad_id": "9", "fecha_registro": "2024-01-02"})
+    assert len(registro) == len(COLUMNAS_VOLUNTARIO_ACTIVIDAD)
+    assert registro == (4, 9, datetime(2024, 1, 2), Decimal("0.00"), None, "pendiente")
+
+
+@pytest.mark.parametrize("cambios, error", [
+    ({"horas_dedicadas": "1000"}, "horas_dedicadas fuera de rango"),
+    ({"estado": "x" * 21}, "estado supera 20 caracteres"),
+    ({"actividad_id": None}, "actividad_id es obligatorio"),
+])
+def test_voluntario_actividad_invalida(cambios, error):
+    fila = {"voluntario_id": 4, "actividad_id": 9, **cambios}
+    with pytest.raises(FilaInvalida, match=error):
+        validar_voluntario_actividad(fila)
+
+
+def test_las_filas_rechazadas_no_frenan_las_demas():
+    filas = [_donacion(), _donacion(monto="-1"), _donacion(tipo="especie", monto=None, descripcion_especie="Libros"), {}]
+    validas, rechazadas = _validar(filas, validar_donacion)
+    assert [i for i, _ in validas] == [0, 2]
+    assert [r["fila"] for r in rechazadas] == [1, 3]
+    assert "mayor que 0" in rechazadas[0]["error"]
@@ -0,0 +1,86 @@
+"""Partición de una ventana de fechas en meses, días y bordes crudos (services/reports.py)."""
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from services.reports import _next_month, _segmentos_fecha
+
+
+def _cubierto(segmentos: dict, t: datetime, hay_fin: bool) -> int:
+    """Cuántos segmentos cubren el instante t (los buckets por la fecha de t)."""
+    veces = 0
+    for clave in ("meses", "dias"):
+        for desde, hasta in segmentos[clave]:
+            veces += (desde is None or t.date() >= desde) and (hasta is None or t.date() < hasta)
+    crudos = segmentos["crudos"]
+    for i, (desde, hasta) in enumerate(crudos):
+        # El último tramo crudo termina en fecha_fin, que es inclusiva
+        inclusivo = i == len(crudos) - 1 and hay_fin
+        veces += (desde is None or t >= desde) and (hasta is None or (t <= hasta if inclusivo else t < hasta))
+    return veces
+
+
+def test_next_month_cruza_el_anio():
+    assert _next_month(date(2023, 12, 5)) == date(2024, 1, 1)
+    assert _next_month(date(2024, 1, 31)) == date(2024, 2, 1)
+
+
+def test_meses_completos_y_dias_en_los_bordes():
+    segmentos = _segmentos_fecha(date(2024, 1, 15), date(2024, 3, 10))
+    assert segmentos["meses"] == [(date(2024, 2, 1), date(2024, 3, 1))]
+    assert segmentos["dias"] == [(date(2024, 1, 15), date(2024, 2, 1)), (date(2024, 3, 1), date(2024, 3, 10))]
+    # fecha_fin es inclusiva: la medianoche del último día se lee de donacion
+    assert segmentos["crudos"] == [(datetime(2024, 3, 10), datetime(2024, 3, 10))]
+
+
+def test_meses_que_cruzan_el_anio():
+    segmentos = _segmentos_fecha(date(2023, 11, 1), date(2024, 2, 15))
+    assert segmentos["meses"] == [(date(2023, 11, 1), date(2024, 2, 1))]
+    assert segmentos["dias"] == [(date(2024, 2, 1), date(2024, 2, 15))]
+
+
+def test_ventana_sin_mes_completo_en_cambio_de_anio():
+    segmentos = _segmentos_fecha(date(2023, 12, 20), date(2024, 1, 5))
+    assert segmentos["meses"] == []
+    assert segmentos["dias"] == [(date(2023, 12, 20), date(2024, 1, 5))]
+
+
+def test_inicio_con_hora_lee_el_resto_del_dia_crudo():
+    segmentos = _segmentos_fecha(datetime(2024, 1, 31, 10, 30), date(2024, 4, 1))
+    assert segmentos["crudos"][0] == (datetime(2024, 1, 31, 10, 30), datetime(2024, 2, 1))
+    assert segmentos["meses"] == [(date(2024, 2, 1), date(2024, 4, 1))]
+    assert segmentos["dias"] == []
+
+
+def test_ventana_dentro_de_un_dia():
+    inicio, fin = datetime(2024, 5, 5, 8), datetime(2024, 5, 5, 18)
+    assert _segmentos_fecha(inicio, fin) == {"meses": [], "dias": [], "crudos": [(inicio, fin)]}
+
+
+def test_sin_limites():
+    assert _segmentos_fecha(None, None) == {"meses": [(None, None)], "dias": [], "crudos": []}
+
+
+@pytest.mark.parametrize("semilla", range(20))
+def test_cada_instante_cae_en_un_solo_segmento(semilla):
+    rng = random.Random(semilla)
+    base = datetime(2023, 10, 1)
+    inicio = base + timedelta(days=rng.randint(0, 120), hours=rng.choice([0, 0, 7, 23]), minutes=rng.choice([0, 45]))
+    fin = inicio + timedelta(days=rng.randint(0, 200), hours=rng.randint(0, 23))
+    if rng.random() < 0.3:
+        inicio = None
+    if rng.random() < 0.3:
+        fin = None
+    segmentos = _segmentos_fecha(inicio, fin)
+
+    desde = (inicio or base) - timedelta(days=3)
+    hasta = (fin or base + timedelta(days=330)) + timedelta(days=3)
+    instantes = [x for x in (inicio, fin) if x is not None]
+    t = desde
+    while t <= hasta:
+        instantes += [t, t + timedelta(hours=13, minutes=17)]
+        t += timedelta(days=1)
+    for t in instantes:
+        dentro = (inicio is None or t >= inicio) and (fin is None or t <= fin)
+        assert _cubierto(segmentos, t, fin is not None) == int(dentro), t
@@ -0,0 +1,271 @@
+"""Índice de asignación de voluntarios (services/asignacion.py): búsqueda, verificación y benchmark.
+
+Uso (desde app/):
+    python -m tools.asignacion buscar --actividad 12 --habilidad 3 --habilidad 5 --nivel intermedio
+    python -m tools.asignacion verificar --muestras 50      # índice contra SQL sobre la base
+    python -m tools.asignacion benchmark --voluntarios 100000 200000 --consultas 500
+
+`verificar` compara, para actividades y habilidades al azar, el resultado del
+índice con una consulta SQL que arma la cobertura de cada voluntario con
+range_agg. `benchmark` no usa la base: construye el índice con voluntarios
+sintéticos y mide construcción, consultas y actualizaciones; también compara
+una muestra de consultas con una búsqueda por fuerza bruta, antes y después
+de actualizar voluntarios.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, time as dtime, timedelta
+
+from db.connection import get_connection
+from services.asignacion import DIAS, FIN_DEL_DIA, NIVELES, IndiceVoluntarios, get_indice, tramos_ventana
+
+# Misma semántica que el índice: franjas del día unidas, "23:59:59" = fin del día
+_CUBRE = """
+    (SELECT range_agg(int4range(
+                EXTRACT(EPOCH FROM d.hora_inicio)::int,
+                CASE WHEN d.hora_fin >= TIME '23:59:59' THEN {fin} ELSE EXTRACT(EPOCH FROM d.hora_fin)::int END))
+     FROM disponibilidad_voluntario d
+     WHERE d.voluntario_id = v.voluntario_id AND d.dia = %s::dia_semana) @> int4range(%s, %s)
+""".format(fin=FIN_DEL_DIA)
+_HABILIDAD = """
+    EXISTS (SELECT 1 FROM voluntario_habilidad vh
+            WHERE vh.voluntario_id = v.voluntario_id AND vh.habilidad_id = %s AND vh.nivel >= %s::nivel_habilidad)
+"""
+
+
+def consulta_sql(tramos, requisitos: dict, excluir: list) -> tuple[str, list]:
+    condiciones, params = ["v.activo IS TRUE", "v.voluntario_id <> ALL(%s)"], [excluir]
+    for dia, desde, hasta in tramos:
+        condiciones.append(_CUBRE)
+        params += [DIAS[dia], desde, hasta]
+    for habilidad_id, nivel in requisitos.items():
+        condiciones.append(_HABILIDAD)
+        params += [habilidad_id, nivel]
+    return f"SELECT v.voluntario_id FROM voluntario v WHERE {' AND '.join(condiciones)} ORDER BY 1", params
+
+
+def buscar(actividad_id: int, habilidades: list[int], nivel: str, incluir_inscritos: bool, limite: int):
+    from services.asignacion import get_candidatos_actividad
+
+    resultado = get_candidatos_actividad(actividad_id, tuple(habilidades), nivel, not incluir_inscritos, limite)
+    actividad = resultado["actividad"]
+    if actividad is None:
+        sys.exit(f"No existe la actividad {actividad_id}")
+    print(f"{actividad['nombre']}: {actividad['fecha_inicio']} a {actividad['fecha_fin']}, "
+          f"{actividad['inscritos']}/{actividad['capacidad_max'] or '-'} inscritos")
+    print(f"{resultado['total']} candidatos ({resultado['ms']:.2f} ms en el índice)")
+    print(resultado["rows"].to_string(index=False))
+
+
+def verificar(muestras: int, semilla: int) -> int:
+    """Cantidad de búsquedas donde el índice y SQL no coinciden."""
+    rng = random.Random(semilla)
+    indice = get_indice()
+    t0 = time.perf_counter()
+    indice.recargar()
+    print(f"Índice: {indice.stats()['voluntarios']} voluntarios en {time.perf_counter() - t0:.2f} s")
+    diferencias, ms_indice, ms_sql = 0, [], []
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT a.actividad_id, a.fecha_inicio, a.fecha_fin,
+                   COALESCE(array_agg(va.voluntario_id) FILTER (WHERE va.voluntario_id IS NOT NULL), '{}') AS inscritos
+            FROM actividad a
+            LEFT JOIN voluntario_actividad va ON va.actividad_id = a.actividad_id AND va.estado IS DISTINCT FROM 'cancelado'
+            GROUP BY a.actividad_id
+        """)
+        actividades = cur.fetchall()
+        habilidades = sorted(indice.nombres)
+        for actividad in rng.sample(actividades, min(muestras, len(actividades))):
+            tramos = tramos_ventana(actividad["fecha_inicio"], actividad["fecha_fin"])
+            requisitos = {h: rng.choice(NIVELES) for h in rng.sample(habilidades, rng.randint(0, min(2, len(habilidades))))}
+
+            t0 = time.perf_counter()
+            ids = indice.ids(indice.buscar(tramos, requisitos, actividad["inscritos"])).tolist()
+            ms_indice.append((time.perf_counter() - t0) * 1000)
+
+            t0 = time.perf_counter()
+            cur.execute(*consulta_sql(tramos, requisitos, actividad["inscritos"]))
+            esperados = [f["voluntario_id"] for f in cur.fetchall()]
+            ms_sql.append((time.perf_counter() - t0) * 1000)
+
+            if sorted(ids) != esperados:
+                diferencias += 1
+                print(f"Actividad {actividad['actividad_id']} {requisitos}: índice {len(ids)}, SQL {len(esperados)}")
+    print(f"{len(ms_sql)} búsquedas, {diferencias} con diferencias | "
+          f"índice p50 {statistics.median(ms_indice):.2f} ms | SQL p50 {statistics.median(ms_sql):.1f} ms")
+    return diferencias
+
+
+# --- Datos sintéticos -----------------------------------------------------------
+
+def _hora(segundos: int) -> dtime:
+    return dtime(23, 59, 59) if segundos >= FIN_DEL_DIA else dtime(segundos // 3600, segundos // 60 % 60)
+
+
+def sinteticos(voluntarios: int, habilidades: int, rng: random.Random) -> tuple:
+    """Filas como las de la base: 1-3 franjas por voluntario en medias horas y 0-4 habilidades."""
+    activos = [(v, rng.random() < 0.85) for v in range(1, voluntarios + 1)]
+    franjas, niveles = [], []
+    for v in range(1, voluntarios + 1):
+        for dia in rng.sample(DIAS, rng.randint(1, 3)):
+            inicio = rng.randint(12, 40) * 1800
+            franjas.append((v, dia, _hora(inicio), _hora(min(inicio + rng.randint(2, 20) * 1800, FIN_DEL_DIA))))
+        for h in rng.sample(range(1, habilidades + 1), rng.randint(0, min(4, habilidades))):
+            niveles.append((v, h, rng.choice(NIVELES)))
+    return activos, franjas, niveles, {h: f"Habilidad {h}" for h in range(1, habilidades + 1)}
+
+
+def _fuerza_bruta(filas: tuple, tramos, requisitos: dict) -> list[int]:
+    activos, franjas, niveles, _ = filas
+    por_voluntario, habilidades = {}, {}
+    for v, dia, inicio, fin in franjas:
+        fin = FIN_DEL_DIA if fin >= dtime(23, 59, 59) else fin.hour * 3600 + fin.minute * 60
+        por_voluntario.setdefault((v, DIAS.index(dia)), []).append((inicio.hour * 3600 + inicio.minute * 60, fin))
+    for v, h, nivel in niveles:
+        habilidades[(v, h)] = NIVELES.index(nivel)
+
+    def cubre(v, dia, desde, hasta):
+        hasta_cubierto = None
+        for inicio, fin in sorted(por_voluntario.get((v, dia), [])):
+            if hasta_cubierto is None:
+                if inicio <= desde < fin:
+                    hasta_cubierto = fin
+            elif inicio <= hasta_cubierto:
+                hasta_cubierto = max(hasta_cubierto, fin)
+            if hasta_cubierto is not None and hasta_cubierto >= hasta:
+                return True
+        return False
+
+    return [
+        v for v, activo in activos
+        if activo
+        and all(habilidades.get((v, h), -1) >= NIVELES.index(n) for h, n in requisitos.items())
+        and all(cubre(v, *tramo) for tramo in tramos)
+    ]
+
+
+def _consulta_al_azar(rng: random.Random, habilidades: int):
+    inicio = datetime(2024, 1, 1) + timedelta(days=rng.randint(0, 6), minutes=rng.randint(16, 44) * 30)
+    tramos = tramos_ventana(inicio, inicio + timedelta(hours=rng.randint(1, 8)))
+    requisitos = {h: rng.choice(NIVELES) for h in rng.sample(range(1, habilidades + 1), rng.randint(0, 2))}
+    return tramos, requisitos
+
+
+def benchmark(voluntarios: int, habilidades: int, consultas: int, actualizaciones: int,
+              comprobar: int, limite: int, rng: random.Random) -> dict:
+    filas = sinteticos(voluntarios, habilidades, rng)
+    indice = IndiceVoluntarios()
+    t0 = time.perf_counter()
+    indice.construir(*filas)
+    construccion = time.perf_counter() - t0
+
+    tiempos, totales, errores = [], [], 0
+    for i in range(consultas):
+        tramos, requisitos = _consulta_al_azar(rng, habilidades)
+        t0 = time.perf_counter()
+        bits = indice.buscar(tramos, requisitos)
+        ids = indice.ids(bits, limite)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+        totales.append(indice.contar(bits))
+        if i < comprobar and sorted(indice.ids(bits).tolist()) != _fuerza_bruta(filas, tramos, requisitos):
+            errores += 1
+        del ids
+
+    # Actualizaciones: voluntarios al azar reciben los datos de otros voluntarios sintéticos
+    nuevos = sinteticos(actualizaciones, habilidades, rng)
+    destino = dict(zip(range(1, actualizaciones + 1), rng.sample(range(1, voluntarios + 1), actualizaciones)))
+    datos = {destino[v]: (activo, [], []) for v, activo in nuevos[0]}
+    for v, dia, inicio, fin in nuevos[1]:
+        datos[destino[v]][1].append((dia, inicio, fin))
+    for v, h, nivel in nuevos[2]:
+        datos[destino[v]][2].append((h, nivel))
+    t0 = time.perf_counter()
+    for v, (activo, propias, niveles) in datos.items():
+        indice.actualizar(v, activo, propias, niveles)
+    ms_actualizacion = (time.perf_counter() - t0) * 1000 / max(actualizaciones, 1)
+
+    # Después de actualizar, las búsquedas tienen que coincidir con las filas nuevas
+    filas = (
+        [(v, datos[v][0]) if v in datos else (v, a) for v, a in filas[0]],
+        [f for f in filas[1] if f[0] not in datos] + [(v, *f) for v, d in datos.items() for f in d[1]],
+        [n for n in filas[2] if n[0] not in datos] + [(v, *n) for v, d in datos.items() for n in d[2]],
+        filas[3],
+    )
+    for _ in range(comprobar):
+        tramos, requisitos = _consulta_al_azar(rng, habilidades)
+        if sorted(indice.ids(indice.buscar(tramos, requisitos)).tolist()) != _fuerza_bruta(filas, tramos, requisitos):
+            errores += 1
+
+    tiempos.sort()
+    stats = indice.stats()
+    resultado = {
+        "voluntarios": voluntarios,
+        "construccion_s": round(construccion, 3),
+        "bytes": stats["bytes"],
+        "tramos": stats["tramos"],
+        "p50_ms": round(statistics.median(tiempos), 3),
+        "p95_ms": round(tiempos[int(len(tiempos) * 0.95) - 1], 3),
+        "max_ms": round(tiempos[-1], 3),
+        "candidatos_p50": int(statistics.median(totales)),
+        "actualizacion_ms": round(ms_actualizacion, 3),
+        "diferencias": errores,
+    }
+    print(f"{voluntarios:>8} voluntarios | construcción {construccion:6.2f} s | {stats['bytes'] / 2**20:6.1f} MiB "
+          f"| consulta p50 {resultado['p50_ms']:6.2f} ms p95 {resultado['p95_ms']:6.2f} ms "
+          f"| actualización {ms_actualizacion:6.2f} ms | {errores}/{min(comprobar, consultas) + comprobar} diferencias")
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Índice de asignación de voluntarios")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("buscar", help="Candidatos para una actividad")
+    p.add_argument("--actividad", type=int, required=True)
+    p.add_argument("--habilidad", type=int, action="append", default=[])
+    p.add_argument("--nivel", choices=NIVELES, default=NIVELES[0])
+    p.add_argument("--incluir-inscritos", action="store_true")
+    p.add_argument("--limite", type=int, default=50)
+
+    p = sub.add_parser("verificar", help="Compara el índice con SQL sobre la base")
+    p.add_argument("--muestras", type=int, default=50)
+    p.add_argument("--semilla", type=int, default=0)
+
+    p = sub.add_parser("benchmark", help="Índice con voluntarios sintéticos (sin base)")
+    p.add_argument("--voluntarios", type=int, nargs="+", default=[10000, 100000])
+    p.add_argument("--habilidades", type=int, default=30)
+    p.add_argument("--consultas", type=int, default=500)
+    p.add_argument("--actualizaciones", type=int, default=1000)
+    p.add_argument("--comprobar", type=int, default=20, help="Consultas que se comparan con fuerza bruta")
+    p.add_argument("--limite", type=int, default=500, help="Ids que se traducen por consulta")
+    p.add_argument("--semilla", type=int, default=0)
+    p.add_argument("--guardar", help="Archivo JSON donde guardar los resultados")
+    p.add_argument("--maximo-ms", type=float, default=None, help="Falla si el p95 de las consultas lo supera")
+
+    args = parser.parse_args()
+    if args.comando == "buscar":
+        buscar(args.actividad, args.habilidad, args.nivel, args.incluir_inscritos, args.limite)
+    elif args.comando == "verificar":
+        if verificar(args.muestras, args.semilla):
+            sys.exit(1)
+    else:
+        rng = random.Random(args.semilla)
+        resultados = [
+            benchmark(n, args.habilidades, args.consultas, args.actualizaciones, args.comprobar, args.limite, rng)
+            for n in args.voluntarios
+        ]
+        if args.guardar:
+            with open(args.guardar, "w", encoding="utf-8") as f:
+                json.dump({"creada_en": datetime.now().isoformat(), "resultados": resultados}, f, indent=2)
+        if any(r["diferencias"] for r in resultados):
+            sys.exit(1)
+        if args.maximo_ms is not None and any(r["p95_ms"] > args.maximo_ms for r in resultados):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
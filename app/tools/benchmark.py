@@ -0,0 +1,153 @@
+"""Benchmark de los reportes y de sus exports con las combinaciones de filtros de explain_reports.
+
+Mide cada función get_* de services/reports.py (sin pasar por la cache) y
+cada formato de descarga de components/ui_elements.render_table (el mismo
+camino que lazy_export, con la cache de artefactos vacía). Reporta
+latencia p50/p95/p99, pico de memoria de Python (tracemalloc) y filas/bytes,
+y guarda los resultados para compararlos entre corridas.
+
+Uso (desde app/):
+    python -m tools.generar_datos --donaciones 1000000 --truncar --hasta 2025-12-31
+    python -m tools.benchmark --guardar base.json
+    python -m tools.benchmark --guardar nuevo.json --comparar base.json --tolerancia 0.2
+"""
+import argparse
+import json
+import math
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import psycopg2
+
+from components.exports import FORMATOS, get_artifact_cache, lazy_export
+from db.connection import get_connection
+from services import cache, reports
+from tools.explain_reports import filter_mixes
+
+
+def funciones_reporte() -> dict:
+    """Nombre del reporte -> función get_* de services/reports.py."""
+    return {report: getattr(reports, f"get_{report}") for report in reports.CONSULTAS}
+
+
+def percentil(valores: list[float], p: float) -> float:
+    """Percentil por rango más cercano."""
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def medir(func, repeticiones: int, calentamiento: int = 1) -> dict:
+    for _ in range(calentamiento):
+        func()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        func()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    # tracemalloc hace todo más lento: la memoria se mide en una corrida aparte
+    tracemalloc.start()
+    try:
+        resultado = func()
+        pico = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "p50_ms": percentil(tiempos, 50),
+        "p95_ms": percentil(tiempos, 95),
+        "p99_ms": percentil(tiempos, 99),
+        "media_ms": sum(tiempos) / len(tiempos),
+        "memoria_pico_bytes": pico,
+        "tamano": len(resultado),
+    }
+
+
+def escala() -> dict:
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT (SELECT COUNT(*) FROM donacion) AS donaciones,
+                       (SELECT COUNT(*) FROM voluntario_actividad) AS voluntario_actividad,
+                       (SELECT COUNT(*) FROM campana) AS campanas
+            """)
+            return dict(cur.fetchone())
+
+
+def run(repeticiones: int, formatos: list[str], reportes: list[str] | None = None) -> dict:
+    # Se mide la consulta, no la cache de reportes
+    cache.CACHE_ENABLED = False
+    funciones = funciones_reporte()
+    artefactos = get_artifact_cache()
+    snapshot = {"creada_en": datetime.now().isoformat(), "escala": escala(), "resultados": {}}
+    for report, mixes in filter_mixes().items():
+        if report not in funciones or (reportes and report not in reportes):
+            continue
+        for label, filters in mixes:
+            key = f"reporte/{report}/{label}"
+            try:
+                r = medir(lambda: funciones[report](**filters), repeticiones)
+            except psycopg2.Error as e:
+                snapshot["resultados"][key] = {"error": str(e).strip()}
+                print(f"{key}: ERROR {str(e).strip()}")
+                continue
+            snapshot["resultados"][key] = r
+            print(f"{key}: p50={r['p50_ms']:.1f} ms p95={r['p95_ms']:.1f} ms p99={r['p99_ms']:.1f} ms, "
+                  f"{r['tamano']} filas, pico {r['memoria_pico_bytes'] / 1024:.0f} KiB")
+
+            for fmt in formatos:
+                def exportar():
+                    artefactos.clear()
+                    return lazy_export(report, None, fmt, filters)()
+
+                key = f"export/{report}/{label}/{fmt}"
+                r = medir(exportar, repeticiones)
+                snapshot["resultados"][key] = r
+                print(f"{key}: p50={r['p50_ms']:.1f} ms p95={r['p95_ms']:.1f} ms, "
+                      f"{r['tamano']} bytes, pico {r['memoria_pico_bytes'] / 1024:.0f} KiB")
+    return snapshot
+
+
+def compare(antes: dict, despues: dict, tolerancia: float) -> list[str]:
+    """Imprime la comparación y devuelve las llaves cuyo p95 empeoró más que `tolerancia`."""
+    print(f"\nComparación (escala antes {antes.get('escala')}, después {despues.get('escala')})")
+    regresiones = []
+    for key, nuevo in despues["resultados"].items():
+        viejo = antes["resultados"].get(key)
+        if viejo is None or "error" in viejo or "error" in nuevo:
+            continue
+        cambio = nuevo["p95_ms"] / viejo["p95_ms"] - 1 if viejo["p95_ms"] else 0.0
+        memoria = (nuevo["memoria_pico_bytes"] - viejo["memoria_pico_bytes"]) / 1024
+        marca = ""
+        if cambio > tolerancia:
+            regresiones.append(key)
+            marca = "  <- REGRESIÓN"
+        print(f"{key}: p95 {viejo['p95_ms']:.1f} -> {nuevo['p95_ms']:.1f} ms ({cambio:+.0%}), "
+              f"memoria {memoria:+.0f} KiB{marca}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de reportes y exports")
+    parser.add_argument("--repeticiones", type=int, default=10)
+    parser.add_argument("--formatos", nargs="*", default=["csv", "excel", "json", "pdf"], choices=sorted(FORMATOS))
+    parser.add_argument("--reportes", nargs="*", help="Limitar a estos reportes")
+    parser.add_argument("--guardar", help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--comparar", help="Resultados anteriores con los cuales comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Aumento de p95 tolerado (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    snapshot = run(args.repeticiones, args.formatos, args.reportes)
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, indent=2, ensure_ascii=False, default=str)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            regresiones = compare(json.load(f), snapshot, args.tolerancia)
+        if regresiones:
+            print(f"{len(regresiones)} regresiones")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
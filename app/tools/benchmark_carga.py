@@ -0,0 +1,149 @@
+"""Throughput de carga masiva con los triggers de estadísticas y buckets activos.
+
+Inserta donaciones (INSERT multi-fila o COPY) e inscripciones de voluntarios
+por lotes dentro de una transacción y al final hace ROLLBACK, así que la
+base queda igual. Sirve para comparar los triggers por fila de DDL.sql/V002
+con los triggers por sentencia de V004.
+
+Uso (desde app/):
+    python -m tools.benchmark_carga --guardar antes.json
+    psql ... -f database/migrations/V004__triggers_por_sentencia.sql
+    python -m tools.benchmark_carga --guardar despues.json --comparar antes.json
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from psycopg2.extras import execute_values
+
+from db.connection import copy_rows, get_connection
+
+COLUMNAS_DONACION = ["donante_id", "campana_id", "tipo", "monto", "descripcion_especie", "fecha", "anonima"]
+
+
+def _ids(cur, sql: str) -> list[int]:
+    cur.execute(sql)
+    return [list(row.values())[0] for row in cur.fetchall()]
+
+
+def donaciones(rng: random.Random, donantes: list[int], campanas: list[int], n: int):
+    # Pocas campañas calientes (las de meta más alta, para no desbordar
+    # porcentaje_meta en el trigger por fila original)
+    calientes = campanas[:max(1, len(campanas) // 20)]
+    ahora = datetime.now()
+    for _ in range(n):
+        campana_id = rng.choice(calientes) if rng.random() < 0.8 else rng.choice(campanas)
+        fecha = ahora - timedelta(seconds=rng.randrange(90 * 86400))
+        if rng.random() < 0.1:
+            yield rng.choice(donantes), campana_id, "especie", None, "Ropa", fecha, False
+        else:
+            yield rng.choice(donantes), campana_id, "monetaria", round(rng.uniform(1, 100), 2), None, fecha, False
+
+
+def medir_donaciones(cur, filas, lote: int, modo: str) -> float:
+    inicio = time.perf_counter()
+    if modo == "copy":
+        copy_rows(cur, "donacion", COLUMNAS_DONACION, filas, lote)
+    else:
+        filas = list(filas)
+        for i in range(0, len(filas), lote):
+            execute_values(
+                cur,
+                f"INSERT INTO donacion ({', '.join(COLUMNAS_DONACION)}) VALUES %s",
+                filas[i:i + lote],
+                page_size=lote,
+            )
+    return time.perf_counter() - inicio
+
+
+def medir_inscripciones(cur, pares: list[tuple], lote: int) -> float:
+    inicio = time.perf_counter()
+    for i in range(0, len(pares), lote):
+        execute_values(
+            cur,
+            "INSERT INTO voluntario_actividad (voluntario_id, actividad_id, horas_dedicadas) VALUES %s "
+            "ON CONFLICT DO NOTHING",
+            pares[i:i + lote],
+            page_size=lote,
+        )
+    return time.perf_counter() - inicio
+
+
+def triggers(cur) -> list[str]:
+    cur.execute("""
+        SELECT tgname || CASE WHEN tgtype & 1 = 1 THEN ' (fila)' ELSE ' (sentencia)' END AS trigger
+        FROM pg_trigger
+        WHERE tgrelid IN ('donacion'::regclass, 'voluntario_actividad'::regclass) AND NOT tgisinternal
+        ORDER BY 1
+    """)
+    return [row["trigger"] for row in cur.fetchall()]
+
+
+def run(filas: int, lote: int, modo: str, semilla: int) -> dict:
+    rng = random.Random(semilla)
+    resultados = {}
+    with get_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                donantes = _ids(cur, "SELECT donante_id FROM donante")
+                campanas = _ids(cur, "SELECT campana_id FROM campana ORDER BY meta_monetaria DESC NULLS LAST")
+                voluntarios = _ids(cur, "SELECT voluntario_id FROM voluntario")
+                actividades = _ids(cur, "SELECT actividad_id FROM actividad")
+                activos = triggers(cur)
+
+                segundos = medir_donaciones(cur, donaciones(rng, donantes, campanas, filas), lote, modo)
+                resultados["donaciones"] = {"filas": filas, "segundos": segundos, "filas_por_segundo": filas / segundos}
+
+                pares = [(rng.choice(voluntarios), rng.choice(actividades), 2) for _ in range(filas // 10)]
+                segundos = medir_inscripciones(cur, pares, lote)
+                resultados["inscripciones"] = {
+                    "filas": len(pares), "segundos": segundos, "filas_por_segundo": len(pares) / segundos
+                }
+        finally:
+            conn.rollback()
+
+    for nombre, r in resultados.items():
+        print(f"{nombre}: {r['filas']} filas en {r['segundos']:.2f}s ({r['filas_por_segundo']:.0f} filas/s)")
+    return {
+        "creada_en": datetime.now().isoformat(),
+        "parametros": {"filas": filas, "lote": lote, "modo": modo, "semilla": semilla},
+        "triggers": activos,
+        "resultados": resultados,
+    }
+
+
+def compare(antes: dict, despues: dict):
+    print("\nComparación")
+    print(f"antes:   {', '.join(antes['triggers'])}")
+    print(f"después: {', '.join(despues['triggers'])}")
+    for nombre, nuevo in despues["resultados"].items():
+        viejo = antes["resultados"].get(nombre)
+        if viejo is None:
+            continue
+        ratio = nuevo["filas_por_segundo"] / viejo["filas_por_segundo"]
+        print(f"{nombre}: {viejo['filas_por_segundo']:.0f} -> {nuevo['filas_por_segundo']:.0f} filas/s (x{ratio:.1f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput de carga masiva con triggers")
+    parser.add_argument("--filas", type=int, default=50_000, help="Donaciones a insertar (inscripciones = filas / 10)")
+    parser.add_argument("--lote", type=int, default=1000, help="Filas por sentencia")
+    parser.add_argument("--modo", choices=["insert", "copy"], default="insert")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--guardar", help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--comparar", help="Resultados anteriores con los cuales comparar")
+    args = parser.parse_args()
+
+    snapshot = run(args.filas, args.lote, args.modo, args.semilla)
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, indent=2, ensure_ascii=False)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            compare(json.load(f), snapshot)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Ráfagas de filtros: sesiones que cambian un filtro varias veces seguidas.
+
+Cada sesión simulada pide donaciones por campaña con `--pasos` montos mínimos
+distintos separados por `--intervalo` segundos (como al arrastrar un slider) y
+solo espera el resultado del último, igual que el panel. Se corre dos veces:
+
+- cancelar: las tareas llevan la sesión (services/orquestador.py) y cada
+  pedido nuevo cancela la consulta anterior de la misma sesión;
+- sin_cancelar: las consultas anteriores siguen hasta terminar.
+
+Informa la espera del último resultado, las consultas que terminaron, las
+canceladas, el pico de backends activos (pg_stat_activity) y lo que tarda la
+base en quedar libre. Las dos corridas pasan por la admisión de db/ejecucion.py.
+
+Uso (desde app/):
+    python -m tools.benchmark_rafagas --sesiones 8 --pasos 6 --intervalo 0.05
+    python -m tools.benchmark_rafagas --guardar rafagas.json
+"""
+import argparse
+import json
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import wait
+from datetime import date, datetime
+
+from db.connection import _connect
+from db.ejecucion import ConsultaCancelada, ejecucion_stats
+from services.cache import get_cache
+from services.orquestador import dispatch_reportes, iter_resultados
+from services.reports import frame_donaciones_por_campana
+
+REPORTE = "donaciones_por_campana"
+
+
+class MonitorBackends(threading.Thread):
+    """Muestrea cada `intervalo` segundos los backends activos de la base."""
+
+    def __init__(self, intervalo: float = 0.02):
+        super().__init__(daemon=True)
+        self.intervalo = intervalo
+        self.maximo = 0
+        self._fin = threading.Event()
+
+    def run(self):
+        conn = _connect()
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                while not self._fin.is_set():
+                    cur.execute("""
+                        SELECT COUNT(*) AS n FROM pg_stat_activity
+                        WHERE state = 'active' AND backend_type = 'client backend' AND pid <> pg_backend_pid()
+                    """)
+                    self.maximo = max(self.maximo, cur.fetchone()["n"])
+                    self._fin.wait(self.intervalo)
+        finally:
+            conn.close()
+
+    def detener(self) -> int:
+        self._fin.set()
+        self.join()
+        return self.maximo
+
+
+def _sesion(nombre: str, cancelar: bool, pasos: int, intervalo: float, desde: date, hasta: date,
+            rng: random.Random, esperas: list, todas: list):
+    for _ in range(pasos):
+        filtros = dict(fecha_inicio=desde, fecha_fin=hasta, monto_minimo=round(rng.uniform(0, 1000), 2), monto_maximo=None)
+        futures = dispatch_reportes({REPORTE: (frame_donaciones_por_campana, filtros)}, sesion=nombre if cancelar else None)
+        ultimo = time.perf_counter()
+        todas.extend(futures.values())
+        time.sleep(intervalo)
+    _, _, error = next(iter_resultados(futures))
+    esperas.append((time.perf_counter() - ultimo, error))
+
+
+def corrida(cancelar: bool, sesiones: int, pasos: int, intervalo: float, desde: date, hasta: date, semilla: int) -> dict:
+    # Las dos corridas piden los mismos filtros: ninguna lee lo que dejó la otra en cache
+    get_cache().clear()
+    antes = ejecucion_stats()
+    monitor = MonitorBackends()
+    monitor.start()
+    esperas, todas = [], []
+    inicio = time.perf_counter()
+    hilos = [
+        threading.Thread(target=_sesion, args=(f"rafaga-{i}", cancelar, pasos, intervalo, desde, hasta,
+                                               random.Random(semilla + i), esperas, todas))
+        for i in range(sesiones)
+    ]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    # La base queda libre cuando terminan también las consultas abandonadas
+    wait(todas)
+    duracion = time.perf_counter() - inicio
+    pico = monitor.detener()
+    despues = ejecucion_stats()
+
+    errores = [f.exception() for f in todas]
+    tiempos = sorted(espera for espera, _ in esperas)
+    resultado = {
+        "modo": "cancelar" if cancelar else "sin_cancelar",
+        "espera_ultimo_p50_ms": round(statistics.median(tiempos) * 1000, 1),
+        "espera_ultimo_max_ms": round(tiempos[-1] * 1000, 1),
+        "errores_ultimo": sum(error is not None for _, error in esperas),
+        "terminadas": sum(e is None for e in errores),
+        "canceladas": sum(isinstance(e, ConsultaCancelada) for e in errores),
+        "encoladas": despues["encoladas"] - antes["encoladas"],
+        "pico_backends": pico,
+        "base_libre_s": round(duracion, 2),
+    }
+    print(f"{resultado['modo']:<13} último p50 {resultado['espera_ultimo_p50_ms']:8.1f} ms, máx {resultado['espera_ultimo_max_ms']:8.1f} ms "
+          f"| {resultado['terminadas']:3} terminadas, {resultado['canceladas']:3} canceladas, {resultado['encoladas']:3} encoladas "
+          f"| pico {pico} backends | base libre en {duracion:.2f} s")
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sesiones que cambian filtros en ráfaga")
+    parser.add_argument("--sesiones", type=int, default=8)
+    parser.add_argument("--pasos", type=int, default=6, help="Filtros que pide cada sesión antes de esperar")
+    parser.add_argument("--intervalo", type=float, default=0.05, help="Segundos entre un filtro y el siguiente")
+    parser.add_argument("--desde", type=date.fromisoformat, default=date(date.today().year - 2, 1, 1))
+    parser.add_argument("--hasta", type=date.fromisoformat, default=date(date.today().year, 12, 31))
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--guardar", help="Archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    resultados = [
+        corrida(cancelar, args.sesiones, args.pasos, args.intervalo, args.desde, args.hasta, args.semilla)
+        for cancelar in (False, True)
+    ]
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as f:
+            json.dump({"creada_en": datetime.now().isoformat(), "parametros": vars(args) | {
+                "desde": args.desde.isoformat(), "hasta": args.hasta.isoformat()}, "resultados": resultados}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Costo del reporte de recursos a medida que crecen las actividades por campaña.
+
+Dentro de una transacción (ROLLBACK al final, la base queda igual) copia las
+actividades existentes hasta tener `factor` veces más y, en cada paso, mide
+con EXPLAIN ANALYZE el reporte (semi-join con EXISTS) y la versión anterior
+con JOIN a actividad y GROUP BY, que genera una fila por recurso y actividad
+antes de agrupar.
+
+Uso (desde app/):
+    python -m tools.benchmark_recursos --factores 1 2 4 8 16
+    python -m tools.benchmark_recursos --guardar recursos.json --tolerancia 1.0
+"""
+import argparse
+import json
+import statistics
+import sys
+from datetime import date, datetime
+
+from db.connection import get_connection
+from services.reports import build_query
+
+# Versión anterior del reporte (con la división en línea en lugar de safe_divide)
+CONSULTA_CON_JOIN = """
+    SELECT c.campana_id, c.nombre AS campana, r.nombre AS recurso, r.cantidad_requerida, r.cantidad_actual,
+           ROUND(r.cantidad_actual * 100.0 / r.cantidad_requerida, 2) AS porcentaje_completado, r.unidad_medida
+    FROM campana c
+    JOIN recurso r ON c.campana_id = r.campana_id
+    JOIN actividad a ON c.campana_id = a.campana_id
+    WHERE a.fecha_inicio >= %s AND a.fecha_fin <= %s
+    GROUP BY c.campana_id, c.nombre, r.recurso_id, r.nombre, r.cantidad_requerida, r.cantidad_actual, r.unidad_medida
+    ORDER BY porcentaje_completado DESC
+"""
+
+
+def _filas_maximas(plan: dict) -> int:
+    """Mayor cantidad de filas que produce un nodo del plan (el fan-out del JOIN)."""
+    filas = plan["Actual Rows"] * plan.get("Actual Loops", 1)
+    return max([filas] + [_filas_maximas(hijo) for hijo in plan.get("Plans", [])])
+
+
+def explain(cur, query: str, params, repeticiones: int) -> dict:
+    tiempos, plan = [], None
+    for _ in range(repeticiones):
+        cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + query.strip().rstrip(";"), params)
+        resultado = list(cur.fetchone().values())[0][0]
+        tiempos.append(resultado["Execution Time"])
+        plan = resultado["Plan"]
+    return {"ms": statistics.median(tiempos), "filas": plan["Actual Rows"], "filas_maximas": _filas_maximas(plan)}
+
+
+def copiar_actividades(cur, veces: int, max_id: int):
+    """Agrega `veces` copias de las actividades originales, corridas al azar hasta un año."""
+    cur.execute("""
+        INSERT INTO actividad (campana_id, sede_id, nombre, fecha_inicio, fecha_fin, capacidad_max)
+        SELECT campana_id, sede_id, nombre, fecha_inicio + desfase, fecha_fin + desfase, capacidad_max
+        FROM (
+            SELECT a.*, make_interval(days => (random() * 730)::int - 365) AS desfase
+            FROM actividad a
+            CROSS JOIN generate_series(1, %s)
+            WHERE a.actividad_id <= %s
+        ) copias
+    """, (veces, max_id))
+
+
+def run(factores: list[int], desde: date, hasta: date, repeticiones: int) -> dict:
+    consulta, params = build_query("recurso_utilizado_por_campana", fecha_inicio=desde, fecha_fin=hasta)
+    resultados = []
+    with get_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT COALESCE(MAX(actividad_id), 0) AS max_id, COUNT(*) AS n FROM actividad")
+                base = cur.fetchone()
+                actual = 1
+                for factor in sorted(factores):
+                    if factor > actual:
+                        copiar_actividades(cur, factor - actual, base["max_id"])
+                        cur.execute("ANALYZE actividad")
+                        actual = factor
+                    paso = {
+                        "factor": factor,
+                        "actividades": base["n"] * factor,
+                        "exists": explain(cur, consulta, params, repeticiones),
+                        "join": explain(cur, CONSULTA_CON_JOIN, [desde, hasta], repeticiones),
+                    }
+                    resultados.append(paso)
+                    print(f"x{factor:<3} {paso['actividades']:>8} actividades | "
+                          f"EXISTS {paso['exists']['ms']:8.1f} ms ({paso['exists']['filas_maximas']} filas máx.) | "
+                          f"JOIN {paso['join']['ms']:8.1f} ms ({paso['join']['filas_maximas']} filas máx.)")
+        finally:
+            conn.rollback()
+    return {
+        "creada_en": datetime.now().isoformat(),
+        "parametros": {"factores": factores, "desde": desde.isoformat(), "hasta": hasta.isoformat()},
+        "resultados": resultados,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reporte de recursos con más actividades por campaña")
+    parser.add_argument("--factores", type=int, nargs="+", default=[1, 2, 4, 8, 16],
+                        help="Actividades por campaña, como múltiplo de las actuales")
+    parser.add_argument("--desde", type=date.fromisoformat, default=date(date.today().year - 1, 1, 1))
+    parser.add_argument("--hasta", type=date.fromisoformat, default=date(date.today().year, 12, 31))
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--tolerancia", type=float, default=None,
+                        help="Falla si el reporte tarda más de (1 + tolerancia) veces lo del primer factor")
+    parser.add_argument("--guardar", help="Archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    snapshot = run(args.factores, args.desde, args.hasta, args.repeticiones)
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, indent=2, ensure_ascii=False)
+
+    primero, ultimo = snapshot["resultados"][0], snapshot["resultados"][-1]
+    ratio = ultimo["exists"]["ms"] / primero["exists"]["ms"]
+    print(f"EXISTS: x{ratio:.2f} de x{primero['factor']} a x{ultimo['factor']}; "
+          f"JOIN: x{ultimo['join']['ms'] / primero['join']['ms']:.2f}")
+    if args.tolerancia is not None and ratio > 1 + args.tolerancia:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
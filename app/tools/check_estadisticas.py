@@ -0,0 +1,35 @@
+"""Detecta (y opcionalmente repara) drift entre estadisticas_campana y las tablas base.
+
+Uso (desde app/):
+    python -m tools.check_estadisticas            # solo reporta
+    python -m tools.check_estadisticas --reparar  # recalcula las filas con drift
+"""
+import argparse
+import sys
+
+from services.estadisticas import check_rollup_drift, repair_rollup
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consistencia de estadisticas_campana")
+    parser.add_argument("--reparar", action="store_true")
+    args = parser.parse_args()
+
+    drift = check_rollup_drift()
+    for row in drift:
+        print(
+            f"campaña {row['campana_id']}: "
+            f"monto {row['rollup_monto_recaudado']} != {row['real_monto_recaudado']}, "
+            f"donaciones {row['rollup_num_donaciones']} != {row['real_num_donaciones']}, "
+            f"voluntarios {row['rollup_num_voluntarios']} != {row['real_num_voluntarios']}"
+        )
+    print(f"{len(drift)} campañas con drift")
+
+    if args.reparar and drift:
+        print(f"{repair_rollup([row['campana_id'] for row in drift])} filas reparadas")
+    elif drift:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""EXPLAIN (ANALYZE, BUFFERS) de cada reporte con combinaciones de filtros representativas.
+
+Guarda una instantánea de planes y tiempos, y compara dos instantáneas
+(por ejemplo antes y después de aplicar database/migrations/V001__indices_reportes.sql).
+
+Uso (desde app/):
+    python -m tools.explain_reports --guardar antes.json
+    psql ... -f database/migrations/V001__indices_reportes.sql
+    python -m tools.explain_reports --guardar despues.json --comparar antes.json
+"""
+import argparse
+import json
+import statistics
+from datetime import datetime, timedelta
+
+from db.connection import get_connection
+from services.reports import CONSULTAS, build_query
+
+
+def filter_mixes() -> dict[str, list[tuple[str, dict]]]:
+    """Combinaciones de filtros por reporte: sin filtros, ventana del dashboard y ventana angosta."""
+    hoy = datetime.now()
+    anio = dict(fecha_inicio=hoy - timedelta(days=365), fecha_fin=hoy + timedelta(days=365))
+    mes = dict(fecha_inicio=hoy - timedelta(days=30), fecha_fin=hoy)
+    return {
+        "donaciones_por_campana": [
+            ("sin_filtros", {}),
+            ("ventana_anual", dict(anio, monto_maximo=10000.0)),
+            ("ventana_mes_montos", dict(mes, monto_minimo=100.0, monto_maximo=1000.0)),
+        ],
+        "voluntarios_por_actividad": [
+            ("sin_filtros", {}),
+            ("ventana_anual_edades", dict(anio, edad_minima=18, edad_maxima=65)),
+            ("ventana_mes", dict(mes)),
+        ],
+        "donaciones_por_donante": [
+            ("sin_filtros", {}),
+            ("ventana_anual_monto", dict(anio, monto_minimo=100.0)),
+            ("empresa_mes", dict(mes, tipo_donante="empresa")),
+            ("monto_alto", dict(monto_minimo=5000.0)),
+        ],
+        "distribucion_voluntarios_por_edad": [
+            ("sin_filtros", {}),
+            ("ventana_anual", dict(anio)),
+            ("actividad", dict(actividad_id=1)),
+        ],
+        "efectividad_campanas": [
+            ("sin_filtros", {}),
+            ("ventana_anual", dict(anio, monto_objetivo_max=100000.0)),
+            ("activas", dict(estado="activa")),
+        ],
+        "recurso_utilizado_por_campana": [
+            ("sin_filtros", {}),
+            ("ventana_anual", dict(anio)),
+            ("tipo_avance", dict(tipo_recurso="agua", porcentaje_minimo=50.0)),
+        ],
+    }
+
+
+def _walk(plan: dict, nodes: list):
+    node = plan["Node Type"]
+    if "Relation Name" in plan:
+        node += f" on {plan['Relation Name']}"
+    if "Index Name" in plan:
+        node += f" using {plan['Index Name']}"
+    nodes.append(node)
+    for child in plan.get("Plans", []):
+        _walk(child, nodes)
+    return nodes
+
+
+def explain(query: str, params: list) -> dict:
+    sql = "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query.strip().rstrip(";")
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            row = cur.fetchone()
+        conn.rollback()
+    result = list(row.values())[0][0]
+    plan = result["Plan"]
+    return {
+        "execution_ms": result["Execution Time"],
+        "planning_ms": result["Planning Time"],
+        "shared_hit": plan.get("Shared Hit Blocks", 0),
+        "shared_read": plan.get("Shared Read Blocks", 0),
+        "nodes": _walk(plan, []),
+    }
+
+
+def run(repeticiones: int) -> dict:
+    snapshot = {"creada_en": datetime.now().isoformat(), "resultados": {}}
+    for report, mixes in filter_mixes().items():
+        if report not in CONSULTAS:
+            continue
+        for label, filters in mixes:
+            query, params = build_query(report, **filters)
+            runs = [explain(query, params) for _ in range(repeticiones)]
+            best = runs[-1]  # la última corrida tiene la cache de buffers caliente
+            best["execution_ms"] = statistics.median(r["execution_ms"] for r in runs)
+            snapshot["resultados"][f"{report}/{label}"] = best
+            print(f"{report}/{label}: {best['execution_ms']:.2f} ms, "
+                  f"buffers hit={best['shared_hit']} read={best['shared_read']}")
+    return snapshot
+
+
+def _scans(nodes: list) -> set:
+    return {n for n in nodes if "Scan" in n}
+
+
+def compare(antes: dict, despues: dict):
+    print("\nComparación de planes")
+    for key, nuevo in despues["resultados"].items():
+        viejo = antes["resultados"].get(key)
+        if viejo is None:
+            continue
+        ratio = viejo["execution_ms"] / nuevo["execution_ms"] if nuevo["execution_ms"] else float("inf")
+        print(f"{key}: {viejo['execution_ms']:.2f} ms -> {nuevo['execution_ms']:.2f} ms (x{ratio:.1f})")
+        quitados = _scans(viejo["nodes"]) - _scans(nuevo["nodes"])
+        agregados = _scans(nuevo["nodes"]) - _scans(viejo["nodes"])
+        for node in sorted(quitados):
+            print(f"    - {node}")
+        for node in sorted(agregados):
+            print(f"    + {node}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Planes y tiempos de los reportes")
+    parser.add_argument("--guardar", help="Archivo JSON donde guardar la instantánea")
+    parser.add_argument("--comparar", help="Instantánea anterior con la cual comparar")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    snapshot = run(args.repeticiones)
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, indent=2, ensure_ascii=False)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            compare(json.load(f), snapshot)
+
+
+if __name__ == "__main__":
+    main()
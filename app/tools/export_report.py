@@ -0,0 +1,42 @@
+"""Exporta un reporte completo a disco leyendo la base por lotes.
+
+Uso (desde app/):
+    python -m tools.export_report donaciones_por_donante csv donantes.csv \
+        --filtro fecha_inicio=2024-01-01 --filtro tipo_donante=empresa
+"""
+import argparse
+from datetime import date
+
+from components.exports import FORMATOS, export_report
+from services.reports import CONSULTAS
+
+
+def parse_value(value: str):
+    for cast in (int, float, date.fromisoformat):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportación en streaming de reportes")
+    parser.add_argument("reporte", choices=sorted(CONSULTAS))
+    parser.add_argument("formato", choices=sorted(FORMATOS))
+    parser.add_argument("salida")
+    parser.add_argument("--filtro", action="append", default=[], metavar="NOMBRE=VALOR")
+    parser.add_argument("--lote", type=int, default=None, help="Filas por lote del cursor")
+    args = parser.parse_args()
+
+    filters = {}
+    for item in args.filtro:
+        name, _, value = item.partition("=")
+        filters[name] = parse_value(value)
+
+    with open(args.salida, "wb") as out:
+        export_report(args.reporte, args.formato, out, batch_size=args.lote, **filters)
+
+
+if __name__ == "__main__":
+    main()
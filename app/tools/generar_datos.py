@@ -0,0 +1,326 @@
+"""Generador determinístico de datos sintéticos para todas las tablas de database/DDL.sql.
+
+Con la misma semilla, escala y --hasta produce exactamente los mismos datos.
+Las cantidades de las demás tablas se derivan del número de donaciones
+(10k a 50M) y la distribución tiene sesgo realista: pocas campañas y
+pocos donantes concentran la mayoría de las donaciones (Zipf), los montos
+siguen una log-normal y una fracción de las donaciones son en especie.
+
+La carga usa COPY por lotes con los triggers de fila desactivados
+(session_replication_role = replica, requiere superusuario); al final se
+recalculan estadisticas_campana y los buckets de donaciones.
+
+Uso (desde app/):
+    python -m tools.generar_datos --donaciones 100000 --truncar
+    python -m tools.generar_datos --donaciones 50000000 --semilla 7 --hasta 2025-12-31 --truncar
+"""
+import argparse
+import itertools
+import math
+import random
+import time
+from datetime import date, datetime, time as dtime, timedelta
+
+from db.connection import copy_rows, get_connection
+from services.estadisticas import repair_rollup
+from services.particiones import crear_particiones
+from tools.refresh_buckets import refresh_buckets
+
+LOTE = 100_000
+ZIPF_CAMPANAS = 1.1
+# Montos log-normales; 90% de las donaciones son monetarias
+MONTO_MU, MONTO_SIGMA = 4.5, 1.3
+MONTO_ESPERADO = 0.9 * math.exp(MONTO_MU + MONTO_SIGMA ** 2 / 2)
+
+# Hijas antes que padres; también los buckets derivados de donacion
+TABLAS = [
+    "voluntario_habilidad", "voluntario_actividad", "recurso", "disponibilidad_voluntario",
+    "estadisticas_campana", "donacion_diaria", "donacion_mensual", "donacion",
+    "preferencia_contacto", "actividad", "campana", "habilidad", "voluntario",
+    "donante", "sede", "categoria", "organizacion",
+]
+
+SECUENCIAS = {
+    "organizacion": "organizacion_id", "categoria": "categoria_id", "sede": "sede_id",
+    "campana": "campana_id", "actividad": "actividad_id", "donante": "donante_id",
+    "preferencia_contacto": "preferencia_id", "donacion": "donacion_id",
+    "voluntario": "voluntario_id", "disponibilidad_voluntario": "disponibilidad_id",
+    "habilidad": "habilidad_id", "recurso": "recurso_id",
+}
+
+CIUDADES = ["Guatemala", "Mixco", "Villa Nueva", "Quetzaltenango", "Escuintla", "Antigua", "Cobán", "Huehuetenango"]
+CATEGORIAS = ["Salud", "Educación", "Medio ambiente", "Alimentación", "Vivienda", "Emergencias", "Niñez", "Adulto mayor"]
+HABILIDADES = [
+    ("Primeros auxilios", "Salud"), ("Enseñanza", "Educación"), ("Cocina", "Logística"),
+    ("Conducción", "Logística"), ("Construcción", "Oficios"), ("Diseño gráfico", "Comunicación"),
+    ("Redes sociales", "Comunicación"), ("Contabilidad", "Administración"), ("Traducción", "Comunicación"),
+    ("Psicología", "Salud"), ("Programación", "Tecnología"), ("Fotografía", "Comunicación"),
+]
+NOMBRES = ["Ana", "Luis", "María", "José", "Carmen", "Jorge", "Lucía", "Carlos", "Sofía", "Diego", "Elena", "Pablo"]
+APELLIDOS = ["López", "García", "Pérez", "Hernández", "Morales", "Castillo", "Rodríguez", "Méndez", "Ramírez", "Juárez"]
+RECURSOS = [("Agua embotellada", "litros"), ("Víveres", "cajas"), ("Medicinas", "unidades"),
+            ("Mantas", "unidades"), ("Útiles escolares", "kits"), ("Cemento", "sacos")]
+ESPECIES = ["Ropa", "Alimentos no perecederos", "Juguetes", "Libros", "Medicinas", "Muebles"]
+DIAS = ["lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"]
+CONTACTOS = ["email", "teléfono", "correo", "sms", "whatsapp"]
+NIVELES = ["básico", "intermedio", "avanzado"]
+ESTADOS_VA = ["pendiente", "confirmado", "completado", "cancelado"]
+
+
+def escalas(donaciones: int) -> dict:
+    """Tamaño de cada tabla en función del número de donaciones."""
+    campanas = max(20, min(5000, donaciones // 2000))
+    return {
+        "donaciones": donaciones,
+        "organizaciones": max(5, campanas // 10),
+        "sedes": max(8, campanas // 5),
+        "campanas": campanas,
+        "actividades": campanas * 8,
+        "donantes": max(100, donaciones // 25),
+        "voluntarios": max(100, donaciones // 50),
+        "recursos": campanas * 4,
+    }
+
+
+def pesos_zipf(n: int, s: float) -> list[float]:
+    """Pesos acumulados de una distribución Zipf (el elemento 0 es el más popular)."""
+    return list(itertools.accumulate(1 / (i + 1) ** s for i in range(n)))
+
+
+class Generador:
+    def __init__(self, donaciones: int, semilla: int, hasta: date):
+        self.n = escalas(donaciones)
+        self.rng = random.Random(semilla)
+        self.hasta = hasta
+        self.desde = date(hasta.year - 3, 1, 1)
+        self.campanas = []  # (campana_id, fecha_inicio, dias_vigencia)
+        # Puesto de popularidad de cada campaña (0 = la que más recibe)
+        self.popularidad = self.rng.sample(range(self.n["campanas"]), self.n["campanas"])
+        self._zipf_total = pesos_zipf(self.n["campanas"], ZIPF_CAMPANAS)[-1]
+
+    def _fecha(self, desde: date, hasta: date) -> date:
+        return desde + timedelta(days=self.rng.randrange(max(1, (hasta - desde).days + 1)))
+
+    def _telefono(self) -> str:
+        return f"5{self.rng.randrange(10 ** 7):07d}"
+
+    def organizaciones(self):
+        for i in range(1, self.n["organizaciones"] + 1):
+            yield (i, f"Organización {i}", f"Descripción {i}", f"contacto{i}@org{i}.org", self._telefono(),
+                   f"Zona {i % 25 + 1}, {self.rng.choice(CIUDADES)}", f"www.org{i}.org",
+                   self._fecha(self.desde - timedelta(days=3650), self.desde), self.rng.random() < 0.9)
+
+    def categorias(self):
+        for i, nombre in enumerate(CATEGORIAS, 1):
+            yield i, nombre, f"Campañas de {nombre.lower()}"
+
+    def sedes(self):
+        for i in range(1, self.n["sedes"] + 1):
+            apertura = 7 + self.rng.randrange(3)
+            yield (i, f"Sede {i}", f"Calle {i}", self.rng.choice(CIUDADES), None, f"{1000 + i % 9000}",
+                   self._telefono(), f"sede{i}@org.org", dtime(apertura), dtime(apertura + 8 + self.rng.randrange(4)))
+
+    def campanas_(self):
+        for i in range(1, self.n["campanas"] + 1):
+            inicio = self._fecha(self.desde, self.hasta - timedelta(days=30))
+            fin = None if self.rng.random() < 0.15 else min(inicio + timedelta(days=30 + self.rng.randrange(335)), self.hasta)
+            fin_real = fin or self.hasta
+            self.campanas.append((i, inicio, (fin_real - inicio).days))
+            estado = "activa" if fin is None or fin >= self.hasta else "finalizada"
+            if self.rng.random() < 0.05:
+                estado = "pausada"
+            # La meta acompaña al volumen esperado de la campaña: la mayoría
+            # queda entre 30% y 300% de cumplimiento
+            esperado = self.n["donaciones"] * self._cuota(self.popularidad[i - 1]) * MONTO_ESPERADO
+            meta = round(esperado * self.rng.lognormvariate(0.2, 0.6), 2)
+            yield (i, self.rng.randrange(self.n["organizaciones"]) + 1, self.rng.randrange(len(CATEGORIAS)) + 1,
+                   self.rng.randrange(self.n["sedes"]) + 1, f"Campaña {i}", f"Descripción campaña {i}",
+                   inicio, fin, max(meta, 1000), estado)
+
+    def _cuota(self, puesto: int) -> float:
+        """Fracción de las donaciones que recibe la campaña en ese puesto (Zipf)."""
+        return (1 / (puesto + 1) ** ZIPF_CAMPANAS) / self._zipf_total
+
+    def actividades(self):
+        for i in range(1, self.n["actividades"] + 1):
+            campana_id, inicio, dias = self.campanas[(i - 1) % len(self.campanas)]
+            comienzo = datetime.combine(inicio + timedelta(days=self.rng.randrange(dias + 1)), dtime(8 + self.rng.randrange(10)))
+            yield (i, campana_id, self.rng.randrange(self.n["sedes"]) + 1, f"Actividad {i}", None,
+                   comienzo, comienzo + timedelta(hours=1 + self.rng.randrange(8)), 10 + self.rng.randrange(90))
+
+    def donantes(self):
+        for i in range(1, self.n["donantes"] + 1):
+            registro = self._fecha(self.desde - timedelta(days=365), self.hasta)
+            email = f"donante{i}@correo.com" if self.rng.random() < 0.9 else None
+            if self.rng.random() < 0.15:
+                yield (i, "empresa", None, None, f"Empresa {i} S.A.", email, self._telefono(), None, registro)
+            else:
+                yield (i, "individual", self.rng.choice(NOMBRES), self.rng.choice(APELLIDOS), None, email,
+                       self._telefono(), None, registro)
+
+    def preferencias(self):
+        ids = itertools.count(1)
+        for donante_id in range(1, self.n["donantes"] + 1):
+            for tipo in self.rng.sample(CONTACTOS, self.rng.randrange(3)):
+                yield next(ids), donante_id, tipo, self.rng.random() < 0.8
+
+    def donaciones(self):
+        """Campañas y donantes con popularidad Zipf; montos log-normales."""
+        campanas_cum = pesos_zipf(len(self.campanas), ZIPF_CAMPANAS)
+        donantes_cum = pesos_zipf(self.n["donantes"], 0.8)
+        orden_campanas = sorted(self.campanas, key=lambda c: self.popularidad[c[0] - 1])
+        # Orden aleatorio de popularidad para que los ids bajos no sean siempre los grandes
+        orden_donantes = self.rng.sample(range(1, self.n["donantes"] + 1), self.n["donantes"])
+        rng = self.rng
+        total = self.n["donaciones"]
+        donacion_id = 1
+        while donacion_id <= total:
+            k = min(LOTE, total - donacion_id + 1)
+            campanas = rng.choices(orden_campanas, cum_weights=campanas_cum, k=k)
+            donantes = rng.choices(orden_donantes, cum_weights=donantes_cum, k=k)
+            for (campana_id, inicio, dias), donante_id in zip(campanas, donantes):
+                fecha = datetime.combine(inicio, dtime()) + timedelta(seconds=rng.randrange((dias + 1) * 86400))
+                if rng.random() < 0.1:
+                    yield (donacion_id, donante_id, campana_id, "especie", None, rng.choice(ESPECIES),
+                           fecha, rng.random() < 0.05, None)
+                else:
+                    monto = max(1.0, round(rng.lognormvariate(MONTO_MU, MONTO_SIGMA), 2))
+                    yield (donacion_id, donante_id, campana_id, "monetaria", monto, None,
+                           fecha, rng.random() < 0.05, None)
+                donacion_id += 1
+
+    def voluntarios(self):
+        for i in range(1, self.n["voluntarios"] + 1):
+            # Sesgo hacia jóvenes: 16-80 años con moda cerca de los 25
+            edad = min(80, 16 + int(self.rng.gammavariate(2.0, 6.0)))
+            nacimiento = self.hasta - timedelta(days=edad * 365 + 5 + self.rng.randrange(360))
+            yield (i, self.rng.choice(NOMBRES), self.rng.choice(APELLIDOS), f"voluntario{i}@correo.com",
+                   self._telefono(), None, nacimiento, self._fecha(self.desde, self.hasta), self.rng.random() < 0.85)
+
+    def disponibilidades(self):
+        ids = itertools.count(1)
+        for voluntario_id in range(1, self.n["voluntarios"] + 1):
+            for dia in self.rng.sample(DIAS, 1 + self.rng.randrange(3)):
+                inicio = 6 + self.rng.randrange(12)
+                yield next(ids), voluntario_id, dia, dtime(inicio), dtime(min(23, inicio + 2 + self.rng.randrange(6)))
+
+    def habilidades(self):
+        for i, (nombre, categoria) in enumerate(HABILIDADES, 1):
+            yield i, nombre, None, categoria
+
+    def voluntario_habilidades(self):
+        for voluntario_id in range(1, self.n["voluntarios"] + 1):
+            for habilidad_id in self.rng.sample(range(1, len(HABILIDADES) + 1), self.rng.randrange(4)):
+                yield (voluntario_id, habilidad_id, self.rng.choice(NIVELES), self.rng.randrange(15),
+                       self.rng.random() < 0.3)
+
+    def voluntario_actividades(self):
+        actividades_cum = pesos_zipf(self.n["actividades"], 0.7)
+        actividades = range(1, self.n["actividades"] + 1)
+        for voluntario_id in range(1, self.n["voluntarios"] + 1):
+            elegidas = set(self.rng.choices(actividades, cum_weights=actividades_cum, k=self.rng.randrange(6)))
+            for actividad_id in sorted(elegidas):
+                yield (voluntario_id, actividad_id, datetime.combine(self._fecha(self.desde, self.hasta), dtime(12)),
+                       round(self.rng.uniform(0, 12), 2), None, self.rng.choice(ESTADOS_VA))
+
+    def recursos(self):
+        for i in range(1, self.n["recursos"] + 1):
+            nombre, unidad = self.rng.choice(RECURSOS)
+            requerida = 10 + self.rng.randrange(1000)
+            yield (i, self.campanas[(i - 1) % len(self.campanas)][0], nombre, None, requerida,
+                   int(requerida * min(1.5, self.rng.betavariate(2, 2) * 1.5)), unidad)
+
+
+def cargar(generador: Generador, lote: int = LOTE) -> dict:
+    """Inserta todo en una transacción; devuelve filas por tabla."""
+    g = generador
+    plan = [
+        ("organizacion", ["organizacion_id", "nombre", "descripcion", "email", "telefono", "direccion",
+                          "sitio_web", "fecha_registro", "activa"], g.organizaciones),
+        ("categoria", ["categoria_id", "nombre", "descripcion"], g.categorias),
+        ("sede", ["sede_id", "nombre", "direccion", "ciudad", "region", "codigo_postal", "telefono", "email",
+                  "horario_apertura", "horario_cierre"], g.sedes),
+        ("campana", ["campana_id", "organizacion_id", "categoria_id", "sede_principal_id", "nombre", "descripcion",
+                     "fecha_inicio", "fecha_fin", "meta_monetaria", "estado"], g.campanas_),
+        ("actividad", ["actividad_id", "campana_id", "sede_id", "nombre", "descripcion", "fecha_inicio",
+                       "fecha_fin", "capacidad_max"], g.actividades),
+        ("donante", ["donante_id", "tipo", "nombre", "apellido", "empresa", "email", "telefono", "direccion",
+                     "fecha_registro"], g.donantes),
+        ("preferencia_contacto", ["preferencia_id", "donante_id", "tipo", "permitido"], g.preferencias),
+        ("voluntario", ["voluntario_id", "nombre", "apellido", "email", "telefono", "direccion",
+                        "fecha_nacimiento", "fecha_registro", "activo"], g.voluntarios),
+        ("disponibilidad_voluntario", ["disponibilidad_id", "voluntario_id", "dia", "hora_inicio", "hora_fin"],
+         g.disponibilidades),
+        ("habilidad", ["habilidad_id", "nombre", "descripcion", "categoria"], g.habilidades),
+        ("voluntario_habilidad", ["voluntario_id", "habilidad_id", "nivel", "anios_experiencia", "certificado"],
+         g.voluntario_habilidades),
+        ("recurso", ["recurso_id", "campana_id", "nombre", "descripcion", "cantidad_requerida", "cantidad_actual",
+                     "unidad_medida"], g.recursos),
+        ("voluntario_actividad", ["voluntario_id", "actividad_id", "fecha_registro", "horas_dedicadas",
+                                  "comentarios", "estado"], g.voluntario_actividades),
+        ("donacion", ["donacion_id", "donante_id", "campana_id", "tipo", "monto", "descripcion_especie", "fecha",
+                      "anonima", "mensaje"], g.donaciones),
+    ]
+    filas = {}
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            # Sin triggers de fila: estadísticas y buckets se recalculan al final en bloque
+            cur.execute("SET LOCAL session_replication_role = replica")
+            for tabla, columnas, filas_tabla in plan:
+                inicio = time.perf_counter()
+                filas[tabla] = copy_rows(cur, tabla, columnas, filas_tabla(), lote)
+                print(f"{tabla}: {filas[tabla]} filas en {time.perf_counter() - inicio:.1f}s")
+            for tabla, columna in SECUENCIAS.items():
+                cur.execute(
+                    f"SELECT setval(pg_get_serial_sequence(%s, %s), COALESCE(MAX({columna}), 0) + 1, false) FROM {tabla}",
+                    (tabla, columna),
+                )
+    return filas
+
+
+def truncar():
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass(t) IS NOT NULL AS existe, t FROM unnest(%s::text[]) AS t", (TABLAS,))
+            tablas = [row["t"] for row in cur.fetchall() if row["existe"]]
+            cur.execute(f"TRUNCATE TABLE {', '.join(tablas)} RESTART IDENTITY CASCADE")
+
+
+def _tiene_datos() -> bool:
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT EXISTS (SELECT 1 FROM donacion) OR EXISTS (SELECT 1 FROM campana) AS hay")
+            return cur.fetchone()["hay"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Datos sintéticos a escala para los reportes")
+    parser.add_argument("--donaciones", type=int, default=10_000, help="Filas de donacion (10k a 50M)")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--hasta", type=date.fromisoformat, default=date.today(),
+                        help="Fecha más reciente de los datos (fijarla para reproducir exactamente)")
+    parser.add_argument("--lote", type=int, default=LOTE, help="Filas por COPY")
+    parser.add_argument("--truncar", action="store_true", help="Vaciar las tablas antes de cargar")
+    args = parser.parse_args()
+
+    if args.truncar:
+        truncar()
+    elif _tiene_datos():
+        parser.error("La base ya tiene datos; use --truncar para reemplazarlos")
+
+    inicio = time.perf_counter()
+    generador = Generador(args.donaciones, args.semilla, args.hasta)
+    print(", ".join(f"{k}={v}" for k, v in generador.n.items()))
+    # Un mes por partición antes del COPY: así nada cae en donacion_default
+    print(f"{len(crear_particiones(generador.desde, args.hasta))} particiones de donacion creadas")
+    cargar(generador, args.lote)
+    print(f"{repair_rollup()} filas de estadisticas_campana recalculadas")
+    print(f"{refresh_buckets()} buckets diarios recalculados")
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("ANALYZE")
+    print(f"Carga completa en {time.perf_counter() - inicio:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
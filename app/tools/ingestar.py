@@ -0,0 +1,73 @@
+"""Carga donaciones o inscripciones de voluntarios desde un archivo CSV o NDJSON.
+
+Cada lote de --lote filas se valida y se inserta en su propia transacción
+(services/ingesta.py); las filas rechazadas se informan con su número de
+línea y el motivo, y se pueden guardar en un archivo aparte.
+
+Uso (desde app/):
+    python -m tools.ingestar donaciones pagos.ndjson
+    python -m tools.ingestar voluntario_actividad inscripciones.csv --rechazos rechazos.ndjson
+"""
+import argparse
+import csv
+import itertools
+import json
+import time
+
+from services.ingesta import ingest_donaciones, ingest_voluntario_actividad
+
+TABLAS = {
+    "donaciones": ingest_donaciones,
+    "voluntario_actividad": ingest_voluntario_actividad,
+}
+
+
+def leer(ruta: str):
+    with open(ruta, encoding="utf-8", newline="") as f:
+        if ruta.endswith(".csv"):
+            # En CSV las celdas vacías equivalen a NULL
+            for fila in csv.DictReader(f):
+                yield {k: (v if v != "" else None) for k, v in fila.items()}
+        else:
+            for linea in f:
+                if linea.strip():
+                    yield json.loads(linea)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingesta masiva desde archivo")
+    parser.add_argument("tabla", choices=sorted(TABLAS))
+    parser.add_argument("archivo", help="Archivo .csv o .ndjson")
+    parser.add_argument("--lote", type=int, default=10_000, help="Filas por transacción")
+    parser.add_argument("--rechazos", help="Archivo NDJSON donde guardar las filas rechazadas")
+    args = parser.parse_args()
+
+    ingest = TABLAS[args.tabla]
+    inicio = time.perf_counter()
+    insertadas = rechazadas = 0
+    salida = open(args.rechazos, "w", encoding="utf-8") if args.rechazos else None
+    try:
+        filas = leer(args.archivo)
+        for numero in itertools.count():
+            lote = list(itertools.islice(filas, args.lote))
+            if not lote:
+                break
+            resultado = ingest(lote)
+            insertadas += resultado["insertadas"]
+            rechazadas += len(resultado["rechazadas"])
+            for rechazo in resultado["rechazadas"]:
+                linea = numero * args.lote + rechazo["fila"] + 1
+                print(f"fila {linea}: {rechazo['error']}")
+                if salida:
+                    salida.write(json.dumps({"linea": linea, "error": rechazo["error"], "fila": lote[rechazo["fila"]]},
+                                            default=str, ensure_ascii=False) + "\n")
+    finally:
+        if salida:
+            salida.close()
+    segundos = time.perf_counter() - inicio
+    print(f"{insertadas} filas insertadas, {rechazadas} rechazadas en {segundos:.1f}s "
+          f"({insertadas / segundos if segundos else 0:.0f} filas/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Mantenimiento y verificación de las particiones mensuales de donacion.
+
+Uso (desde app/):
+    python -m tools.particiones listar
+    python -m tools.particiones crear --meses-adelante 6     # meses futuros y los que tengan filas en donacion_default
+    python -m tools.particiones archivar --meses-calientes 24
+    python -m tools.particiones verificar                    # particiones leídas por cada reporte
+
+`verificar` ejecuta EXPLAIN ANALYZE de las combinaciones de filtros de
+tools/explain_reports.py que leen donacion y cuenta las particiones que
+aparecen en el plan: con una ventana de fechas deben ser solo las de la ventana.
+"""
+import argparse
+import sys
+
+from db.connection import get_connection
+from services.particiones import (
+    MESES_ADELANTE, MESES_CALIENTES, archivar_particiones, crear_particiones, listar_particiones,
+)
+from services.reports import build_query
+from tools.explain_reports import filter_mixes
+
+# Reportes que pueden leer donacion
+REPORTES_DONACION = ("donaciones_por_campana", "donaciones_por_donante", "efectividad_campanas")
+
+
+def _relaciones(plan: dict, nombres: set) -> set:
+    encontradas = {plan["Relation Name"]} & nombres if "Relation Name" in plan else set()
+    for hijo in plan.get("Plans", []):
+        encontradas |= _relaciones(hijo, nombres)
+    return encontradas
+
+
+def verificar() -> list[dict]:
+    # Los reportes leen donacion_historica: cuentan también las de donacion_archivo
+    particiones = {row["particion"] for row in listar_particiones()}
+    resultados = []
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            for report, mixes in filter_mixes().items():
+                if report not in REPORTES_DONACION:
+                    continue
+                for label, filters in mixes:
+                    query, params = build_query(report, **filters)
+                    cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + query.strip().rstrip(";"), params)
+                    resultado = list(cur.fetchone().values())[0][0]
+                    leidas = _relaciones(resultado["Plan"], particiones)
+                    if leidas:
+                        resultados.append({
+                            "consulta": f"{report}/{label}",
+                            "leidas": len(leidas),
+                            "total": len(particiones),
+                            "ms": resultado["Execution Time"],
+                            "ventana": "fecha_inicio" in filters or "fecha_fin" in filters,
+                        })
+        conn.rollback()
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Particiones mensuales de donacion")
+    sub = parser.add_subparsers(dest="accion", required=True)
+    sub.add_parser("listar")
+    crear = sub.add_parser("crear")
+    crear.add_argument("--meses-adelante", type=int, default=MESES_ADELANTE)
+    archivar = sub.add_parser("archivar")
+    archivar.add_argument("--meses-calientes", type=int, default=MESES_CALIENTES)
+    sub.add_parser("verificar")
+    args = parser.parse_args()
+
+    if args.accion == "listar":
+        for row in listar_particiones():
+            print(f"{row['tabla']:<17} {row['particion']:<20} {row['filas_estimadas']:>10} filas "
+                  f"{row['bytes'] / 1024 / 1024:>8.1f} MB  {row['limites']}")
+    elif args.accion == "crear":
+        creadas = crear_particiones(meses_adelante=args.meses_adelante)
+        print(f"{len(creadas)} particiones creadas: {', '.join(creadas)}")
+    elif args.accion == "archivar":
+        archivadas = archivar_particiones(args.meses_calientes)
+        print(f"{len(archivadas)} particiones archivadas: {', '.join(archivadas)}")
+    else:
+        sin_poda = 0
+        for row in verificar():
+            # Una ventana de un año no debería leer todo el histórico
+            podada = not row["ventana"] or row["leidas"] < row["total"]
+            sin_poda += not podada
+            print(f"{row['consulta']}: {row['leidas']}/{row['total']} particiones, {row['ms']:.1f} ms"
+                  + ("" if podada else "  SIN PODA"))
+        if sin_poda:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
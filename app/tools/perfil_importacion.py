@@ -0,0 +1,126 @@
+"""Tiempo de importación de los módulos que carga el panel (python -X importtime).
+
+Importa los módulos en un proceso nuevo, suma el tiempo propio de los
+módulos de cada paquete y verifica que las librerías que solo se usan al
+exportar (DIFERIDOS) no se carguen al arrancar.
+
+Uso (desde app/):
+    python -m tools.perfil_importacion
+    python -m tools.perfil_importacion --modulo components.exports --top 20
+    python -m tools.perfil_importacion --guardar imports.json --comparar antes.json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from datetime import datetime
+
+# Lo que importa main.py antes de dibujar la página
+MODULOS = [
+    "streamlit",
+    "services.reports",
+    "services.asignacion",
+    "components.filtros",
+    "components.ui_elements",
+    "services.orquestador",
+    "services.metricas",
+    "services.cache",
+    "db.connection",
+]
+# Se importan recién en el primer export (components/exports.py) o en rutas opcionales
+DIFERIDOS = ["reportlab", "xlsxwriter", "plotly", "redis"]
+
+_LINEA = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def perfilar(modulos: list[str]) -> tuple[list[dict], set]:
+    """(una fila por importación {modulo, propio_us, acumulado_us, nivel}, módulos cargados).
+
+    -X importtime también lista los intentos fallidos (p. ej. streamlit prueba
+    `import plotly`), así que los cargados salen de sys.modules.
+    """
+    app = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [app, os.environ.get("PYTHONPATH")])))
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         "; ".join(f"import {m}" for m in modulos) + "; import json, sys; print(json.dumps(sorted(sys.modules)))"],
+        capture_output=True, text=True, env=env, cwd=app,
+    )
+    if proceso.returncode != 0:
+        raise RuntimeError(proceso.stderr.strip().splitlines()[-1])
+    filas = []
+    for linea in proceso.stderr.splitlines():
+        m = _LINEA.match(linea)
+        if m:
+            filas.append({
+                "modulo": m.group(4),
+                "propio_us": int(m.group(1)),
+                "acumulado_us": int(m.group(2)),
+                "nivel": (len(m.group(3)) - 1) // 2,
+            })
+    return filas, set(json.loads(proceso.stdout.strip().splitlines()[-1]))
+
+
+def run(modulos: list[str], top: int) -> dict:
+    filas, importados = perfilar(modulos)
+    # Los de nivel 0 son los que importó el script: su acumulado suma el total
+    raiz = sorted((f for f in filas if f["nivel"] == 0), key=lambda f: f["acumulado_us"], reverse=True)
+    total_ms = sum(f["acumulado_us"] for f in raiz) / 1000
+    paquetes = {}
+    for f in filas:
+        paquete = f["modulo"].split(".")[0]
+        paquetes[paquete] = paquetes.get(paquete, 0) + f["propio_us"]
+    cargados = sorted(d for d in DIFERIDOS if d in importados)
+
+    print(f"Total: {total_ms:.0f} ms ({len(filas)} módulos)")
+    print("\nPor paquete (tiempo propio de todos sus módulos):")
+    for paquete, us in sorted(paquetes.items(), key=lambda x: x[1], reverse=True)[:top]:
+        print(f"  {paquete:<30} {us / 1000:8.1f} ms")
+    print("\nImportaciones directas:")
+    for f in raiz[:top]:
+        print(f"  {f['modulo']:<30} {f['acumulado_us'] / 1000:8.1f} ms")
+    if cargados:
+        print(f"\nCargados al importar (deberían ser diferidos): {', '.join(cargados)}")
+    return {
+        "creada_en": datetime.now().isoformat(),
+        "modulos": modulos,
+        "total_ms": total_ms,
+        "paquetes_ms": {p: us / 1000 for p, us in paquetes.items()},
+        "diferidos_cargados": cargados,
+    }
+
+
+def compare(antes: dict, despues: dict, top: int):
+    print(f"\nComparación: {antes['total_ms']:.0f} ms -> {despues['total_ms']:.0f} ms")
+    paquetes = set(antes["paquetes_ms"]) | set(despues["paquetes_ms"])
+    cambios = sorted(
+        ((p, antes["paquetes_ms"].get(p, 0.0), despues["paquetes_ms"].get(p, 0.0)) for p in paquetes),
+        key=lambda x: abs(x[2] - x[1]), reverse=True,
+    )
+    for paquete, viejo, nuevo in cambios[:top]:
+        print(f"  {paquete:<30} {viejo:8.1f} -> {nuevo:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de importación de los módulos del panel")
+    parser.add_argument("--modulo", action="append", help="Módulo a importar (por defecto, los de main.py)")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--guardar", help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--comparar", help="Resultados anteriores con los cuales comparar")
+    args = parser.parse_args()
+
+    snapshot = run(args.modulo or MODULOS, args.top)
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, indent=2, ensure_ascii=False)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            compare(json.load(f), snapshot, args.top)
+    if snapshot["diferidos_cargados"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
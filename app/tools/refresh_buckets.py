@@ -0,0 +1,32 @@
+"""Recalcula (backfill) los buckets diarios/mensuales de donaciones.
+
+Uso (desde app/):
+    python -m tools.refresh_buckets                                    # todo el histórico
+    python -m tools.refresh_buckets --desde 2024-01-01 --hasta 2024-03-31
+"""
+import argparse
+from datetime import date
+
+from db.connection import get_connection
+from services.cache import CANAL_CAMBIOS, TAG_DONACION
+
+
+def refresh_buckets(desde: date | None = None, hasta: date | None = None) -> int:
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT refrescar_donacion_buckets(%s, %s) AS filas", (desde, hasta))
+            filas = cur.fetchone()["filas"]
+            cur.execute("SELECT pg_notify(%s, %s)", (CANAL_CAMBIOS, TAG_DONACION))
+            return filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill de donacion_diaria / donacion_mensual")
+    parser.add_argument("--desde", type=date.fromisoformat)
+    parser.add_argument("--hasta", type=date.fromisoformat)
+    args = parser.parse_args()
+    print(f"{refresh_buckets(args.desde, args.hasta)} buckets diarios recalculados")
+
+
+if __name__ == "__main__":
+    main()
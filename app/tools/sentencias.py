@@ -0,0 +1,56 @@
+"""Reutilización de las sentencias preparadas de services/definiciones.py.
+
+Ejecuta cada combinación de filtros de tools/explain_reports --repeticiones
+veces en una sola conexión y muestra, por sentencia, cuántas veces
+PostgreSQL usó un plan genérico (reutilizado) o uno personalizado.
+
+Uso (desde app/):
+    python -m tools.sentencias --repeticiones 20
+"""
+import argparse
+
+from db.connection import execute_query, get_connection, plan_cache, prepared_stats
+from services.definiciones import REPORTES
+from services.reports import CONSULTAS, build_query
+from tools.explain_reports import filter_mixes
+
+
+def run(repeticiones: int):
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            for report, mixes in filter_mixes().items():
+                if report not in CONSULTAS:
+                    continue
+                for label, filters in mixes:
+                    query, params = build_query(report, **filters)
+                    nombre = getattr(query, "nombre", "(sql dinámico)")
+                    try:
+                        for _ in range(repeticiones):
+                            execute_query(cur, query, params)
+                            cur.fetchall()
+                    except Exception as e:
+                        conn.rollback()
+                        print(f"{report}/{label}: error {type(e).__name__}: {e}".strip())
+                        continue
+                    print(f"{report}/{label}: {nombre}")
+        planes = plan_cache(conn)
+
+    print("\nSentencia                                      genéricos  personalizados")
+    for plan in planes:
+        print(f"{plan['name']:<46} {plan['generic_plans']:>9}  {plan['custom_plans']:>14}")
+    stats = prepared_stats()
+    print(f"\n{stats['prepares']} PREPARE, {stats['reutilizadas']} EXECUTE reutilizados "
+          f"({stats['reutilizacion']:.0%})")
+    for nombre, reporte in sorted(REPORTES.items()):
+        print(f"{nombre}: {len(reporte.filtros)} filtros, {len(reporte.sentencias())} sentencias compiladas")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan cache de las sentencias preparadas")
+    parser.add_argument("--repeticiones", type=int, default=10)
+    args = parser.parse_args()
+    run(args.repeticiones)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,6 @@
+import sys
+
+
 def format_currency(value: float) -> str:
     return f"${value:,.2f}"
 
@@ -6,3 +9,18 @@ def format_percentage(value: float) -> str:
 
 def safe_divide(numerator: float, denominator: float) -> float:
     return numerator / denominator if denominator else 0.0
+
+
+def estimate_size(value) -> int:
+    """Tamaño aproximado en bytes de una lista de filas (dicts), de un dict que las contiene o de un DataFrame."""
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    size = sys.getsizeof(value)
+    if isinstance(value, list):
+        for row in value:
+            size += sys.getsizeof(row)
+            if isinstance(row, dict):
+                size += sum(sys.getsizeof(v) for v in row.values())
+    elif isinstance(value, dict):
+        size += sum(estimate_size(v) for v in value.values())
+    return size
@@ -217,6 +217,9 @@ BEGIN
             1
         );
     END IF;
+
+    -- Avisa a la app para invalidar la cache de reportes
+    PERFORM pg_notify('reporteria_cambios', TG_TABLE_NAME);
     
     RETURN NEW;
 END;
@@ -253,6 +256,9 @@ BEGIN
             1
         );
     END IF;
+
+    -- Avisa a la app para invalidar la cache de reportes
+    PERFORM pg_notify('reporteria_cambios', TG_TABLE_NAME);
     
     RETURN NEW;
 END;
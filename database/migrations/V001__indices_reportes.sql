@@ -0,0 +1,50 @@
+-- V001: índices secundarios para los joins y filtros de app/services/reports.py
+-- Idempotente: se puede aplicar sobre una base existente con
+--   psql -U admin -d reporteria_db -f V001__indices_reportes.sql
+-- (CONCURRENTLY no bloquea escrituras; psql ejecuta cada sentencia fuera de transacción)
+
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version VARCHAR(20) PRIMARY KEY,
+    descripcion TEXT NOT NULL,
+    aplicada_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- donaciones_por_campana / efectividad_campanas: join por campaña + ventana de fechas.
+-- INCLUDE permite index-only scans para COUNT(donacion_id) y SUM(monto).
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_donacion_campana_fecha
+    ON donacion (campana_id, fecha) INCLUDE (monto, donacion_id);
+
+-- donaciones_por_donante: agrupación por donante dentro de la ventana de fechas
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_donacion_donante_fecha
+    ON donacion (donante_id, fecha) INCLUDE (monto, donacion_id);
+
+-- Ventanas de fechas angostas sin filtro de campaña ni donante
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_donacion_fecha
+    ON donacion (fecha) INCLUDE (campana_id, donante_id, monto, donacion_id);
+
+-- donaciones_por_donante con monto_minimo: "d.monto >= x" implica monto IS NOT NULL,
+-- así que el planner puede usar este índice parcial (excluye donaciones en especie sin monto)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_donacion_monto_donante
+    ON donacion (monto, donante_id) INCLUDE (fecha, donacion_id)
+    WHERE monto IS NOT NULL;
+
+-- Actividades por campaña (subconsulta de voluntarios en efectividad_campanas, recursos)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_actividad_campana
+    ON actividad (campana_id) INCLUDE (actividad_id, fecha_inicio, fecha_fin);
+
+-- Filtros de rango sobre actividades
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_actividad_fechas
+    ON actividad (fecha_inicio, fecha_fin);
+
+-- La PK (voluntario_id, actividad_id) no sirve para buscar por actividad
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_voluntario_actividad_actividad
+    ON voluntario_actividad (actividad_id) INCLUDE (voluntario_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_recurso_campana
+    ON recurso (campana_id);
+
+ANALYZE donacion, actividad, voluntario_actividad, recurso;
+
+INSERT INTO schema_migrations (version, descripcion)
+VALUES ('V001', 'Índices para filtros y joins de reportes')
+ON CONFLICT (version) DO NOTHING;
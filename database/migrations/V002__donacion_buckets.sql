@@ -0,0 +1,121 @@
+-- V002: agregados diarios y mensuales de donaciones por campaña, tipo de donante
+-- y tipo de donación. Permiten responder reportes con ventana de fechas sumando
+-- buckets en lugar de recorrer donacion.
+
+CREATE TABLE IF NOT EXISTS donacion_diaria (
+    dia DATE NOT NULL,
+    campana_id INTEGER NOT NULL REFERENCES campana(campana_id),
+    tipo_donante tipo_donante NOT NULL,
+    tipo_donacion tipo_donacion NOT NULL,
+    num_donaciones INTEGER NOT NULL DEFAULT 0,
+    monto_total DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, campana_id, tipo_donante, tipo_donacion)
+);
+
+-- mes = primer día del mes
+CREATE TABLE IF NOT EXISTS donacion_mensual (
+    mes DATE NOT NULL,
+    campana_id INTEGER NOT NULL REFERENCES campana(campana_id),
+    tipo_donante tipo_donante NOT NULL,
+    tipo_donacion tipo_donacion NOT NULL,
+    num_donaciones INTEGER NOT NULL DEFAULT 0,
+    monto_total DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (mes, campana_id, tipo_donante, tipo_donacion),
+    CONSTRAINT chk_mes CHECK (mes = date_trunc('month', mes)::date)
+);
+
+CREATE INDEX IF NOT EXISTS idx_donacion_diaria_campana
+    ON donacion_diaria (campana_id, dia) INCLUDE (num_donaciones, monto_total);
+CREATE INDEX IF NOT EXISTS idx_donacion_mensual_campana
+    ON donacion_mensual (campana_id, mes) INCLUDE (num_donaciones, monto_total);
+
+-- Suma (signo = 1) o resta (signo = -1) una donación de sus buckets
+CREATE OR REPLACE FUNCTION aplicar_bucket_donacion(
+    p_fecha TIMESTAMP,
+    p_campana_id INTEGER,
+    p_donante_id INTEGER,
+    p_tipo tipo_donacion,
+    p_monto DECIMAL,
+    p_signo INTEGER
+) RETURNS VOID AS $$
+DECLARE
+    v_tipo_donante tipo_donante;
+BEGIN
+    SELECT tipo INTO v_tipo_donante FROM donante WHERE donante_id = p_donante_id;
+
+    INSERT INTO donacion_diaria AS b (dia, campana_id, tipo_donante, tipo_donacion, num_donaciones, monto_total)
+    VALUES (p_fecha::date, p_campana_id, v_tipo_donante, p_tipo, p_signo, p_signo * COALESCE(p_monto, 0))
+    ON CONFLICT (dia, campana_id, tipo_donante, tipo_donacion) DO UPDATE
+    SET num_donaciones = b.num_donaciones + EXCLUDED.num_donaciones,
+        monto_total = b.monto_total + EXCLUDED.monto_total;
+
+    INSERT INTO donacion_mensual AS b (mes, campana_id, tipo_donante, tipo_donacion, num_donaciones, monto_total)
+    VALUES (date_trunc('month', p_fecha)::date, p_campana_id, v_tipo_donante, p_tipo, p_signo, p_signo * COALESCE(p_monto, 0))
+    ON CONFLICT (mes, campana_id, tipo_donante, tipo_donacion) DO UPDATE
+    SET num_donaciones = b.num_donaciones + EXCLUDED.num_donaciones,
+        monto_total = b.monto_total + EXCLUDED.monto_total;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION actualizar_buckets_donacion()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM aplicar_bucket_donacion(OLD.fecha, OLD.campana_id, OLD.donante_id, OLD.tipo, OLD.monto, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM aplicar_bucket_donacion(NEW.fecha, NEW.campana_id, NEW.donante_id, NEW.tipo, NEW.monto, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS after_donacion_buckets ON donacion;
+CREATE TRIGGER after_donacion_buckets
+AFTER INSERT OR UPDATE OR DELETE ON donacion
+FOR EACH ROW
+EXECUTE FUNCTION actualizar_buckets_donacion();
+
+-- Recalcula los buckets desde donacion. Sin argumentos reconstruye todo; con rango,
+-- se extiende a meses completos para que diarios y mensuales queden coherentes.
+CREATE OR REPLACE FUNCTION refrescar_donacion_buckets(
+    p_desde DATE DEFAULT NULL,
+    p_hasta DATE DEFAULT NULL
+) RETURNS INTEGER AS $$
+DECLARE
+    v_desde DATE := CASE WHEN p_desde IS NULL THEN '-infinity'::date
+                         ELSE date_trunc('month', p_desde)::date END;
+    v_hasta DATE := CASE WHEN p_hasta IS NULL THEN 'infinity'::date
+                         ELSE (date_trunc('month', p_hasta) + INTERVAL '1 month')::date END;
+    v_filas INTEGER;
+BEGIN
+    -- Bloquea escrituras en donacion mientras se recalcula el rango
+    LOCK TABLE donacion IN SHARE MODE;
+
+    DELETE FROM donacion_diaria WHERE dia >= v_desde AND dia < v_hasta;
+    DELETE FROM donacion_mensual WHERE mes >= v_desde AND mes < v_hasta;
+
+    INSERT INTO donacion_diaria (dia, campana_id, tipo_donante, tipo_donacion, num_donaciones, monto_total)
+    SELECT d.fecha::date, d.campana_id, dn.tipo, d.tipo, COUNT(*), COALESCE(SUM(d.monto), 0)
+    FROM donacion d
+    JOIN donante dn ON d.donante_id = dn.donante_id
+    WHERE d.fecha >= v_desde AND d.fecha < v_hasta
+    GROUP BY 1, 2, 3, 4;
+    GET DIAGNOSTICS v_filas = ROW_COUNT;
+
+    INSERT INTO donacion_mensual (mes, campana_id, tipo_donante, tipo_donacion, num_donaciones, monto_total)
+    SELECT date_trunc('month', dia)::date, campana_id, tipo_donante, tipo_donacion,
+           SUM(num_donaciones), SUM(monto_total)
+    FROM donacion_diaria
+    WHERE dia >= v_desde AND dia < v_hasta
+    GROUP BY 1, 2, 3, 4;
+
+    RETURN v_filas;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT refrescar_donacion_buckets();
+
+INSERT INTO schema_migrations (version, descripcion)
+VALUES ('V002', 'Buckets diarios y mensuales de donaciones')
+ON CONFLICT (version) DO NOTHING;
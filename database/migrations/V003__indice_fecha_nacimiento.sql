@@ -0,0 +1,11 @@
+-- V003: los filtros de edad de los reportes se traducen a rangos sobre fecha_nacimiento
+-- (services/edad.py), así que pueden usar este índice.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_voluntario_fecha_nacimiento
+    ON voluntario (fecha_nacimiento) INCLUDE (voluntario_id);
+
+ANALYZE voluntario;
+
+INSERT INTO schema_migrations (version, descripcion)
+VALUES ('V003', 'Índice de fecha de nacimiento para filtros de edad')
+ON CONFLICT (version) DO NOTHING;
@@ -0,0 +1,189 @@
+-- V004: estadisticas_campana y los buckets de donaciones se mantienen con triggers
+-- FOR EACH STATEMENT sobre tablas de transición. Un INSERT/COPY de N filas hace un
+-- upsert agrupado por campaña (o por bucket) en lugar de N actualizaciones, y el
+-- conteo de voluntarios es incremental en vez de un COUNT(DISTINCT) por fila.
+
+-- Donaciones -> estadisticas_campana
+CREATE OR REPLACE FUNCTION actualizar_estadisticas_donacion_lote()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Orden por campaña: dos lotes concurrentes bloquean las filas en el mismo orden
+    INSERT INTO estadisticas_campana AS e (
+        campana_id, monto_recaudado, porcentaje_meta, num_donaciones, ultima_actualizacion
+    )
+    SELECT
+        n.campana_id,
+        n.monto,
+        CASE WHEN c.meta_monetaria > 0 THEN LEAST(n.monto / c.meta_monetaria * 100, 999.99) ELSE 0 END,
+        n.num_donaciones,
+        CURRENT_TIMESTAMP
+    FROM (
+        SELECT campana_id,
+               COALESCE(SUM(monto) FILTER (WHERE tipo = 'monetaria'), 0) AS monto,
+               COUNT(*) AS num_donaciones
+        FROM nuevas
+        GROUP BY campana_id
+    ) n
+    JOIN campana c ON c.campana_id = n.campana_id
+    ORDER BY n.campana_id
+    ON CONFLICT (campana_id) DO UPDATE
+    SET monto_recaudado = COALESCE(e.monto_recaudado, 0) + EXCLUDED.monto_recaudado,
+        num_donaciones = COALESCE(e.num_donaciones, 0) + EXCLUDED.num_donaciones,
+        porcentaje_meta = (
+            SELECT CASE WHEN c.meta_monetaria > 0
+                        THEN LEAST((COALESCE(e.monto_recaudado, 0) + EXCLUDED.monto_recaudado) / c.meta_monetaria * 100, 999.99)
+                        ELSE 0
+                   END
+            FROM campana c WHERE c.campana_id = e.campana_id
+        ),
+        ultima_actualizacion = CURRENT_TIMESTAMP;
+
+    -- Avisa a la app para invalidar la cache de reportes (una vez por sentencia)
+    PERFORM pg_notify('reporteria_cambios', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS after_donacion_insert ON donacion;
+CREATE TRIGGER after_donacion_insert
+AFTER INSERT ON donacion
+REFERENCING NEW TABLE AS nuevas
+FOR EACH STATEMENT
+EXECUTE FUNCTION actualizar_estadisticas_donacion_lote();
+
+-- Inscripciones -> estadisticas_campana.num_voluntarios
+CREATE OR REPLACE FUNCTION actualizar_estadisticas_voluntario_lote()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Primero se crean las filas que falten: FOR UPDATE no bloquea una fila que
+    -- todavía no existe, y dos primeros lotes de la misma campaña contarían los
+    -- mismos voluntarios nuevos. Con ON CONFLICT el segundo espera al primero.
+    INSERT INTO estadisticas_campana (campana_id, num_voluntarios, ultima_actualizacion)
+    SELECT DISTINCT a.campana_id, 0, CURRENT_TIMESTAMP
+    FROM nuevas n
+    JOIN actividad a ON a.actividad_id = n.actividad_id
+    ORDER BY a.campana_id
+    ON CONFLICT (campana_id) DO NOTHING;
+
+    -- Se toman los locks antes de contar: con READ COMMITTED la siguiente
+    -- sentencia ve lo que otro lote de la misma campaña ya confirmó
+    PERFORM 1
+    FROM estadisticas_campana
+    WHERE campana_id IN (
+        SELECT a.campana_id FROM nuevas n JOIN actividad a ON a.actividad_id = n.actividad_id
+    )
+    ORDER BY campana_id
+    FOR UPDATE;
+
+    -- Un par (voluntario, campaña) del lote es nuevo si todas sus inscripciones
+    -- en esa campaña vienen en el lote. El conteo usa la PK (voluntario_id, ...),
+    -- así que cuesta O(lote) y no O(tamaño de la campaña).
+    UPDATE estadisticas_campana AS e
+    SET num_voluntarios = COALESCE(e.num_voluntarios, 0) + v.nuevos,
+        ultima_actualizacion = CURRENT_TIMESTAMP
+    FROM (
+        SELECT l.campana_id,
+               COUNT(*) FILTER (WHERE l.en_lote = (
+                   SELECT COUNT(*)
+                   FROM voluntario_actividad va
+                   JOIN actividad a ON a.actividad_id = va.actividad_id
+                   WHERE va.voluntario_id = l.voluntario_id
+                     AND a.campana_id = l.campana_id
+               )) AS nuevos
+        FROM (
+            SELECT n.voluntario_id, a.campana_id, COUNT(*) AS en_lote
+            FROM nuevas n
+            JOIN actividad a ON a.actividad_id = n.actividad_id
+            GROUP BY n.voluntario_id, a.campana_id
+        ) l
+        GROUP BY l.campana_id
+    ) v
+    WHERE e.campana_id = v.campana_id;
+
+    PERFORM pg_notify('reporteria_cambios', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS after_voluntario_actividad_insert ON voluntario_actividad;
+CREATE TRIGGER after_voluntario_actividad_insert
+AFTER INSERT ON voluntario_actividad
+REFERENCING NEW TABLE AS nuevas
+FOR EACH STATEMENT
+EXECUTE FUNCTION actualizar_estadisticas_voluntario_lote();
+
+-- Donaciones -> donacion_diaria / donacion_mensual (V002)
+-- Una tabla de transición solo se puede declarar en triggers de un evento, así que
+-- hay un trigger por operación y la función arma el delta según TG_OP.
+CREATE OR REPLACE FUNCTION actualizar_buckets_donacion_lote()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_delta TEXT;
+BEGIN
+    v_delta := CASE TG_OP
+        WHEN 'INSERT' THEN
+            'SELECT fecha, campana_id, donante_id, tipo, monto, 1 AS signo FROM nuevas'
+        WHEN 'DELETE' THEN
+            'SELECT fecha, campana_id, donante_id, tipo, monto, -1 AS signo FROM viejas'
+        ELSE
+            'SELECT fecha, campana_id, donante_id, tipo, monto, -1 AS signo FROM viejas
+             UNION ALL
+             SELECT fecha, campana_id, donante_id, tipo, monto, 1 AS signo FROM nuevas'
+    END;
+
+    EXECUTE format($sql$
+        INSERT INTO donacion_diaria AS b (dia, campana_id, tipo_donante, tipo_donacion, num_donaciones, monto_total)
+        SELECT d.fecha::date, d.campana_id, dn.tipo, d.tipo, SUM(d.signo), COALESCE(SUM(d.signo * d.monto), 0)
+        FROM (%s) d
+        JOIN donante dn ON dn.donante_id = d.donante_id
+        GROUP BY 1, 2, 3, 4
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (dia, campana_id, tipo_donante, tipo_donacion) DO UPDATE
+        SET num_donaciones = b.num_donaciones + EXCLUDED.num_donaciones,
+            monto_total = b.monto_total + EXCLUDED.monto_total
+    $sql$, v_delta);
+
+    EXECUTE format($sql$
+        INSERT INTO donacion_mensual AS b (mes, campana_id, tipo_donante, tipo_donacion, num_donaciones, monto_total)
+        SELECT date_trunc('month', d.fecha)::date, d.campana_id, dn.tipo, d.tipo, SUM(d.signo), COALESCE(SUM(d.signo * d.monto), 0)
+        FROM (%s) d
+        JOIN donante dn ON dn.donante_id = d.donante_id
+        GROUP BY 1, 2, 3, 4
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (mes, campana_id, tipo_donante, tipo_donacion) DO UPDATE
+        SET num_donaciones = b.num_donaciones + EXCLUDED.num_donaciones,
+            monto_total = b.monto_total + EXCLUDED.monto_total
+    $sql$, v_delta);
+
+    -- UPDATE/DELETE no pasan por after_donacion_insert
+    PERFORM pg_notify('reporteria_cambios', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS after_donacion_buckets ON donacion;
+DROP TRIGGER IF EXISTS after_donacion_buckets_insert ON donacion;
+DROP TRIGGER IF EXISTS after_donacion_buckets_update ON donacion;
+DROP TRIGGER IF EXISTS after_donacion_buckets_delete ON donacion;
+
+CREATE TRIGGER after_donacion_buckets_insert
+AFTER INSERT ON donacion
+REFERENCING NEW TABLE AS nuevas
+FOR EACH STATEMENT
+EXECUTE FUNCTION actualizar_buckets_donacion_lote();
+
+CREATE TRIGGER after_donacion_buckets_update
+AFTER UPDATE ON donacion
+REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+FOR EACH STATEMENT
+EXECUTE FUNCTION actualizar_buckets_donacion_lote();
+
+CREATE TRIGGER after_donacion_buckets_delete
+AFTER DELETE ON donacion
+REFERENCING OLD TABLE AS viejas
+FOR EACH STATEMENT
+EXECUTE FUNCTION actualizar_buckets_donacion_lote();
+
+INSERT INTO schema_migrations (version, descripcion)
+VALUES ('V004', 'Triggers de estadísticas y buckets por sentencia')
+ON CONFLICT (version) DO NOTHING;
@@ -0,0 +1,124 @@
+-- V005: los triggers de donacion publican en reporteria_cambios un evento con el
+-- delta por campaña en lugar de solo el nombre de la tabla. La app lo aplica a los
+-- resultados en cache (services/cache.py) sin volver a consultar.
+--
+-- Payload (JSON, uno por sentencia):
+--   {"tabla": "donacion", "op": "INSERT"|"UPDATE"|"DELETE",
+--    "desde": fecha mínima, "hasta": fecha máxima,
+--    "monto_min": monto mínimo, "monto_max": monto máximo,
+--    "campanas": [[campana_id, delta_monto, delta_donaciones], ...]}
+-- delta_monto suma solo donaciones monetarias, como estadisticas_campana y los
+-- reportes por campaña; delta_donaciones cuenta todas. Fechas y montos cubren
+-- las filas viejas y nuevas del lote. Si el evento no cabe
+-- en un NOTIFY (8000 bytes) se envía solo el nombre de la tabla, como antes.
+
+-- El aviso de INSERT ahora lo da actualizar_buckets_donacion_lote (con el delta)
+CREATE OR REPLACE FUNCTION actualizar_estadisticas_donacion_lote()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Orden por campaña: dos lotes concurrentes bloquean las filas en el mismo orden
+    INSERT INTO estadisticas_campana AS e (
+        campana_id, monto_recaudado, porcentaje_meta, num_donaciones, ultima_actualizacion
+    )
+    SELECT
+        n.campana_id,
+        n.monto,
+        CASE WHEN c.meta_monetaria > 0 THEN LEAST(n.monto / c.meta_monetaria * 100, 999.99) ELSE 0 END,
+        n.num_donaciones,
+        CURRENT_TIMESTAMP
+    FROM (
+        SELECT campana_id,
+               COALESCE(SUM(monto) FILTER (WHERE tipo = 'monetaria'), 0) AS monto,
+               COUNT(*) AS num_donaciones
+        FROM nuevas
+        GROUP BY campana_id
+    ) n
+    JOIN campana c ON c.campana_id = n.campana_id
+    ORDER BY n.campana_id
+    ON CONFLICT (campana_id) DO UPDATE
+    SET monto_recaudado = COALESCE(e.monto_recaudado, 0) + EXCLUDED.monto_recaudado,
+        num_donaciones = COALESCE(e.num_donaciones, 0) + EXCLUDED.num_donaciones,
+        porcentaje_meta = (
+            SELECT CASE WHEN c.meta_monetaria > 0
+                        THEN LEAST((COALESCE(e.monto_recaudado, 0) + EXCLUDED.monto_recaudado) / c.meta_monetaria * 100, 999.99)
+                        ELSE 0
+                   END
+            FROM campana c WHERE c.campana_id = e.campana_id
+        ),
+        ultima_actualizacion = CURRENT_TIMESTAMP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION actualizar_buckets_donacion_lote()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_delta TEXT;
+    v_evento TEXT;
+BEGIN
+    v_delta := CASE TG_OP
+        WHEN 'INSERT' THEN
+            'SELECT fecha, campana_id, donante_id, tipo, monto, 1 AS signo FROM nuevas'
+        WHEN 'DELETE' THEN
+            'SELECT fecha, campana_id, donante_id, tipo, monto, -1 AS signo FROM viejas'
+        ELSE
+            'SELECT fecha, campana_id, donante_id, tipo, monto, -1 AS signo FROM viejas
+             UNION ALL
+             SELECT fecha, campana_id, donante_id, tipo, monto, 1 AS signo FROM nuevas'
+    END;
+
+    EXECUTE format($sql$
+        INSERT INTO donacion_diaria AS b (dia, campana_id, tipo_donante, tipo_donacion, num_donaciones, monto_total)
+        SELECT d.fecha::date, d.campana_id, dn.tipo, d.tipo, SUM(d.signo), COALESCE(SUM(d.signo * d.monto), 0)
+        FROM (%s) d
+        JOIN donante dn ON dn.donante_id = d.donante_id
+        GROUP BY 1, 2, 3, 4
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (dia, campana_id, tipo_donante, tipo_donacion) DO UPDATE
+        SET num_donaciones = b.num_donaciones + EXCLUDED.num_donaciones,
+            monto_total = b.monto_total + EXCLUDED.monto_total
+    $sql$, v_delta);
+
+    EXECUTE format($sql$
+        INSERT INTO donacion_mensual AS b (mes, campana_id, tipo_donante, tipo_donacion, num_donaciones, monto_total)
+        SELECT date_trunc('month', d.fecha)::date, d.campana_id, dn.tipo, d.tipo, SUM(d.signo), COALESCE(SUM(d.signo * d.monto), 0)
+        FROM (%s) d
+        JOIN donante dn ON dn.donante_id = d.donante_id
+        GROUP BY 1, 2, 3, 4
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (mes, campana_id, tipo_donante, tipo_donacion) DO UPDATE
+        SET num_donaciones = b.num_donaciones + EXCLUDED.num_donaciones,
+            monto_total = b.monto_total + EXCLUDED.monto_total
+    $sql$, v_delta);
+
+    -- Evento con el delta por campaña (las campañas con delta cero se omiten)
+    EXECUTE format($sql$
+        WITH d AS (%s)
+        SELECT json_build_object(
+            'tabla', %L,
+            'op', %L,
+            'desde', (SELECT MIN(fecha) FROM d),
+            'hasta', (SELECT MAX(fecha) FROM d),
+            'monto_min', (SELECT MIN(monto) FROM d),
+            'monto_max', (SELECT MAX(monto) FROM d),
+            'campanas', COALESCE(json_agg(json_build_array(c.campana_id, c.monto, c.num_donaciones) ORDER BY c.campana_id), '[]')
+        )::text
+        FROM (
+            SELECT campana_id, COALESCE(SUM(signo * monto) FILTER (WHERE tipo = 'monetaria'), 0) AS monto, SUM(signo) AS num_donaciones
+            FROM d
+            GROUP BY campana_id
+        ) c
+        WHERE c.monto <> 0 OR c.num_donaciones <> 0
+    $sql$, v_delta, TG_TABLE_NAME, TG_OP) INTO v_evento;
+
+    IF octet_length(v_evento) >= 8000 THEN
+        v_evento := TG_TABLE_NAME;
+    END IF;
+    PERFORM pg_notify('reporteria_cambios', v_evento);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+INSERT INTO schema_migrations (version, descripcion)
+VALUES ('V005', 'Eventos de cambios con delta por campaña')
+ON CONFLICT (version) DO NOTHING;
@@ -0,0 +1,221 @@
+-- V006: donacion particionada por mes (RANGE sobre fecha). Los reportes con ventana
+-- de fechas solo leen las particiones de la ventana, y los meses fríos se pueden
+-- mover a donacion_archivo (app/tools/particiones.py) sin tocar los agregados.
+--
+-- La PK pasa a ser (donacion_id, fecha): en una tabla particionada la PK debe
+-- incluir la columna de partición. Ninguna tabla referencia donacion_id.
+
+-- Crea la partición del mes de p_mes (si no existe) y le mueve las filas que
+-- hubieran caído en donacion_default. Se opera directo sobre las particiones,
+-- así que los triggers por sentencia de donacion no se disparan.
+-- Si el mes ya está en donacion_archivo, las filas que hayan caído en
+-- donacion_default (donaciones tardías) se mueven a esa partición archivada.
+CREATE OR REPLACE FUNCTION crear_particion_donacion(p_mes DATE)
+RETURNS TEXT AS $$
+DECLARE
+    v_desde DATE := date_trunc('month', p_mes)::date;
+    v_hasta DATE := (date_trunc('month', p_mes) + INTERVAL '1 month')::date;
+    v_nombre TEXT := 'donacion_' || to_char(p_mes, 'YYYY_MM');
+    v_padre REGCLASS;
+    v_filas BIGINT;
+BEGIN
+    IF to_regclass(v_nombre) IS NOT NULL THEN
+        SELECT i.inhparent INTO v_padre FROM pg_inherits i WHERE i.inhrelid = to_regclass(v_nombre);
+        IF v_padre = 'donacion'::regclass THEN
+            RETURN NULL;
+        END IF;
+        IF v_padre IS DISTINCT FROM 'donacion_archivo'::regclass THEN
+            RAISE EXCEPTION '% existe pero no es partición de donacion ni de donacion_archivo', v_nombre;
+        END IF;
+        EXECUTE format($sql$
+            WITH movidas AS (
+                DELETE FROM donacion_default WHERE fecha >= %L AND fecha < %L RETURNING *
+            )
+            INSERT INTO %I SELECT * FROM movidas
+        $sql$, v_desde, v_hasta, v_nombre);
+        GET DIAGNOSTICS v_filas = ROW_COUNT;
+        IF v_filas > 0 THEN
+            RAISE WARNING '% filas de donacion_default pasaron a la partición archivada %', v_filas, v_nombre;
+        END IF;
+        RETURN NULL;
+    END IF;
+
+    IF to_regclass('pg_temp.donacion_mover') IS NULL THEN
+        CREATE TEMP TABLE donacion_mover (LIKE donacion) ON COMMIT DROP;
+    END IF;
+    WITH movidas AS (
+        DELETE FROM donacion_default WHERE fecha >= v_desde AND fecha < v_hasta RETURNING *
+    )
+    INSERT INTO donacion_mover SELECT * FROM movidas;
+
+    EXECUTE format('CREATE TABLE %I PARTITION OF donacion FOR VALUES FROM (%L) TO (%L)',
+                   v_nombre, v_desde, v_hasta);
+    EXECUTE format('INSERT INTO %I SELECT * FROM donacion_mover', v_nombre);
+    TRUNCATE donacion_mover;
+    RETURN v_nombre;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Pasa una partición de donacion a donacion_archivo con los mismos límites
+CREATE OR REPLACE FUNCTION archivar_particion_donacion(p_nombre TEXT)
+RETURNS VOID AS $$
+DECLARE
+    v_limites TEXT;
+BEGIN
+    SELECT pg_get_expr(c.relpartbound, c.oid) INTO v_limites
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'donacion'::regclass AND c.relname = p_nombre;
+    IF v_limites IS NULL OR v_limites = 'DEFAULT' THEN
+        RAISE EXCEPTION '% no es una partición mensual de donacion', p_nombre;
+    END IF;
+
+    EXECUTE format('ALTER TABLE donacion DETACH PARTITION %I', p_nombre);
+    EXECUTE format('ALTER TABLE donacion_archivo ATTACH PARTITION %I %s', p_nombre, v_limites);
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    v_mes DATE;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'donacion'::regclass) = 'p' THEN
+        RETURN;  -- ya aplicada
+    END IF;
+
+    LOCK TABLE donacion IN ACCESS EXCLUSIVE MODE;
+    ALTER TABLE donacion RENAME TO donacion_sin_particionar;
+    ALTER TABLE donacion_sin_particionar RENAME CONSTRAINT donacion_pkey TO donacion_sin_particionar_pkey;
+    ALTER SEQUENCE donacion_donacion_id_seq OWNED BY NONE;
+
+    CREATE TABLE donacion (
+        donacion_id INTEGER NOT NULL DEFAULT nextval('donacion_donacion_id_seq'),
+        donante_id INTEGER NOT NULL REFERENCES donante(donante_id) ON DELETE CASCADE ON UPDATE CASCADE,
+        campana_id INTEGER NOT NULL REFERENCES campana(campana_id),
+        tipo tipo_donacion NOT NULL,
+        monto DECIMAL(12,2) CHECK (monto > 0),
+        descripcion_especie TEXT,
+        fecha TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        anonima BOOLEAN DEFAULT FALSE,
+        mensaje TEXT,
+        PRIMARY KEY (donacion_id, fecha),
+        CONSTRAINT chk_tipo_donacion CHECK (
+            (tipo = 'monetaria' AND monto IS NOT NULL AND descripcion_especie IS NULL) OR
+            (tipo = 'especie' AND descripcion_especie IS NOT NULL)
+        )
+    ) PARTITION BY RANGE (fecha);
+    ALTER SEQUENCE donacion_donacion_id_seq OWNED BY donacion.donacion_id;
+
+    -- Fechas fuera de las particiones creadas (se reparten con crear_particion_donacion)
+    CREATE TABLE donacion_default PARTITION OF donacion DEFAULT;
+
+    -- Un mes por partición desde la donación más antigua hasta tres meses adelante
+    FOR v_mes IN
+        SELECT generate_series(
+            date_trunc('month', COALESCE(MIN(fecha), CURRENT_DATE)),
+            date_trunc('month', CURRENT_DATE) + INTERVAL '3 months',
+            INTERVAL '1 month'
+        )::date
+        FROM donacion_sin_particionar
+    LOOP
+        PERFORM crear_particion_donacion(v_mes);
+    END LOOP;
+
+    -- Sin triggers todavía: estadisticas_campana y los buckets ya cuentan estas filas
+    INSERT INTO donacion (donacion_id, donante_id, campana_id, tipo, monto, descripcion_especie, fecha, anonima, mensaje)
+    SELECT donacion_id, donante_id, campana_id, tipo, monto, descripcion_especie, fecha, anonima, mensaje
+    FROM donacion_sin_particionar;
+
+    DROP TABLE donacion_sin_particionar;
+
+    -- Triggers por sentencia de V004/V005 (las tablas de transición incluyen las filas
+    -- de todas las particiones; un UPDATE que cambia de mes aparece en viejas y nuevas)
+    CREATE TRIGGER after_donacion_insert
+    AFTER INSERT ON donacion
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION actualizar_estadisticas_donacion_lote();
+
+    CREATE TRIGGER after_donacion_buckets_insert
+    AFTER INSERT ON donacion
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION actualizar_buckets_donacion_lote();
+
+    CREATE TRIGGER after_donacion_buckets_update
+    AFTER UPDATE ON donacion
+    REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION actualizar_buckets_donacion_lote();
+
+    CREATE TRIGGER after_donacion_buckets_delete
+    AFTER DELETE ON donacion
+    REFERENCING OLD TABLE AS viejas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION actualizar_buckets_donacion_lote();
+END;
+$$;
+
+-- Índices de V001, ahora por partición
+CREATE INDEX IF NOT EXISTS idx_donacion_campana_fecha
+    ON donacion (campana_id, fecha) INCLUDE (monto, donacion_id);
+CREATE INDEX IF NOT EXISTS idx_donacion_donante_fecha
+    ON donacion (donante_id, fecha) INCLUDE (monto, donacion_id);
+CREATE INDEX IF NOT EXISTS idx_donacion_fecha
+    ON donacion (fecha) INCLUDE (campana_id, donante_id, monto, donacion_id);
+CREATE INDEX IF NOT EXISTS idx_donacion_monto_donante
+    ON donacion (monto, donante_id) INCLUDE (fecha, donacion_id)
+    WHERE monto IS NOT NULL;
+
+-- Meses fríos: fuera de las consultas sobre donacion, pero todavía en los
+-- agregados y en donacion_historica (para recalcularlos)
+CREATE TABLE IF NOT EXISTS donacion_archivo (LIKE donacion INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+    PARTITION BY RANGE (fecha);
+
+CREATE OR REPLACE VIEW donacion_historica AS
+SELECT * FROM donacion
+UNION ALL
+SELECT * FROM donacion_archivo;
+
+-- Los buckets se recalculan con el histórico completo
+CREATE OR REPLACE FUNCTION refrescar_donacion_buckets(
+    p_desde DATE DEFAULT NULL,
+    p_hasta DATE DEFAULT NULL
+) RETURNS INTEGER AS $$
+DECLARE
+    v_desde DATE := CASE WHEN p_desde IS NULL THEN '-infinity'::date
+                         ELSE date_trunc('month', p_desde)::date END;
+    v_hasta DATE := CASE WHEN p_hasta IS NULL THEN 'infinity'::date
+                         ELSE (date_trunc('month', p_hasta) + INTERVAL '1 month')::date END;
+    v_filas INTEGER;
+BEGIN
+    -- Bloquea escrituras en donacion (y que se archiven meses) mientras se recalcula el rango
+    LOCK TABLE donacion, donacion_archivo IN SHARE MODE;
+
+    DELETE FROM donacion_diaria WHERE dia >= v_desde AND dia < v_hasta;
+    DELETE FROM donacion_mensual WHERE mes >= v_desde AND mes < v_hasta;
+
+    INSERT INTO donacion_diaria (dia, campana_id, tipo_donante, tipo_donacion, num_donaciones, monto_total)
+    SELECT d.fecha::date, d.campana_id, dn.tipo, d.tipo, COUNT(*), COALESCE(SUM(d.monto), 0)
+    FROM donacion_historica d
+    JOIN donante dn ON d.donante_id = dn.donante_id
+    WHERE d.fecha >= v_desde AND d.fecha < v_hasta
+    GROUP BY 1, 2, 3, 4;
+    GET DIAGNOSTICS v_filas = ROW_COUNT;
+
+    INSERT INTO donacion_mensual (mes, campana_id, tipo_donante, tipo_donacion, num_donaciones, monto_total)
+    SELECT date_trunc('month', dia)::date, campana_id, tipo_donante, tipo_donacion,
+           SUM(num_donaciones), SUM(monto_total)
+    FROM donacion_diaria
+    WHERE dia >= v_desde AND dia < v_hasta
+    GROUP BY 1, 2, 3, 4;
+
+    RETURN v_filas;
+END;
+$$ LANGUAGE plpgsql;
+
+ANALYZE donacion;
+
+INSERT INTO schema_migrations (version, descripcion)
+VALUES ('V006', 'donacion particionada por mes')
+ON CONFLICT (version) DO NOTHING;
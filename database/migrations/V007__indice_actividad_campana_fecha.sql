@@ -0,0 +1,16 @@
+-- V007: el reporte de recursos filtra campañas con EXISTS sobre sus actividades
+-- en la ventana. Con fecha_inicio en la clave, cada búsqueda por campaña empieza
+-- en la ventana en lugar de recorrer todas sus actividades, así que el costo no
+-- crece con las actividades por campaña (app/tools/benchmark_recursos.py).
+-- Cubre también los usos de idx_actividad_campana (V001), que se reemplaza.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_actividad_campana_fecha
+    ON actividad (campana_id, fecha_inicio) INCLUDE (fecha_fin, actividad_id);
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_actividad_campana;
+
+ANALYZE actividad;
+
+INSERT INTO schema_migrations (version, descripcion)
+VALUES ('V007', 'Índice de actividades por campaña y fecha')
+ON CONFLICT (version) DO NOTHING;
@@ -0,0 +1,98 @@
+-- V008: los cambios en voluntarios, su disponibilidad y sus habilidades avisan por
+-- reporteria_cambios qué voluntarios tocaron. El índice de asignación
+-- (services/asignacion.py) recarga solo esos voluntarios.
+--
+-- Payload (JSON, uno por sentencia):
+--   {"tabla": "voluntario"|"disponibilidad_voluntario"|"voluntario_habilidad",
+--    "op": "INSERT"|"UPDATE"|"DELETE", "voluntarios": [voluntario_id, ...]}
+-- Si el evento no cabe en un NOTIFY (8000 bytes), o en un TRUNCATE, se envía solo
+-- el nombre de la tabla y el índice se reconstruye. Los cambios en habilidad
+-- también envían solo el nombre (el índice recarga los nombres).
+
+CREATE OR REPLACE FUNCTION notificar_cambios_voluntarios()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_filas TEXT;
+    v_ids INTEGER[];
+    v_evento TEXT;
+BEGIN
+    v_filas := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT voluntario_id FROM nuevas'
+        WHEN 'DELETE' THEN 'SELECT voluntario_id FROM viejas'
+        ELSE 'SELECT voluntario_id FROM viejas UNION ALL SELECT voluntario_id FROM nuevas'
+    END;
+
+    EXECUTE format('SELECT array_agg(DISTINCT f.voluntario_id) FROM (%s) f WHERE f.voluntario_id IS NOT NULL', v_filas)
+    INTO v_ids;
+    IF v_ids IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    v_evento := json_build_object('tabla', TG_TABLE_NAME, 'op', TG_OP, 'voluntarios', v_ids)::text;
+    IF octet_length(v_evento) >= 8000 THEN
+        v_evento := TG_TABLE_NAME;
+    END IF;
+    PERFORM pg_notify('reporteria_cambios', v_evento);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notificar_tabla()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('reporteria_cambios', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Las tablas de transición admiten un solo evento por trigger: uno por operación
+DO $$
+DECLARE
+    v_tabla TEXT;
+BEGIN
+    FOREACH v_tabla IN ARRAY ARRAY['voluntario', 'disponibilidad_voluntario', 'voluntario_habilidad'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS after_%1$s_eventos_insert ON %1$I', v_tabla);
+        EXECUTE format('DROP TRIGGER IF EXISTS after_%1$s_eventos_update ON %1$I', v_tabla);
+        EXECUTE format('DROP TRIGGER IF EXISTS after_%1$s_eventos_delete ON %1$I', v_tabla);
+        EXECUTE format('DROP TRIGGER IF EXISTS after_%1$s_eventos_truncate ON %1$I', v_tabla);
+
+        EXECUTE format($sql$
+            CREATE TRIGGER after_%1$s_eventos_insert
+            AFTER INSERT ON %1$I
+            REFERENCING NEW TABLE AS nuevas
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION notificar_cambios_voluntarios()
+        $sql$, v_tabla);
+        EXECUTE format($sql$
+            CREATE TRIGGER after_%1$s_eventos_update
+            AFTER UPDATE ON %1$I
+            REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION notificar_cambios_voluntarios()
+        $sql$, v_tabla);
+        EXECUTE format($sql$
+            CREATE TRIGGER after_%1$s_eventos_delete
+            AFTER DELETE ON %1$I
+            REFERENCING OLD TABLE AS viejas
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION notificar_cambios_voluntarios()
+        $sql$, v_tabla);
+        EXECUTE format($sql$
+            CREATE TRIGGER after_%1$s_eventos_truncate
+            AFTER TRUNCATE ON %1$I
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION notificar_tabla()
+        $sql$, v_tabla);
+    END LOOP;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS after_habilidad_eventos ON habilidad;
+CREATE TRIGGER after_habilidad_eventos
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON habilidad
+FOR EACH STATEMENT
+EXECUTE FUNCTION notificar_tabla();
+
+INSERT INTO schema_migrations (version, descripcion)
+VALUES ('V008', 'Eventos de cambios de voluntarios para el índice de asignación')
+ON CONFLICT (version) DO NOTHING;